@@ -0,0 +1,277 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Protocol
+
+from app.notifier import notifier
+from app.schemas.user_schemas import UserResponse
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    """Storage for encoded payloads. Implementations must be safe to call from several threads."""
+
+    evictions: int
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes) -> None: ...
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        """Store value only if key is absent; True if it was stored. ttl overrides the backend TTL."""
+        ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryCacheBackend:
+    """In-process LRU bounded by entry count, total payload size and TTL"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self.size_bytes = 0
+        # key -> (expires_at, value), least recently used first
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, value, self.ttl)
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        if len(value) > self.max_bytes:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            self._store(key, value, self.ttl if ttl is None else ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: str, value: bytes, ttl: float):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size_bytes += len(value)
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self.size_bytes -= len(value)
+
+
+class RedisCacheBackend:
+    """Redis-backed storage shared by all workers; eviction is left to Redis (TTL + maxmemory policy)"""
+
+    def __init__(self, url: str, ttl: float = 300.0, prefix: str = "stb:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, px=int(self.ttl * 1000))
+
+    def add(self, key: str, value: bytes, ttl: float | None = None) -> bool:
+        ttl = self.ttl if ttl is None else ttl
+        return bool(self.client.set(self.prefix + key, value, nx=True, px=int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class BillDetailCache:
+    """
+    Encoded BillDetailResponse payloads keyed by bill id and API variant.
+    Each entry remembers the bill version it was rendered from, so a lookup
+    for any other version is a miss even if an invalidation was lost.
+    """
+    variants = ("v1", "v2")
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(bill_id: int, variant: str) -> str:
+        return f"bill:{bill_id}:{variant}"
+
+    def get(self, bill_id: int, version: int, variant: str = "v1") -> bytes | None:
+        entry = self.backend.get(self._key(bill_id, variant))
+        if entry is not None:
+            entry_version, _, payload = entry.partition(b"\n")
+            if int(entry_version) == version:
+                self.hits += 1
+                return payload
+        self.misses += 1
+        return None
+
+    def set(self, bill_id: int, version: int, payload: bytes, variant: str = "v1"):
+        self.backend.set(self._key(bill_id, variant), b"%d\n" % version + payload)
+
+    def invalidate(self, bill_id: int):
+        for variant in self.variants:
+            self.backend.delete(self._key(bill_id, variant))
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+        }
+
+
+class UserProfileCache:
+    """
+    Read-through cache of user profiles by id.
+    Bounded by entry count and TTL; the TTL also bounds how long another
+    worker may serve a profile after it was changed elsewhere.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # user id -> (expires_at, profile), least recently used first
+        self._entries: OrderedDict[int, tuple[float, UserResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> UserResponse | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, profile = entry
+            if expires_at <= time.monotonic():
+                self._remove(user_id)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return profile
+
+    def get_many(self, user_ids) -> tuple[dict[int, UserResponse], list[int]]:
+        """Cached profiles for user_ids and the ids that were not cached"""
+        found = {}
+        missing = []
+        for user_id in user_ids:
+            profile = self.get(user_id)
+            if profile is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = profile
+        return found, missing
+
+    def set(self, profile: UserResponse):
+        with self._lock:
+            if profile.id in self._entries:
+                self._remove(profile.id)
+            self._entries[profile.id] = (time.monotonic() + self.ttl, profile)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, user_id: int):
+        self._entries.pop(user_id)
+
+
+def create_backend() -> CacheBackend:
+    ttl = float(os.getenv("BILL_CACHE_TTL", "300"))
+    redis_url = os.getenv("BILL_CACHE_REDIS_URL")
+    if redis_url:
+        logger.info("Using Redis bill detail cache")
+        return RedisCacheBackend(redis_url, ttl=ttl)
+    return MemoryCacheBackend(
+        max_entries=int(os.getenv("BILL_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("BILL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        ttl=ttl,
+    )
+
+
+def invalidate_on_refresh(bill_id: int, message: str):
+    if message == "REFRESH":
+        bill_detail_cache.invalidate(bill_id)
+
+
+# Singleton instances
+bill_detail_cache = BillDetailCache(create_backend())
+user_profile_cache = UserProfileCache(
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+)
+notifier.add_listener(invalidate_on_refresh)
@@ -1,5 +1,7 @@
+import logging
 import os
 from dotenv import load_dotenv
+from sqlalchemy.engine import Engine
 from sqlmodel import create_engine, SQLModel, Session
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
@@ -21,13 +23,22 @@ connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, echo=True, connect_args=connect_args)
+engine = create_engine(DATABASE_URL, connect_args=connect_args)
+
+# SQL logging through the app's log pipeline (queued and rate limited) rather than echo's own handler
+if os.getenv("DB_ECHO", "false").lower() == "true":
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
 
+def get_engine() -> Engine:
+    """The engine as a dependency, for routes that check the database itself rather than use a session"""
+    return engine
+
+
 def get_session():
     with Session(engine) as session:
         yield session
@@ -0,0 +1,122 @@
+import os
+import time
+import weakref
+from contextvars import ContextVar
+from fastapi import HTTPException, Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from app.metrics import route_label
+
+# time.monotonic() by which the current request must be done; None means no deadline
+current_deadline: ContextVar[float | None] = ContextVar("current_deadline", default=None)
+
+# SQLite calls the progress handler every this many VM instructions
+SQLITE_PROGRESS_STEPS = 1000
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Request deadline exceeded", headers={"Retry-After": "1"})
+
+
+def _parse_routes(value: str) -> dict[str, float]:
+    """ "GET /api/bills/{bill_id}=2000,POST /api/bills/=5000" -> {"GET /api/bills/{bill_id}": 2.0, ...}"""
+    routes = {}
+    for part in value.split(","):
+        route, _, ms = part.strip().rpartition("=")
+        if route and ms:
+            routes[route.strip()] = float(ms) / 1000
+    return routes
+
+
+class DeadlinePolicy:
+    """Seconds a request may take: per "METHOD /route/template", else the default; 0 disables"""
+
+    def __init__(self, default: float, routes: dict[str, float] | None = None):
+        self.default = default
+        self.routes = routes or {}
+
+    @classmethod
+    def from_env(cls) -> "DeadlinePolicy":
+        return cls(
+            default=float(os.getenv("DEADLINE_DEFAULT_MS", "10000")) / 1000,
+            routes=_parse_routes(os.getenv("DEADLINE_ROUTES", "GET /api/bills/{bill_id}/events=0")),
+        )
+
+    def timeout(self, method: str, route: str) -> float:
+        return self.routes.get(f"{method} {route}", self.default)
+
+
+# Singleton instance
+deadline_policy = DeadlinePolicy.from_env()
+
+
+async def apply_deadline(request: Request):
+    """
+    App-wide dependency starting the deadline of the matched route. Async, so
+    the value is set in the request's own context, which sync dependencies and
+    endpoints get a copy of in the threadpool.
+    """
+    timeout = deadline_policy.timeout(request.method, route_label(request.scope))
+    current_deadline.set(time.monotonic() + timeout if timeout > 0 else None)
+
+
+def remaining() -> float | None:
+    """Seconds left before the deadline (negative once passed), None without one"""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check_deadline():
+    if deadline_expired():
+        raise DeadlineExceeded()
+
+
+def is_timeout_error(error: DBAPIError) -> bool:
+    """The statement was cut short by statement_timeout or the SQLite progress handler"""
+    orig = error.orig
+    return getattr(orig, "pgcode", None) == "57014" or "interrupted" in str(orig)
+
+
+_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def enforce_deadlines(engine: Engine):
+    """
+    Stop the queries of a request past its deadline: no statement starts once
+    it has passed, PostgreSQL transactions get a statement_timeout of the time
+    left, and SQLite statements are interrupted by a progress handler.
+    """
+    if engine in _engines:
+        return
+    _engines.add(engine)
+
+    # Inserted first, so the metrics and tracing listeners never see a statement that does not run
+    @event.listens_for(engine, "before_cursor_execute", insert=True)
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        check_deadline()
+
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def connect(dbapi_connection, connection_record):
+            dbapi_connection.set_progress_handler(_sqlite_progress, SQLITE_PROGRESS_STEPS)
+
+    elif engine.dialect.name == "postgresql":
+        @event.listens_for(Session, "after_begin")
+        def after_begin(session, transaction, connection):
+            left = remaining()
+            if left is not None and connection.engine is engine:
+                # SET LOCAL ends with the transaction, so the pooled connection is left as it was
+                connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(left * 1000))}")
+
+
+def _sqlite_progress() -> int:
+    # Non-zero aborts the running statement with "interrupted"
+    return 1 if deadline_expired() else 0
@@ -0,0 +1,67 @@
+import os
+from fastapi import Depends, Header, HTTPException, Query, Request
+from sqlmodel import Session
+from app.database import get_session
+from app.repositories.bill_repo import BillRepository
+from app.utils.auth import verify_session_token
+
+# Bill routes a signed-in user may call without being part of the bill yet
+OPEN_BILL_ROUTES = {"join_bill"}
+
+def get_current_user_id(
+    authorization: str | None = Header(default=None),
+    access_token: str | None = Query(default=None, include_in_schema=False),
+) -> int | None:
+    """
+    User id from the session token issued by POST /users/, sent as a Bearer
+    header or, for EventSource which cannot set headers, as ?access_token=.
+    Outside production a request without a token is let through (None),
+    same as the Telegram check on login.
+    """
+    return session_user_id(authorization, access_token)
+
+def session_user_id(authorization: str | None, access_token: str | None) -> int | None:
+    """get_current_user_id for callers outside dependency injection"""
+    token = access_token
+    if authorization:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials
+
+    if not token:
+        if os.getenv("ENV") == "production":
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+
+    user_id = verify_session_token(token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token", headers={"WWW-Authenticate": "Bearer"})
+    return user_id
+
+def ensure_acting_user(current_user_id: int | None, user_id: int):
+    """The user a request acts for must be the one the token was issued to"""
+    if current_user_id is not None and current_user_id != user_id:
+        raise HTTPException(status_code=403, detail="Session does not belong to this user")
+
+def ensure_bill_member(
+    request: Request,
+    current_user_id: int | None = Depends(get_current_user_id),
+    session: Session = Depends(get_session),
+):
+    """
+    Router dependency: on routes with a bill_id the token holder must own or
+    take part in the bill. Unknown bills are left to the route (404), and
+    requests without a token are let through as in get_current_user_id.
+    """
+    bill_id = request.path_params.get("bill_id")
+    if current_user_id is None or bill_id is None or request.scope["route"].name in OPEN_BILL_ROUTES:
+        return
+    try:
+        bill_id = int(bill_id)
+    except ValueError:
+        return
+    is_member = BillRepository(session).is_member(bill_id, current_user_id)
+    # End the read transaction so the connection goes back to the pool: event streams keep the session open
+    session.rollback()
+    if is_member is False:
+        raise HTTPException(status_code=403, detail="Not a participant of this bill")
@@ -0,0 +1,101 @@
+import os
+import time
+from typing import NamedTuple
+import anyio
+from anyio import to_thread
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from app.notifier import notifier
+
+
+class ReadinessThresholds(NamedTuple):
+    db_timeout: float             # seconds the DB ping may take
+    max_pool_usage: float         # fraction of pool capacity checked out
+    max_threadpool_waiting: int   # sync calls queued for a worker thread
+    max_sse_subscribers: int      # open SSE streams in this process
+
+
+def readiness_thresholds() -> ReadinessThresholds:
+    return ReadinessThresholds(
+        db_timeout=float(os.getenv("READINESS_DB_TIMEOUT_MS", "500")) / 1000,
+        max_pool_usage=float(os.getenv("READINESS_MAX_POOL_USAGE", "0.9")),
+        max_threadpool_waiting=int(os.getenv("READINESS_MAX_THREADPOOL_WAITING", "20")),
+        max_sse_subscribers=int(os.getenv("READINESS_MAX_SSE_SUBSCRIBERS", "2000")),
+    )
+
+
+# The ping gets its own worker thread: a saturated default threadpool must not delay the check
+_ping_limiter = anyio.CapacityLimiter(1)
+
+
+def _ping(engine: Engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def pool_check(engine: Engine, thresholds: ReadinessThresholds) -> dict:
+    """Checked-out connections against size + max overflow (pools other than QueuePool always pass)"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"ok": True}
+    checked_out = pool.checkedout()
+    max_overflow = pool._max_overflow
+    if max_overflow < 0:
+        return {"ok": True, "checked_out": checked_out, "capacity": None}
+    capacity = pool.size() + max_overflow
+    usage = checked_out / capacity if capacity else 0.0
+    return {"ok": usage < thresholds.max_pool_usage, "checked_out": checked_out, "capacity": capacity, "usage": round(usage, 3)}
+
+
+def threadpool_check(thresholds: ReadinessThresholds) -> dict:
+    """Worker threads of the default limiter (sync routes and dependencies) and calls waiting for one"""
+    limiter = to_thread.current_default_thread_limiter()
+    waiting = limiter.statistics().tasks_waiting
+    return {
+        "ok": waiting <= thresholds.max_threadpool_waiting,
+        "busy": int(limiter.borrowed_tokens),
+        "size": int(limiter.total_tokens),
+        "waiting": waiting,
+    }
+
+
+def sse_check(thresholds: ReadinessThresholds) -> dict:
+    """Open streams under the threshold, and not shutting down"""
+    stats = notifier.stats()
+    return {
+        "ok": stats["subscribers"] < thresholds.max_sse_subscribers and not stats["draining"],
+        "subscribers": stats["subscribers"],
+        "draining": stats["draining"],
+    }
+
+
+async def database_check(engine: Engine, thresholds: ReadinessThresholds) -> dict:
+    start = time.perf_counter()
+    try:
+        with anyio.fail_after(thresholds.db_timeout):
+            await to_thread.run_sync(_ping, engine, limiter=_ping_limiter, abandon_on_cancel=True)
+    except TimeoutError:
+        return {"ok": False, "error": f"no answer in {thresholds.db_timeout * 1000:.0f} ms"}
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+async def check_readiness(engine: Engine, thresholds: ReadinessThresholds | None = None) -> tuple[bool, dict]:
+    """
+    Whether this process should get new traffic, with the figures behind it.
+    The DB is not pinged when the pool is already full: the ping would only
+    queue behind the requests holding the connections.
+    """
+    thresholds = thresholds or readiness_thresholds()
+    checks = {
+        "pool": pool_check(engine, thresholds),
+        "threadpool": threadpool_check(thresholds),
+        "sse": sse_check(thresholds),
+    }
+    if checks["pool"]["ok"]:
+        checks["database"] = await database_check(engine, thresholds)
+    else:
+        checks["database"] = {"ok": False, "error": "pool usage over threshold, not pinged"}
+    return all(check["ok"] for check in checks.values()), checks
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+from typing import Callable
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from app.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+from app.dependencies import session_user_id
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class StoredResponse:
+    __slots__ = ("status_code", "fingerprint", "headers", "body")
+
+    def __init__(self, status_code: int, fingerprint: str, headers: dict[str, str], body: bytes):
+        self.status_code = status_code
+        self.fingerprint = fingerprint
+        self.headers = headers
+        self.body = body
+
+    def encode(self) -> bytes:
+        head = json.dumps([self.status_code, self.fingerprint, self.headers], separators=(",", ":"))
+        return head.encode() + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, data: bytes) -> "StoredResponse":
+        head, _, body = data.partition(b"\n")
+        status_code, fingerprint, headers = json.loads(head)
+        return cls(status_code, fingerprint, headers, body)
+
+
+def idempotency_key(method: str, path: str, user_id: int | None, key: str) -> str:
+    """Store key of a request: the Idempotency-Key scoped by method, path and the verified caller"""
+    caller = "anonymous" if user_id is None else f"user{user_id}"
+    return f"{method}:{path}:{caller}:{key}"
+
+
+class IdempotencyStore:
+    """
+    Successful responses of mutating requests by idempotency key, kept for
+    the backend TTL. A key whose first request is still running is claimed
+    in the backend too, so with Redis only one worker runs it.
+    """
+
+    def __init__(self, backend: CacheBackend, claim_ttl: float = 60.0):
+        self.backend = backend
+        # A claim outlives a request but not a worker that died holding it
+        self.claim_ttl = claim_ttl
+        self.replays = 0
+
+    def get(self, key: str) -> StoredResponse | None:
+        data = self.backend.get(key)
+        return StoredResponse.decode(data) if data is not None else None
+
+    def begin(self, key: str) -> bool:
+        """Claim the key for a first execution; False if another one is running"""
+        return self.backend.add(f"{key}:claim", b"", ttl=self.claim_ttl)
+
+    def finish(self, key: str, stored: StoredResponse | None):
+        if stored is not None:
+            self.backend.set(key, stored.encode())
+        self.backend.delete(f"{key}:claim")
+
+    def clear(self):
+        self.backend.clear()
+        self.replays = 0
+
+
+def create_store() -> IdempotencyStore:
+    ttl = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+    claim_ttl = float(os.getenv("IDEMPOTENCY_CLAIM_TTL", "60"))
+    redis_url = os.getenv("IDEMPOTENCY_REDIS_URL") or os.getenv("BILL_CACHE_REDIS_URL")
+    if redis_url:
+        return IdempotencyStore(RedisCacheBackend(redis_url, ttl=ttl, prefix="stb:idem:"), claim_ttl)
+    return IdempotencyStore(MemoryCacheBackend(
+        max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000")),
+        max_bytes=int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(16 * 1024 * 1024))),
+        ttl=ttl,
+    ), claim_ttl)
+
+
+# Singleton instance
+idempotency_store = create_store()
+
+
+class IdempotentRoute(APIRoute):
+    """
+    Route class honoring the Idempotency-Key header on mutating methods.
+    The first request with a key runs normally and a 2xx response is stored;
+    retries with the same key and body get the stored response back (marked
+    with Idempotent-Replayed: true) without running dependencies or services.
+    The session token is checked before anything else, and keys are scoped by
+    method, path and the user it was issued to.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if not self.methods & MUTATING_METHODS:
+            return handler
+
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return await handler(request)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return JSONResponse({"detail": f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters"}, status_code=400)
+
+            # Raises 401 for a bad token as the route's own dependency would, so no replay outlives its session
+            user_id = session_user_id(request.headers.get("authorization"), request.query_params.get("access_token"))
+            store_key = idempotency_key(request.method, request.url.path, user_id, key)
+            fingerprint = hashlib.sha256(await request.body()).hexdigest()
+
+            stored = idempotency_store.get(store_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            if not idempotency_store.begin(store_key):
+                return JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"}, status_code=409)
+
+            result = None
+            try:
+                # The first request may have finished between the lookup and the claim
+                stored = idempotency_store.get(store_key)
+                if stored is not None:
+                    return _replay(stored, fingerprint)
+
+                response = await handler(request)
+                if 200 <= response.status_code < 300 and not hasattr(response, "body_iterator"):
+                    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+                    result = StoredResponse(response.status_code, fingerprint, headers, response.body)
+                return response
+            finally:
+                idempotency_store.finish(store_key, result)
+
+        return idempotent_handler
+
+
+def _replay(stored: StoredResponse, fingerprint: str) -> Response:
+    if stored.fingerprint != fingerprint:
+        return JSONResponse({"detail": f"{IDEMPOTENCY_HEADER} was already used with a different request body"}, status_code=422)
+    idempotency_store.replays += 1
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        headers={**stored.headers, "Idempotent-Replayed": "true"}
+    )
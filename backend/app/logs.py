@@ -0,0 +1,193 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO
+from app.rate_limit import MemoryRateLimitBackend, Policy
+from app.tracing import RequestIdFilter
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# High-frequency INFO logs, rate limited unless LOG_RATE_LIMITS says otherwise
+DEFAULT_RATE_LIMITS = {"app.notifier": 20.0, "sqlalchemy.engine": 200.0}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogSampler(logging.Filter):
+    """
+    Drops part of the records below WARNING of the configured loggers (and
+    their children): sample_rates keeps that fraction of records, rate_limits
+    caps them at that many per second with a burst of one second's worth.
+    """
+
+    def __init__(self, sample_rates: dict[str, float] | None = None, rate_limits: dict[str, float] | None = None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
+        self.buckets = MemoryRateLimitBackend(max_keys=1000)
+        self.dropped = 0
+        self._rules: dict[str, tuple[float | None, str | None]] = {}
+
+    def _rule(self, name: str) -> tuple[float | None, str | None]:
+        """(sample rate, rate-limited logger) of the closest configured ancestor, cached per logger"""
+        rule = self._rules.get(name)
+        if rule is None:
+            sampled = _closest_configured(name, self.sample_rates)
+            rule = (self.sample_rates[sampled] if sampled else None, _closest_configured(name, self.rate_limits))
+            self._rules[name] = rule
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sample_rate, limited = self._rule(record.name)
+        if sample_rate is not None and random.random() >= sample_rate:
+            self.dropped += 1
+            return False
+        if limited is not None:
+            rate = self.rate_limits[limited]
+            if self.buckets.acquire(limited, Policy(rate, max(1, int(rate)))) > 0:
+                self.dropped += 1
+                return False
+        return True
+
+
+def _closest_configured(name: str, rules: dict) -> str | None:
+    while name:
+        if name in rules:
+            return name
+        name = name.rpartition(".")[0]
+    return None
+
+
+# Tracebacks are formatted in the caller's thread, while their frames are still alive
+_traceback_formatter = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: records that find the queue full are counted and dropped"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the args into the message like QueueHandler.prepare, but keep the
+        traceback apart in exc_text instead of appending it to the message, so
+        JsonFormatter can put it in its own field.
+        """
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogPipeline:
+    """Handlers installed by configure_logging, kept for the drop counters and shutdown"""
+
+    def __init__(self, handler: DroppingQueueHandler, sampler: LogSampler, listener: QueueListener):
+        self.handler = handler
+        self.sampler = sampler
+        self.listener = listener
+        self.stopped = False
+
+    def stats(self) -> dict:
+        return {"sampled_out": self.sampler.dropped, "queue_full": self.handler.dropped, "queued": self.handler.queue.qsize()}
+
+    def stop(self):
+        """Flush the queue and detach; safe to call more than once"""
+        if self.stopped:
+            return
+        self.stopped = True
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+
+
+pipeline: LogPipeline | None = None
+_lock = threading.Lock()
+
+
+def _parse_rules(value: str) -> dict[str, float]:
+    """ "app.notifier=20,sqlalchemy.engine=0.1" -> {"app.notifier": 20.0, "sqlalchemy.engine": 0.1}"""
+    rules = {}
+    for part in value.split(","):
+        name, _, number = part.strip().partition("=")
+        if name and number:
+            rules[name.strip()] = float(number)
+    return rules
+
+
+def configure_logging(stream: IO[str] | None = None) -> LogPipeline:
+    """
+    Route all logging through a bounded queue drained by a background thread,
+    so request threads never wait on output. Configured from LOG_LEVEL,
+    LOG_FORMAT (text or json), LOG_QUEUE_SIZE, LOG_SAMPLE_RATES and
+    LOG_RATE_LIMITS; a second call returns the running pipeline.
+    """
+    global pipeline
+    with _lock:
+        if pipeline is not None:
+            return pipeline
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        if os.getenv("LOG_FORMAT", "text").lower() == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        rate_limits = dict(DEFAULT_RATE_LIMITS)
+        rate_limits.update(_parse_rules(os.getenv("LOG_RATE_LIMITS", "")))
+        sampler = LogSampler(
+            sample_rates=_parse_rules(os.getenv("LOG_SAMPLE_RATES", "")),
+            rate_limits={name: rate for name, rate in rate_limits.items() if rate > 0},
+        )
+
+        handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+        # Filters run in the caller's thread: the request id is read there, and sampled-out records are never queued
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(sampler)
+        listener = QueueListener(handler.queue, output, respect_handler_level=True)
+
+        root = logging.getLogger()
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        root.addHandler(handler)
+        listener.start()
+
+        pipeline = LogPipeline(handler, sampler, listener)
+        atexit.register(pipeline.stop)
+        return pipeline
@@ -1,28 +1,75 @@
-import logging
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.logs import configure_logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
+import asyncio
+import os
+import signal
+import threading
 from contextlib import asynccontextmanager
-from app.database import create_db_and_tables
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import Engine
+from app.database import create_db_and_tables, engine, get_engine
+from app.deadlines import DeadlineExceeded, apply_deadline, deadline_expired, enforce_deadlines, is_timeout_error
+from app.health import check_readiness
+from app.metrics import MetricsMiddleware, metrics, instrument_engine, pool_collector, app_collector
+from app.profiling import ProfilingMiddleware, profiling_options
+from app.tracing import TracingMiddleware, trace_engine
+from app.notifier import notifier
 from app.routers import users, bills
+from app.routers.v2 import users as users_v2, bills as bills_v2
+
+
+def drain_options() -> dict:
+    return {
+        "duration": float(os.getenv("SSE_DRAIN_SECONDS", "10")),
+        "retry_ms": int(os.getenv("SSE_RECONNECT_MS", "1000")),
+        "jitter_ms": int(os.getenv("SSE_RECONNECT_JITTER_MS", "5000")),
+    }
+
+
+def drain_on_exit_signal():
+    """
+    uvicorn waits for open connections to close before running the lifespan
+    shutdown, so event streams would hold it up (or be cut) before drain()
+    runs there: start the drain on SIGTERM/SIGINT too, then let uvicorn's
+    own handler proceed.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(signum)
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(lambda: notifier.start_drain(**drain_options()))
+            if callable(previous):
+                previous(signum, frame)
+
+        signal.signal(signum, handler)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    drain_on_exit_signal()
     yield
+    await notifier.drain(**drain_options())
 
 
 app = FastAPI(
     title="Split The Bill API",
     description="Backend API for Split The Bill Telegram Mini App",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    dependencies=[Depends(apply_deadline)],
 )
 
+profiling = profiling_options()
+if profiling is not None:
+    app.add_middleware(ProfilingMiddleware, **profiling)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,10 +77,30 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+# Outermost, so the correlation id covers everything below
+app.add_middleware(TracingMiddleware)
+
+enforce_deadlines(engine)
+instrument_engine(engine)
+trace_engine(engine)
+metrics.add_collector(pool_collector(engine))
+metrics.add_collector(app_collector)
 
 
 app.include_router(users.router, prefix="/api")
 app.include_router(bills.router, prefix="/api")
+app.include_router(users_v2.router, prefix="/api/v2")
+app.include_router(bills_v2.router, prefix="/api/v2")
+
+
+@app.exception_handler(DBAPIError)
+async def database_error_handler(request: Request, exc: DBAPIError):
+    """Statements cut short by the request deadline become the same 503 as a deadline hit between statements"""
+    if deadline_expired() or is_timeout_error(exc):
+        deadline = DeadlineExceeded()
+        return JSONResponse({"detail": deadline.detail}, status_code=deadline.status_code, headers=deadline.headers)
+    raise exc
 
 
 @app.get("/")
@@ -46,5 +113,20 @@ def root():
 
 
 @app.get("/api/health")
-def health_check():
+@app.get("/api/health/live")
+async def health_check():
+    """Liveness: the process answers; async so a saturated threadpool cannot fail it"""
     return {"status": "healthy"}
+
+
+@app.get("/api/health/ready")
+async def readiness_check(db_engine: Engine = Depends(get_engine)):
+    """Readiness: 503 while the DB is unreachable or pool, threadpool or SSE load is over threshold"""
+    ready, checks = await check_readiness(db_engine)
+    return JSONResponse({"status": "ready" if ready else "unavailable", "checks": checks}, status_code=200 if ready else 503)
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics of this process"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,258 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    """Cumulative-on-export histogram; observe() is a bisect and two additions"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestDbStats:
+    """DB work of one request, filled in by the engine events"""
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Set by MetricsMiddleware; sync routes run in the threadpool with a copy of
+# the context, which still points at the same stats object
+current_db_stats: ContextVar[RequestDbStats | None] = ContextVar("current_db_stats", default=None)
+
+
+class RouteMetrics:
+    __slots__ = ("statuses", "latency", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.statuses: dict[int, int] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram(LATENCY_BUCKETS)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.db_queries_total = 0
+        self.db_seconds_total = 0.0
+        self.collectors: list = []  # callables returning [(name, type, help, value)]
+        self._lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, db: RequestDbStats):
+        with self._lock:
+            metrics = self.routes.get((method, route))
+            if metrics is None:
+                metrics = self.routes[(method, route)] = RouteMetrics()
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.latency.observe(seconds)
+            metrics.db_queries.observe(db.queries)
+            metrics.db_seconds.observe(db.seconds)
+
+    def observe_query(self, seconds: float):
+        with self._lock:
+            self.db_queries_total += 1
+            self.db_seconds_total += seconds
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def clear(self):
+        with self._lock:
+            self.routes.clear()
+            self.db_queries_total = 0
+            self.db_seconds_total = 0.0
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            routes = list(self.routes.items())
+            lines = [
+                "# HELP http_requests_total Requests by route and status code",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            for name, help_text, attr in (
+                ("http_request_duration_seconds", "Request latency", "latency"),
+                ("http_request_db_queries", "DB queries per request", "db_queries"),
+                ("http_request_db_seconds", "DB time per request", "db_seconds"),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), metrics in routes:
+                    _render_histogram(lines, name, f'method="{method}",route="{route}"', getattr(metrics, attr))
+
+            lines += [
+                "# HELP db_queries_total DB queries executed",
+                "# TYPE db_queries_total counter",
+                f"db_queries_total {self.db_queries_total}",
+                "# HELP db_query_seconds_total Time spent in DB queries",
+                "# TYPE db_query_seconds_total counter",
+                f"db_query_seconds_total {self.db_seconds_total:.6f}",
+            ]
+
+        for collect in self.collectors:
+            for name, kind, help_text, value in collect():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines: list[str], name: str, labels: str, histogram: Histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and records it under its route template (not the raw path)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Shared with the profiling middleware when that one runs outside this one
+        db = current_db_stats.get()
+        token = None
+        if db is None:
+            db = RequestDbStats()
+            token = current_db_stats.set(db)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if token is not None:
+                current_db_stats.reset(token)
+            metrics.observe_request(scope["method"], route_label(scope), status, time.perf_counter() - start, db)
+
+
+def route_label(scope: Scope) -> str:
+    """
+    Full template of the matched route, e.g. /api/bills/{bill_id}. Routes of
+    included routers only know their own path, so the prefix is whatever
+    part of the request path precedes the segment they match.
+    """
+    route = scope.get("route")
+    route_path = getattr(route, "path", None)
+    if route_path is None:
+        return "unmatched"
+    path = scope["path"]
+    for i, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[i:]):
+            return path[:i] + route_path
+    return route_path
+
+
+_instrumented_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every query of engine, globally and for the current request"""
+    if engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        metrics.observe_query(elapsed)
+        db = current_db_stats.get()
+        if db is not None:
+            db.queries += 1
+            db.seconds += elapsed
+
+
+def pool_collector(engine: Engine):
+    """Collector for the connection pool of engine (pools without a size report checkouts only)"""
+    def collect():
+        pool = engine.pool
+        values = [("db_pool_checked_out", "gauge", "Connections in use", pool.checkedout() if hasattr(pool, "checkedout") else 0)]
+        if hasattr(pool, "size"):
+            values.append(("db_pool_size", "gauge", "Pool size", pool.size()))
+        return values
+    return collect
+
+
+def app_collector():
+    """Notifier, cache and limiter state; imported lazily as those modules are wired up after this one"""
+    from app.cache import bill_detail_cache, user_profile_cache
+    from app.idempotency import idempotency_store
+    from app import logs
+    from app.notifier import notifier
+    from app.rate_limit import rate_limiter
+    from app.tracing import tracer
+
+    notifier_stats = notifier.stats()
+    bill_cache = bill_detail_cache.stats()
+    user_cache = user_profile_cache.stats()
+    log_stats = logs.pipeline.stats() if logs.pipeline else {"sampled_out": 0, "queue_full": 0, "queued": 0}
+    return [
+        ("sse_subscribed_bills", "gauge", "Bills with at least one SSE subscriber", notifier_stats["bills"]),
+        ("sse_subscribers", "gauge", "Open SSE subscriptions", notifier_stats["subscribers"]),
+        ("sse_queued_messages", "gauge", "Messages waiting in subscriber queues", notifier_stats["queued_messages"]),
+        ("sse_rejections_total", "counter", "SSE subscriptions refused by admission limits", notifier_stats["rejections"]),
+        ("bill_cache_hits_total", "counter", "Bill detail cache hits", bill_cache["hits"]),
+        ("bill_cache_misses_total", "counter", "Bill detail cache misses", bill_cache["misses"]),
+        ("bill_cache_evictions_total", "counter", "Bill detail cache evictions", bill_cache["evictions"]),
+        ("user_cache_hits_total", "counter", "User profile cache hits", user_cache["hits"]),
+        ("user_cache_misses_total", "counter", "User profile cache misses", user_cache["misses"]),
+        ("user_cache_evictions_total", "counter", "User profile cache evictions", user_cache["evictions"]),
+        ("idempotent_replays_total", "counter", "Responses replayed for a repeated Idempotency-Key", idempotency_store.replays),
+        ("rate_limit_rejections_total", "counter", "Requests rejected by the rate limiter", rate_limiter.rejections),
+        ("log_records_sampled_out_total", "counter", "Log records dropped by sampling and rate limits", log_stats["sampled_out"]),
+        ("log_records_queue_full_total", "counter", "Log records dropped because the log queue was full", log_stats["queue_full"]),
+        ("log_queue_size", "gauge", "Log records waiting to be written", log_stats["queued"]),
+        ("trace_spans_dropped_total", "counter", "Spans dropped because the export queue was full", getattr(tracer.exporter, "dropped", 0)),
+    ]
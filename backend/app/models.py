@@ -3,6 +3,7 @@ from sqlalchemy import Index, BigInteger, func
 from datetime import datetime
 from typing import Optional
 from sqlmodel import Field, SQLModel, Relationship
+from app.utils.currency import DEFAULT_CURRENCY
 
 
 class SplitType(str, Enum):
@@ -57,10 +58,12 @@ class Bill(TimestampModel, table=True):
     owner_id: int = Field(foreign_key="users.id")
     total_sum: int = Field(default=0, sa_type=BigInteger, description="Total amount in smallest currency unit (cents/kopeks/tiins)")
     unallocated_sum: int = Field(default=0, sa_type=BigInteger, description="Remaining unallocated amount")
+    currency: str = Field(default=DEFAULT_CURRENCY, max_length=3, sa_column_kwargs={"server_default": DEFAULT_CURRENCY}, description="ISO 4217 code, defines the minor unit of all amounts")
     title: Optional[str] = None
     payment_details: Optional[str] = Field(description="Payment details like card number")
     split_type: str = Field(default=SplitType.MANUAL)
     status: str = Field(default=BillStatus.OPEN)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"}, description="Bumped on every change of the bill, its items or participants")
     
     # Relationships
     owner: User = Relationship(back_populates="owned_bills")
@@ -83,6 +86,7 @@ class BillItem(TimestampModel, table=True):
     # Relationships
     bill: Bill = Relationship(back_populates="items")
     assigned_to: Optional[User] = Relationship()
+    shares: list["BillItemShare"] = Relationship(back_populates="item", cascade_delete=True)
 
 
 class BillUser(TimestampModel, table=True):
@@ -105,3 +109,23 @@ class BillUser(TimestampModel, table=True):
     # Relationships
     bill: Bill = Relationship(back_populates="participants")
     user: Optional[User] = Relationship(back_populates="bill_participations")
+    item_shares: list["BillItemShare"] = Relationship(back_populates="participant", cascade_delete=True)
+
+
+class BillItemShare(TimestampModel, table=True):
+    """Weighted share of a bill item taken by a participant"""
+    __tablename__ = "bill_item_shares"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    item_id: int = Field(foreign_key="bill_items.id", index=True)
+    participant_id: int = Field(foreign_key="bills_users.id", index=True)
+    weight: int = Field(default=1, description="Relative weight of this share within the item")
+
+    __table_args__ = (
+        # A participant can hold only one share of the same item
+        Index("ix_bill_item_share_unique", "item_id", "participant_id", unique=True),
+    )
+
+    # Relationships
+    item: BillItem = Relationship(back_populates="shares")
+    participant: BillUser = Relationship(back_populates="item_shares")
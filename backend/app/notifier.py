@@ -1,45 +1,232 @@
 import asyncio
 import logging
-from typing import Dict, Set
+import math
+import os
+import random
+from typing import Callable, Dict, List, Set
+from app.tracing import current_request_id
 
 logger = logging.getLogger(__name__)
 
+# Last event of a stream closed by a drain; sent with a retry hint, then the stream ends
+RECONNECT = "RECONNECT"
+
+
+class Subscription:
+    """One open event stream: its queue of (message, request id of the change) and who holds it"""
+    __slots__ = ("bill_id", "user_id", "queue", "retry_ms", "closed")
+
+    def __init__(self, bill_id: int, user_id: int | None):
+        self.bill_id = bill_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.retry_ms: int | None = None
+        self.closed = False
+
+
 class Notifier:
-    def __init__(self):
-        # bill_id -> set of queues
-        self.connections: Dict[int, Set[asyncio.Queue]] = {}
+    def __init__(self, max_connections: int = 5000, max_per_bill: int = 100, max_per_user: int = 5,
+                 presence_debounce: float = 1.0):
+        # bill_id -> open subscriptions
+        self.connections: Dict[int, Set[Subscription]] = {}
+        # user_id -> open subscriptions of that user (anonymous streams are not counted)
+        self.user_connections: Dict[int, int] = {}
+        # bill_id -> user_id -> open subscriptions of that user to the bill
+        self.presence: Dict[int, Dict[int, int]] = {}
+        self.presence_debounce = presence_debounce
+        self._presence_pending: Set[int] = set()
+        self._presence_sent: Dict[int, frozenset] = {}
+        # Called with (bill_id, message) on every broadcast, even without listeners
+        self.listeners: List[Callable[[int, str], None]] = []
+        self.max_connections = max_connections
+        self.max_per_bill = max_per_bill
+        self.max_per_user = max_per_user
+        self.total = 0
+        self.rejections = 0
+        self.draining = False
+        self._drain_task: asyncio.Task | None = None
 
-    async def subscribe(self, bill_id: int):
-        queue = asyncio.Queue()
-        if bill_id not in self.connections:
-            self.connections[bill_id] = set()
-        self.connections[bill_id].add(queue)
-        
-        logger.info(f"New subscription for bill {bill_id}. Total listeners: {len(self.connections[bill_id])}")
-        
+    @classmethod
+    def from_env(cls) -> "Notifier":
+        return cls(
+            max_connections=int(os.getenv("SSE_MAX_CONNECTIONS", "5000")),
+            max_per_bill=int(os.getenv("SSE_MAX_PER_BILL", "100")),
+            max_per_user=int(os.getenv("SSE_MAX_PER_USER", "5")),
+            presence_debounce=float(os.getenv("SSE_PRESENCE_DEBOUNCE_MS", "1000")) / 1000,
+        )
+
+    def add_listener(self, callback: Callable[[int, str], None]):
+        self.listeners.append(callback)
+
+    def admission_error(self, bill_id: int, user_id: int | None) -> str | None:
+        """Why a new stream cannot be opened ("draining", "capacity", "bill" or "user"), None if it can"""
+        if self.draining:
+            reason = "draining"
+        elif self.total >= self.max_connections:
+            reason = "capacity"
+        elif len(self.connections.get(bill_id, ())) >= self.max_per_bill:
+            reason = "bill"
+        elif user_id is not None and self.user_connections.get(user_id, 0) >= self.max_per_user:
+            reason = "user"
+        else:
+            return None
+        self.rejections += 1
+        return reason
+
+    def open(self, bill_id: int, user_id: int | None = None) -> Subscription:
+        """Register a stream; it counts against the limits until close(). Event loop only, as is close()."""
+        subscription = Subscription(bill_id, user_id)
+        self.connections.setdefault(bill_id, set()).add(subscription)
+        if user_id is not None:
+            self.user_connections[user_id] = self.user_connections.get(user_id, 0) + 1
+            viewers = self.presence.setdefault(bill_id, {})
+            viewers[user_id] = viewers.get(user_id, 0) + 1
+            if viewers[user_id] == 1:
+                self._presence_changed(bill_id)
+        self.total += 1
+        logger.info("New subscription for bill %s. Total listeners: %s", bill_id, len(self.connections[bill_id]))
+        return subscription
+
+    def close(self, subscription: Subscription):
+        """Unregister a stream; safe to call more than once"""
+        if subscription.closed:
+            return
+        subscription.closed = True
+        bill_id = subscription.bill_id
+        self.connections[bill_id].discard(subscription)
+        if not self.connections[bill_id]:
+            del self.connections[bill_id]
+        user_id = subscription.user_id
+        if user_id is not None:
+            self.user_connections[user_id] -= 1
+            if not self.user_connections[user_id]:
+                del self.user_connections[user_id]
+            viewers = self.presence[bill_id]
+            viewers[user_id] -= 1
+            if not viewers[user_id]:
+                del viewers[user_id]
+                if not viewers:
+                    del self.presence[bill_id]
+                self._presence_changed(bill_id)
+        self.total -= 1
+        logger.info("Subscription ended for bill %s. Remaining: %s", bill_id, len(self.connections.get(bill_id, [])))
+
+    async def listen(self, subscription: Subscription):
+        """Events of an open subscription; ends after RECONNECT when the subscription is drained"""
+        while True:
+            try:
+                # Wait for a message with a timeout for heartbeat
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=20.0)
+                yield event
+                if event[0] == RECONNECT and subscription.retry_ms is not None:
+                    return
+            except asyncio.TimeoutError:
+                # Send a comment line as heartbeat to keep connection alive
+                yield ": ping\n", None
+
+    async def subscribe(self, bill_id: int, user_id: int | None = None):
+        """open() and listen() in one, closing the subscription when the caller stops iterating"""
+        subscription = self.open(bill_id, user_id)
         try:
-            while True:
-                try:
-                    # Wait for a message with a timeout for heartbeat
-                    message = await asyncio.wait_for(queue.get(), timeout=20.0)
-                    yield message
-                except asyncio.TimeoutError:
-                    # Send a comment line as heartbeat to keep connection alive
-                    yield ": ping\n"
+            async for event in self.listen(subscription):
+                yield event
         finally:
-            self.connections[bill_id].remove(queue)
-            if not self.connections[bill_id]:
-                del self.connections[bill_id]
-            logger.info(f"Subscription ended for bill {bill_id}. Remaining: {len(self.connections.get(bill_id, []))}")
+            self.close(subscription)
+
+    def viewers(self, bill_id: int) -> dict:
+        """Users with a stream open to the bill, and the number of anonymous streams"""
+        viewers = self.presence.get(bill_id, {})
+        return {
+            "user_ids": sorted(viewers),
+            "anonymous": len(self.connections.get(bill_id, ())) - sum(viewers.values()),
+        }
+
+    def _presence_changed(self, bill_id: int):
+        """
+        Broadcast the viewers of the bill presence_debounce seconds after the
+        first change, so a burst of joins and leaves (a table opening the bill
+        together, a flaky connection) makes one PRESENCE event, or none if the
+        set ends up as it was. Streams ending in a drain are not reported.
+        """
+        if self.draining or bill_id in self._presence_pending:
+            return
+        # Raises off the event loop: the queues and sets here are not thread-safe
+        loop = asyncio.get_running_loop()
+        self._presence_pending.add(bill_id)
+        loop.call_later(self.presence_debounce, self._send_presence, bill_id)
+
+    def _send_presence(self, bill_id: int):
+        self._presence_pending.discard(bill_id)
+        viewers = frozenset(self.presence.get(bill_id, ()))
+        if viewers == self._presence_sent.get(bill_id, frozenset()):
+            return
+        if viewers:
+            self._presence_sent[bill_id] = viewers
+        else:
+            self._presence_sent.pop(bill_id, None)
+        self.broadcast(bill_id, "PRESENCE:" + ",".join(str(user_id) for user_id in sorted(viewers)))
+
+    def stats(self) -> dict:
+        subscriptions = [subscription for subscriptions in list(self.connections.values()) for subscription in list(subscriptions)]
+        return {
+            "bills": len(self.connections),
+            "subscribers": len(subscriptions),
+            "queued_messages": sum(subscription.queue.qsize() for subscription in subscriptions),
+            "rejections": self.rejections,
+            "draining": self.draining,
+        }
 
     def broadcast(self, bill_id: int, message: str):
+        for callback in self.listeners:
+            callback(bill_id, message)
+
         if bill_id not in self.connections:
             return
-            
-        for queue in self.connections[bill_id]:
-            queue.put_nowait(message)
-        
-        logger.info(f"Broadcasted '{message}' to {len(self.connections[bill_id])} listeners of bill {bill_id}")
+
+        event = (message, current_request_id.get())
+        for subscription in self.connections[bill_id]:
+            subscription.queue.put_nowait(event)
+
+        # Lazy arguments: records dropped by the sampler are never formatted
+        logger.info("Broadcasted '%s' to %s listeners of bill %s", message, len(self.connections[bill_id]), bill_id)
+
+    def start_drain(self, duration: float = 10.0, retry_ms: int = 1000, jitter_ms: int = 5000) -> asyncio.Task:
+        """Start draining in the background (once); see drain()"""
+        if self._drain_task is None:
+            self.draining = True
+            self._drain_task = asyncio.get_running_loop().create_task(self._drain(duration, retry_ms, jitter_ms))
+        return self._drain_task
+
+    async def drain(self, duration: float = 10.0, retry_ms: int = 1000, jitter_ms: int = 5000):
+        """
+        Refuse new streams and end the open ones in random order spread over
+        duration seconds. Each gets RECONNECT with an SSE retry of retry_ms
+        plus up to jitter_ms, so clients come back to the next instance
+        spread out instead of all at once.
+        """
+        await self.start_drain(duration, retry_ms, jitter_ms)
+
+    async def _drain(self, duration: float, retry_ms: int, jitter_ms: int):
+        subscriptions = [subscription for subscriptions in list(self.connections.values()) for subscription in subscriptions]
+        random.shuffle(subscriptions)
+        logger.info("Draining %s subscriptions over %.1f s", len(subscriptions), duration)
+
+        # Batches every 100 ms rather than one sleep per stream
+        steps = max(1, int(duration * 10))
+        batch_size = max(1, math.ceil(len(subscriptions) / steps))
+        for start in range(0, len(subscriptions), batch_size):
+            if start:
+                await asyncio.sleep(0.1)
+            for subscription in subscriptions[start:start + batch_size]:
+                subscription.retry_ms = retry_ms + random.randint(0, jitter_ms)
+                subscription.queue.put_nowait((RECONNECT, None))
+
+        # Give the streams a moment to send their last event and close
+        for _ in range(50):
+            if not self.total:
+                break
+            await asyncio.sleep(0.1)
+
 
 # Singleton instance
-notifier = Notifier()
+notifier = Notifier.from_env()
@@ -0,0 +1,174 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.metrics import RequestDbStats, current_db_stats
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+APP_DIR = str(Path(__file__).resolve().parent)
+
+
+class RequestProfile:
+    """Timings of a profiled request that the middleware cannot observe itself"""
+    __slots__ = ("serialization_seconds",)
+
+    def __init__(self):
+        self.serialization_seconds = 0.0
+
+
+# Set only while a profiled request runs; ModelResponse adds its render time
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the Python stacks of all threads every interval seconds, keeping
+    those that run app code. Sync routes run in the threadpool, so there is
+    no single thread to watch: concurrent requests show up in the profile too.
+    """
+
+    def __init__(self, interval: float, max_seconds: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop_event.wait(self.interval) and time.monotonic() < deadline:
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _app_stack(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _app_stack(frame) -> tuple[str, ...] | None:
+    """Root-first frame labels, or None if no frame belongs to the app (profiler excluded)"""
+    labels = []
+    in_app = False
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(APP_DIR) and not code.co_filename.endswith("profiling.py"):
+            in_app = True
+        labels.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return tuple(reversed(labels)) if in_app else None
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("/site-packages/", "/backend/"):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return filename
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests carrying an X-Profile header (equal to the token when
+    one is configured): stacks are sampled while the request runs and written
+    in folded format (flamegraph.pl, speedscope) to directory, and the
+    response gets Server-Timing with wall, DB and serialization time. Only
+    installed when PROFILING_ENABLED is set; one profiled request at a time.
+    """
+
+    def __init__(self, app: ASGIApp, directory: str = "profiles", token: str | None = None,
+                 interval: float = 0.001, max_seconds: float = 30.0):
+        self.app = app
+        self.directory = Path(directory)
+        self.token = token
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return value.decode() == self.token if self.token else True
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._requested(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profile = RequestProfile()
+            token = current_profile.set(profile)
+            # The metrics middleware counts queries into the same object, whichever runs outside
+            db = current_db_stats.get()
+            db_token = None
+            if db is None:
+                db = RequestDbStats()
+                db_token = current_db_stats.set(db)
+            db_before = (db.queries, db.seconds)
+
+            path = self._profile_path(scope)
+            sampler = StackSampler(self.interval, self.max_seconds)
+            start = time.perf_counter()
+            sampler.start()
+
+            async def send_with_timing(message: Message):
+                if message["type"] == "http.response.start":
+                    queries = db.queries - db_before[0]
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", ", ".join((
+                        f"total;dur={(time.perf_counter() - start) * 1000:.1f}",
+                        f'db;dur={(db.seconds - db_before[1]) * 1000:.1f};desc="{queries} queries"',
+                        f"serialize;dur={profile.serialization_seconds * 1000:.1f}",
+                    )))
+                    headers.append("X-Profile-File", path.name)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                sampler.stop()
+                current_profile.reset(token)
+                if db_token is not None:
+                    current_db_stats.reset(db_token)
+                self._write(path, sampler)
+        finally:
+            self._busy.release()
+
+    def _profile_path(self, scope: Scope) -> Path:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+        return self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{scope['method']}-{slug}.folded"
+
+    def _write(self, path: Path, sampler: StackSampler):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+        logger.info("Profile written to %s (%s samples, %s app stacks)", path, sampler.samples, sum(sampler.stacks.values()))
+
+
+def profiling_options() -> dict | None:
+    """Middleware options from the environment, or None when profiling is off (the default)"""
+    if os.getenv("PROFILING_ENABLED", "false").lower() != "true":
+        return None
+    return {
+        "directory": os.getenv("PROFILING_DIR", "profiles"),
+        "token": os.getenv("PROFILING_TOKEN") or None,
+        "interval": float(os.getenv("PROFILING_INTERVAL_MS", "1")) / 1000,
+        "max_seconds": float(os.getenv("PROFILING_MAX_SECONDS", "30")),
+    }
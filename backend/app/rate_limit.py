@@ -0,0 +1,205 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Protocol
+from fastapi import Depends, HTTPException, Request
+from app.dependencies import get_current_user_id
+
+logger = logging.getLogger(__name__)
+
+
+class Policy(NamedTuple):
+    rate: float  # tokens refilled per second
+    burst: int   # bucket capacity
+
+
+class RateLimitBackend(Protocol):
+    def acquire(self, key: str, policy: Policy) -> float:
+        """Take one token; returns 0 if allowed, else seconds until a token is available"""
+        ...
+
+    def acquire_all(self, buckets: list[tuple[str, Policy]]) -> float:
+        """Take one token from every bucket, or from none if any is empty; returns 0 or the longest wait"""
+        ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryRateLimitBackend:
+    """Token buckets of this process; the least recently used ones are dropped beyond max_keys"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, policy: Policy) -> float:
+        return self.acquire_all([(key, policy)])
+
+    def acquire_all(self, buckets: list[tuple[str, Policy]]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            retry_after = 0.0
+            for key, policy in buckets:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    tokens = policy.burst
+                else:
+                    tokens = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+                    self._buckets.move_to_end(key)
+                if tokens < 1:
+                    retry_after = max(retry_after, (1 - tokens) / policy.rate)
+                levels.append(tokens)
+
+            taken = 0 if retry_after else 1
+            for (key, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - taken, now)
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisRateLimitBackend:
+    """Token buckets shared by all workers, updated atomically by a Lua script"""
+
+    # ARGV: now, then rate and burst of each key
+    script = """
+        local now = tonumber(ARGV[1])
+        local levels = {}
+        local retry_after = 0
+        for i, key in ipairs(KEYS) do
+            local rate = tonumber(ARGV[2 * i])
+            local burst = tonumber(ARGV[2 * i + 1])
+            local state = redis.call('HMGET', key, 'tokens', 'ts')
+            local tokens = tonumber(state[1]) or burst
+            local ts = tonumber(state[2]) or now
+            tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+            if tokens < 1 then
+                retry_after = math.max(retry_after, (1 - tokens) / rate)
+            end
+            levels[i] = tokens
+        end
+        local taken = 1
+        if retry_after > 0 then
+            taken = 0
+        end
+        for i, key in ipairs(KEYS) do
+            local rate = tonumber(ARGV[2 * i])
+            local burst = tonumber(ARGV[2 * i + 1])
+            redis.call('HSET', key, 'tokens', levels[i] - taken, 'ts', now)
+            redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+        end
+        return tostring(retry_after)
+    """
+
+    def __init__(self, url: str, prefix: str = "stb:rl:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._acquire = self.client.register_script(self.script)
+
+    def acquire(self, key: str, policy: Policy) -> float:
+        return self.acquire_all([(key, policy)])
+
+    def acquire_all(self, buckets: list[tuple[str, Policy]]) -> float:
+        args = [time.time()]
+        for _, policy in buckets:
+            args += [policy.rate, policy.burst]
+        return float(self._acquire(keys=[self.prefix + key for key, _ in buckets], args=args))
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class RateLimiter:
+    """
+    Named token-bucket policies over a backend. Defaults are generous: they
+    only stop clients that hammer the API, never a person tapping buttons.
+    """
+
+    def __init__(self, backend: RateLimitBackend, policies: dict[str, Policy], enabled: bool = True):
+        self.backend = backend
+        self.policies = policies
+        self.enabled = enabled
+        self.rejections = 0
+
+    def check(self, policy_name: str, key: str):
+        """Raise 429 with Retry-After if the bucket of key under policy_name is empty"""
+        self.check_all([(policy_name, key)])
+
+    def check_all(self, buckets: list[tuple[str, str]]):
+        """
+        check() for several (policy_name, key) buckets at once: a token is
+        taken from each only when none is empty, so a rejection by one bucket
+        does not spend the others.
+        """
+        if not self.enabled:
+            return
+        retry_after = self.backend.acquire_all([(f"{name}:{key}", self.policies[name]) for name, key in buckets])
+        if retry_after > 0:
+            self.rejections += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    def reset(self):
+        self.backend.clear()
+        self.rejections = 0
+
+
+def _policy(name: str, rate: float, burst: int) -> Policy:
+    return Policy(
+        rate=float(os.getenv(f"RATE_LIMIT_{name}_RATE", str(rate))),
+        burst=int(os.getenv(f"RATE_LIMIT_{name}_BURST", str(burst))),
+    )
+
+
+def create_rate_limiter() -> RateLimiter:
+    policies = {
+        "user": _policy("USER", 10, 30),        # mutations per user (or client address)
+        "bill": _policy("BILL", 20, 60),        # mutations per bill, from all users together
+        "reaction": _policy("REACTION", 5, 10), # reactions per user
+    }
+    enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+    redis_url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if redis_url:
+        logger.info("Using Redis rate limiter")
+        return RateLimiter(RedisRateLimitBackend(redis_url), policies, enabled)
+    return RateLimiter(MemoryRateLimitBackend(), policies, enabled)
+
+
+# Singleton instance
+rate_limiter = create_rate_limiter()
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def enforce_rate_limit(request: Request, current_user_id: int | None = Depends(get_current_user_id)):
+    """Bill router dependency: mutations take a token per user and per bill, reactions per user"""
+    if request.method not in MUTATING_METHODS:
+        return
+
+    subject = f"u{current_user_id}" if current_user_id is not None else f"ip{request.client.host if request.client else ''}"
+    if request.url.path.endswith("/reactions"):
+        rate_limiter.check("reaction", subject)
+        return
+
+    buckets = [("user", subject)]
+    bill_id = request.path_params.get("bill_id")
+    if bill_id is not None:
+        buckets.append(("bill", str(bill_id)))
+    rate_limiter.check_all(buckets)
@@ -1,8 +1,9 @@
-from sqlmodel import Session, select, or_, func
+from sqlmodel import Session, select, or_, and_, func, update, delete, insert
 from sqlalchemy import exists, select as sa_select
-from sqlalchemy.orm import selectinload
-from app.models import Bill, BillItem, BillUser
+from app.models import Bill, BillItem, BillUser, BillItemShare
+from app.tracing import traced
 
+@traced("repository")
 class BillRepository:
     def __init__(self, session: Session):
         self.session = session
@@ -16,9 +17,33 @@ class BillRepository:
     def get_by_id(self, bill_id: int) -> Bill | None:
         return self.session.get(Bill, bill_id)
 
+    def get_version(self, bill_id: int) -> int | None:
+        statement = select(Bill.version).where(Bill.id == bill_id)
+        return self.session.exec(statement).first()
+
+    def bump_version(self, bill: Bill):
+        # Evaluated by the database on flush, so concurrent bumps never collapse into one
+        bill.version = Bill.version + 1
+        self.session.add(bill)
+
+    def bump_versions_for_user(self, user_id: int):
+        participated = sa_select(BillUser.bill_id).where(BillUser.user_id == user_id)
+        statement = (
+            update(Bill)
+            .where(Bill.id.in_(participated))
+            .values(version=Bill.version + 1)
+        )
+        self.session.execute(statement)
+
+    def _user_bills_filter(self, user_id: int):
+        return or_(
+            Bill.owner_id == user_id,
+            exists().where(
+                and_(BillUser.bill_id == Bill.id, BillUser.user_id == user_id)
+            )
+        )
+
     def get_user_bills(self, user_id: int, offset: int = 0, limit: int = 10) -> list[tuple[Bill, int]]:
-        from sqlmodel import and_
-        
         # Subquery for participant count, correlated to the outer Bill
         count_stmt = (
             sa_select(func.count(BillUser.id))
@@ -29,14 +54,7 @@ class BillRepository:
 
         statement = (
             select(Bill, count_stmt.label("participants_count"))
-            .where(
-                or_(
-                    Bill.owner_id == user_id,
-                    exists().where(
-                        and_(BillUser.bill_id == Bill.id, BillUser.user_id == user_id)
-                    )
-                )
-            )
+            .where(self._user_bills_filter(user_id))
             .order_by(Bill.created_at.desc())
             .offset(offset)
             .limit(limit)
@@ -44,11 +62,27 @@ class BillRepository:
         # Each row is (Bill, participants_count)
         return self.session.exec(statement).all()
 
-    def add_item(self, item: BillItem) -> BillItem:
+    def get_user_bills_versions(self, user_id: int, offset: int = 0, limit: int = 10) -> list[tuple[int, int]]:
+        statement = (
+            select(Bill.id, Bill.version)
+            .where(self._user_bills_filter(user_id))
+            .order_by(Bill.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        return self.session.exec(statement).all()
+
+    def add_item(self, item: BillItem, shares: list[BillItemShare] | None = None) -> tuple[BillItem, list[BillItemShare]]:
+        """Insert the item and its shares in one transaction; the shares get the new item's id"""
         self.session.add(item)
+        if shares:
+            self.session.flush()
+            for share in shares:
+                share.item_id = item.id
+            self._insert_shares(shares)
         self.session.commit()
         self.session.refresh(item)
-        return item
+        return item, self.get_item_shares_by_item_id(item.id) if shares else []
 
     def add_participant(self, participant: BillUser) -> BillUser:
         self.session.add(participant)
@@ -61,7 +95,7 @@ class BillRepository:
         return self.session.exec(statement).all()
 
     def get_participants_by_bill_id(self, bill_id: int) -> list[BillUser]:
-        statement = select(BillUser).where(BillUser.bill_id == bill_id).options(selectinload(BillUser.user))
+        statement = select(BillUser).where(BillUser.bill_id == bill_id)
         return self.session.exec(statement).all()
 
     def get_participant_by_id(self, participant_id: int) -> BillUser | None:
@@ -83,5 +117,37 @@ class BillRepository:
         return self.session.exec(statement).all()
 
     def get_participant_by_bill_and_user(self, bill_id: int, user_id: int) -> BillUser | None:
-        statement = select(BillUser).where(BillUser.bill_id == bill_id, BillUser.user_id == user_id).options(selectinload(BillUser.user))
+        statement = select(BillUser).where(BillUser.bill_id == bill_id, BillUser.user_id == user_id)
         return self.session.exec(statement).first()
+
+    def is_member(self, bill_id: int, user_id: int) -> bool | None:
+        """Whether user_id owns or takes part in the bill; None if there is no such bill"""
+        participates = exists().where(BillUser.bill_id == bill_id, BillUser.user_id == user_id)
+        statement = sa_select(Bill.owner_id == user_id, participates).where(Bill.id == bill_id)
+        row = self.session.execute(statement).first()
+        return None if row is None else bool(row[0] or row[1])
+
+    def get_item_shares_by_bill_id(self, bill_id: int) -> list[BillItemShare]:
+        statement = (
+            select(BillItemShare)
+            .join(BillItem, BillItem.id == BillItemShare.item_id)
+            .where(BillItem.bill_id == bill_id)
+            .order_by(BillItemShare.item_id, BillItemShare.id)
+        )
+        return self.session.exec(statement).all()
+
+    def get_item_shares_by_item_id(self, item_id: int) -> list[BillItemShare]:
+        statement = select(BillItemShare).where(BillItemShare.item_id == item_id).order_by(BillItemShare.id)
+        return self.session.exec(statement).all()
+
+    def replace_item_shares(self, item_id: int, shares: list[BillItemShare]) -> list[BillItemShare]:
+        # One DELETE and one executemany INSERT however many shares there are;
+        # the ORM would insert row by row on SQLite to fetch each new id
+        self.session.execute(delete(BillItemShare).where(BillItemShare.item_id == item_id))
+        if shares:
+            self._insert_shares(shares)
+        self.session.commit()
+        return self.get_item_shares_by_item_id(item_id)
+
+    def _insert_shares(self, shares: list[BillItemShare]):
+        self.session.execute(insert(BillItemShare), [share.model_dump(exclude={"id"}) for share in shares])
@@ -1,6 +1,24 @@
+from sqlalchemy import func, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlmodel import Session, select
 from app.models import User
+from app.schemas.user_schemas import UserResponse
+from app.cache import user_profile_cache
+from app.tracing import traced
 
+PROFILE_FIELDS = ("username", "name", "surname", "avatar_url")
+
+def to_profile(user: User) -> UserResponse:
+    return UserResponse.model_construct(
+        id=user.id,
+        telegram_id=user.telegram_id,
+        username=user.username,
+        name=user.name,
+        surname=user.surname,
+        avatar_url=user.avatar_url
+    )
+
+@traced("repository")
 class UserRepository:
     def __init__(self, session: Session):
         self.session = session
@@ -12,14 +30,72 @@ class UserRepository:
         statement = select(User).where(User.telegram_id == telegram_id)
         return self.session.exec(statement).first()
 
-    def create(self, user: User) -> User:
-        self.session.add(user)
-        self.session.commit()
-        self.session.refresh(user)
-        return user
+    def get_profile(self, user_id: int) -> UserResponse | None:
+        """User profile, from the process-wide cache when possible"""
+        profile = user_profile_cache.get(user_id)
+        if profile is None:
+            user = self.session.get(User, user_id)
+            if user is None:
+                return None
+            profile = self.remember(user)
+        return profile
+
+    def get_profiles(self, user_ids) -> dict[int, UserResponse]:
+        """Profiles by id for all existing users among user_ids, loading the uncached ones in one query"""
+        profiles, missing = user_profile_cache.get_many(set(user_ids))
+        if missing:
+            for user in self.session.exec(select(User).where(User.id.in_(missing))).all():
+                profiles[user.id] = self.remember(user)
+        return profiles
+
+    def exists(self, user_id: int) -> bool:
+        return self.get_profile(user_id) is not None
+
+    @staticmethod
+    def remember(user: User) -> UserResponse:
+        """Put the current state of user into the profile cache"""
+        profile = to_profile(user)
+        user_profile_cache.set(profile)
+        return profile
+
+    def upsert_profile(self, telegram_id: int, profile: dict) -> tuple[User, bool]:
+        """
+        Insert the user or update its profile fields, without committing.
+        Returns the user and whether a row was written: an unchanged profile
+        leaves the row (and updated_at) alone. On SQLite and PostgreSQL this
+        is one INSERT ... ON CONFLICT DO UPDATE ... WHERE changed RETURNING.
+        """
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            return self._upsert_profile_fallback(telegram_id, profile)
+
+        statement = insert(User).values(telegram_id=telegram_id, **profile)
+        changed = or_(*(getattr(User, field).is_distinct_from(statement.excluded[field]) for field in PROFILE_FIELDS))
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={**{field: statement.excluded[field] for field in PROFILE_FIELDS}, "updated_at": func.now()},
+            where=changed
+        ).returning(User)
+
+        user = self.session.scalars(statement, execution_options={"populate_existing": True}).first()
+        if user is None:
+            # Conflict with nothing to change: no row written, none returned
+            return self.get_by_telegram_id(telegram_id), False
+        return user, True
 
-    def update(self, user: User) -> User:
+    def _upsert_profile_fallback(self, telegram_id: int, profile: dict) -> tuple[User, bool]:
+        user = self.get_by_telegram_id(telegram_id)
+        if user is None:
+            user = User(telegram_id=telegram_id, **profile)
+        elif all(getattr(user, field) == value for field, value in profile.items()):
+            return user, False
+        else:
+            for field, value in profile.items():
+                setattr(user, field, value)
         self.session.add(user)
-        self.session.commit()
-        self.session.refresh(user)
-        return user
+        self.session.flush()
+        return user, True
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from starlette.background import BackgroundTask
 from app.database import get_session
+from app.dependencies import get_current_user_id, ensure_acting_user, ensure_bill_member
+from app.idempotency import IdempotentRoute
+from app.rate_limit import enforce_rate_limit
 from app.schemas.bill_schemas import (
     BillCreate, BillResponse, BillItemCreate, BillItemResponse,
     BillParticipantCreate, BillParticipantResponse, BillDetailResponse,
     BillParticipantAssign, BillParticipantPaymentUpdate, BillParticipantRemove,
-    BillSplitRemainder, ReactionCreate
+    BillSplitRemainder, ReactionCreate, BillItemSharesUpdate, BillPresenceResponse
 )
 from app.repositories.bill_repo import BillRepository
 from app.repositories.user_repo import UserRepository
@@ -14,9 +18,15 @@ from app.services.bill_core_service import BillCoreService
 from app.services.bill_item_service import BillItemService
 from app.services.bill_participant_service import BillParticipantService
 from app.services.bill_split_service import BillSplitService
-from app.notifier import notifier
-
-router = APIRouter(prefix="/bills", tags=["bills"])
+from app.notifier import RECONNECT, notifier
+from app.utils.etag import bill_etag, etag_matches
+from app.utils.responses import ModelResponse
+
+router = APIRouter(
+    prefix="/bills", tags=["bills"], route_class=IdempotentRoute,
+    # Membership first: requests refused with 403 must not spend the bill's rate limit
+    dependencies=[Depends(get_current_user_id), Depends(ensure_bill_member), Depends(enforce_rate_limit)]
+)
 
 def get_bill_core_service(session: Session = Depends(get_session)) -> BillCoreService:
     return BillCoreService(BillRepository(session), UserRepository(session))
@@ -37,18 +47,32 @@ def get_bill_split_service(session: Session = Depends(get_session)) -> BillSplit
 @router.post("/", response_model=BillResponse)
 def create_bill(
     bill_data: BillCreate, 
-    service: BillCoreService = Depends(get_bill_core_service)
+    service: BillCoreService = Depends(get_bill_core_service),
+    current_user_id: int | None = Depends(get_current_user_id)
 ):
     """Create a new bill"""
-    return service.create_bill(bill_data)
+    ensure_acting_user(current_user_id, bill_data.owner_id)
+    return ModelResponse(service.create_bill(bill_data))
 
 @router.get("/{bill_id}", response_model=BillDetailResponse)
 def get_bill(
     bill_id: int, 
+    if_none_match: str | None = Header(default=None),
     service: BillCoreService = Depends(get_bill_core_service)
 ):
     """Get bill details with items and participants"""
-    return service.get_bill_details(bill_id)
+    version = service.get_bill_version(bill_id)
+    etag = bill_etag(bill_id, version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    # The payload may be newer than the version checked above, so tag what is actually sent
+    version, payload = service.get_bill_details_json(bill_id, version)
+    return Response(
+        content=payload,
+        media_type="application/json",
+        headers={"ETag": bill_etag(bill_id, version), "Cache-Control": "private, no-cache"}
+    )
 
 @router.post("/{bill_id}/items", response_model=BillItemResponse)
 def add_bill_item(
@@ -57,7 +81,17 @@ def add_bill_item(
     service: BillItemService = Depends(get_bill_item_service)
 ):
     """Add an item to a bill"""
-    return service.add_bill_item(bill_id, item_data)
+    return ModelResponse(service.add_bill_item(bill_id, item_data))
+
+@router.put("/{bill_id}/items/{item_id}/shares", response_model=BillItemResponse)
+def set_bill_item_shares(
+    bill_id: int,
+    item_id: int,
+    shares_data: BillItemSharesUpdate,
+    service: BillItemService = Depends(get_bill_item_service)
+):
+    """Share an item among several participants by weight"""
+    return ModelResponse(service.set_item_shares(bill_id, item_id, shares_data.shares))
 
 @router.delete("/{bill_id}/items/{item_id}", status_code=204)
 def delete_bill_item(
@@ -76,7 +110,7 @@ def add_bill_participant(
     service: BillParticipantService = Depends(get_bill_participant_service)
 ):
     """Add a participant to a bill"""
-    return service.add_bill_participant(bill_id, participant_data)
+    return ModelResponse(service.add_bill_participant(bill_id, participant_data))
 
 @router.post("/{bill_id}/split-equally", response_model=list[BillParticipantResponse])
 def split_bill_equally(
@@ -84,7 +118,7 @@ def split_bill_equally(
     service: BillSplitService = Depends(get_bill_split_service)
 ):
     """Distribute bill total sum equally among participants"""
-    return service.split_bill_equally(bill_id)
+    return ModelResponse(service.split_bill_equally(bill_id))
 
 @router.post("/{bill_id}/split-remainder", response_model=list[BillParticipantResponse])
 def split_bill_remainder(
@@ -93,7 +127,7 @@ def split_bill_remainder(
     service: BillSplitService = Depends(get_bill_split_service)
 ):
     """Distribute remaining unallocated sum equally among selected participants"""
-    return service.split_bill_remainder(bill_id, split_data.participant_ids)
+    return ModelResponse(service.split_bill_remainder(bill_id, split_data.participant_ids))
 
 @router.post("/{bill_id}/assign-amount", response_model=BillParticipantResponse)
 def assign_participant_amount(
@@ -102,44 +136,75 @@ def assign_participant_amount(
     service: BillSplitService = Depends(get_bill_split_service)
 ):
     """Manually assign amount to a participant"""
-    return service.assign_amount(bill_id, assign_data)
+    return ModelResponse(service.assign_amount(bill_id, assign_data))
 
 @router.post("/{bill_id}/participants/{participant_id}/payment", response_model=BillParticipantResponse)
 def update_payment_status(
     bill_id: int,
     participant_id: int,
     payment_data: BillParticipantPaymentUpdate,
-    service: BillParticipantService = Depends(get_bill_participant_service)
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
 ):
     """Update participant's payment status"""
-    return service.update_payment_status(bill_id, participant_id, payment_data)
+    ensure_acting_user(current_user_id, payment_data.user_id)
+    return ModelResponse(service.update_payment_status(bill_id, participant_id, payment_data))
 
 @router.delete("/{bill_id}/participants/{participant_id}", response_model=BillDetailResponse)
 def remove_bill_participant(
     bill_id: int,
     participant_id: int,
     remove_data: BillParticipantRemove,
-    service: BillParticipantService = Depends(get_bill_participant_service)
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
 ):
     """Remove a participant from the bill"""
-    return service.delete_bill_participant(bill_id, participant_id, remove_data.user_id)
+    ensure_acting_user(current_user_id, remove_data.user_id)
+    return ModelResponse(service.delete_bill_participant(bill_id, participant_id, remove_data.user_id))
 
 @router.post("/{bill_id}/join", response_model=BillParticipantResponse)
 def join_bill(
     bill_id: int,
     join_data: BillParticipantRemove, # Reusing same schema as it just has user_id
-    service: BillParticipantService = Depends(get_bill_participant_service)
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
 ):
     """Join a bill as current user"""
-    return service.join_bill(bill_id, join_data.user_id)
+    ensure_acting_user(current_user_id, join_data.user_id)
+    return ModelResponse(service.join_bill(bill_id, join_data.user_id))
+
+# Admission rejections of event streams: status and message
+STREAM_REJECTIONS = {
+    "draining": (503, "Server is restarting, reconnect shortly"),
+    "capacity": (503, "Too many live connections"),
+    "bill": (429, "Too many live connections to this bill"),
+    "user": (429, "Too many live connections for this user"),
+}
 
 @router.get("/{bill_id}/events")
-async def bill_events(bill_id: int):
+async def bill_events(bill_id: int, current_user_id: int | None = Depends(get_current_user_id)):
     """Subscribe to real-time updates for a specific bill"""
+    rejection = notifier.admission_error(bill_id, current_user_id)
+    if rejection is not None:
+        status_code, detail = STREAM_REJECTIONS[rejection]
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": "5"})
+    subscription = notifier.open(bill_id, current_user_id)
+
     async def event_generator():
-        async for message in notifier.subscribe(bill_id):
-            yield f"data: {message}\n\n"
-            
+        try:
+            async for message, request_id in notifier.listen(subscription):
+                if message == RECONNECT:
+                    yield f"retry: {subscription.retry_ms}\ndata: {RECONNECT}\n\n"
+                else:
+                    # The event id is the correlation id of the request that made the change
+                    yield f"id: {request_id}\ndata: {message}\n\n" if request_id else f"data: {message}\n\n"
+        finally:
+            notifier.close(subscription)
+
+    async def close():
+        # Async so Starlette runs it on the event loop, like everything else touching the notifier
+        notifier.close(subscription)
+
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
@@ -147,12 +212,24 @@ async def bill_events(bill_id: int):
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no"
-        }
+        },
+        # Also closes the subscription if the stream never started
+        background=BackgroundTask(close),
     )
 
+@router.get("/{bill_id}/presence", response_model=BillPresenceResponse)
+async def get_bill_presence(bill_id: int):
+    """Users currently viewing the bill; changes are also pushed as PRESENCE events"""
+    return BillPresenceResponse(bill_id=bill_id, **notifier.viewers(bill_id))
+
 @router.post("/{bill_id}/reactions")
-def send_reaction(bill_id: int, reaction: ReactionCreate):
+def send_reaction(
+    bill_id: int,
+    reaction: ReactionCreate,
+    current_user_id: int | None = Depends(get_current_user_id)
+):
     """Broadcast a reaction to all bill participants"""
+    ensure_acting_user(current_user_id, reaction.user_id)
     notifier.broadcast(bill_id, f"REACTION:{reaction.user_id}:{reaction.emoji}")
     return {"status": "ok"}
 
@@ -160,7 +237,9 @@ def send_reaction(bill_id: int, reaction: ReactionCreate):
 def confirm_and_close_bill(
     bill_id: int,
     close_data: BillParticipantRemove,
-    service: BillParticipantService = Depends(get_bill_participant_service)
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
 ):
     """Finalize payments and close the bill (Owner only)"""
-    return service.confirm_and_close_bill(bill_id, close_data.user_id)
+    ensure_acting_user(current_user_id, close_data.user_id)
+    return ModelResponse(service.confirm_and_close_bill(bill_id, close_data.user_id))
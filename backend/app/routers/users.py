@@ -1,31 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
 from sqlmodel import Session
 from app.database import get_session
-from app.schemas.user_schemas import UserCreate, UserResponse
+from app.dependencies import get_current_user_id, ensure_acting_user
+from app.schemas.user_schemas import UserCreate, UserResponse, UserSessionResponse
 from app.schemas.bill_schemas import BillResponse
 from app.repositories.user_repo import UserRepository
 from app.services.user_service import UserService
 from app.repositories.bill_repo import BillRepository
 from app.services.bill_core_service import BillCoreService
+from app.utils.etag import etag_matches
+from app.utils.responses import ModelResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+MAX_BATCH_IDS = 100
+
 def get_user_service(session: Session = Depends(get_session)) -> UserService:
     user_repo = UserRepository(session)
-    return UserService(user_repo)
+    return UserService(user_repo, BillRepository(session))
 
 def get_bill_core_service(session: Session = Depends(get_session)) -> BillCoreService:
     bill_repo = BillRepository(session)
     user_repo = UserRepository(session)
     return BillCoreService(bill_repo, user_repo)
 
-@router.post("/", response_model=UserResponse)
+@router.post("/", response_model=UserSessionResponse)
 def create_or_update_user(
     user_data: UserCreate, 
     user_service: UserService = Depends(get_user_service)
 ):
-    """Create a new user or update existing one based on telegram_id"""
-    return user_service.create_or_update_user(user_data)
+    """Create a new user or update existing one based on telegram_id, and open a session"""
+    profile = user_service.create_or_update_user(user_data)
+    return ModelResponse(UserService.map_to_session_response(profile))
+
+@router.get("", response_model=list[UserResponse])
+def get_users(
+    ids: str = Query(description="Comma-separated user IDs, at most 100"),
+    user_service: UserService = Depends(get_user_service)
+):
+    """Get many users by ID; unknown IDs are skipped"""
+    try:
+        user_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="No user ids given")
+    if len(user_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return ModelResponse(user_service.get_users_by_ids(user_ids))
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
@@ -33,18 +55,28 @@ def get_user(
     user_service: UserService = Depends(get_user_service)
 ):
     """Get user by ID"""
-    user = user_service.get_user_by_id(user_id)
-    if not user:
+    profile = user_service.get_user_by_id(user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return ModelResponse(profile)
 
 @router.get("/{user_id}/bills", response_model=list[BillResponse])
 def get_user_bills(
     user_id: int, 
     page: int = 1,
     limit: int = 10,
-    service: BillCoreService = Depends(get_bill_core_service)
+    if_none_match: str | None = Header(default=None),
+    service: BillCoreService = Depends(get_bill_core_service),
+    current_user_id: int | None = Depends(get_current_user_id)
 ):
     """Get all bills for a specific user (as owner or participant)"""
+    ensure_acting_user(current_user_id, user_id)
     offset = (page - 1) * limit
-    return service.get_user_bills(user_id, offset=offset, limit=limit)
+    etag = service.get_user_bills_etag(user_id, offset=offset, limit=limit)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    return ModelResponse(
+        service.get_user_bills(user_id, offset=offset, limit=limit),
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
@@ -0,0 +1 @@
+# API v2: amounts are integers in the smallest currency unit
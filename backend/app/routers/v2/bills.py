@@ -0,0 +1,180 @@
+from fastapi import APIRouter, Depends, Header, Response
+from sqlmodel import Session
+from app.database import get_session
+from app.dependencies import get_current_user_id, ensure_acting_user, ensure_bill_member
+from app.idempotency import IdempotentRoute
+from app.rate_limit import enforce_rate_limit
+from app.schemas.bill_schemas import (
+    BillParticipantCreate, BillParticipantPaymentUpdate, BillParticipantRemove,
+    BillSplitRemainder, BillItemSharesUpdate, BillPresenceResponse
+)
+from app.schemas.bill_v2_schemas import (
+    BillCreateV2, BillResponseV2, BillItemCreateV2, BillItemResponseV2,
+    BillParticipantResponseV2, BillParticipantAssignV2, BillDetailResponseV2
+)
+from app.repositories.bill_repo import BillRepository
+from app.repositories.user_repo import UserRepository
+from app.routers import bills as bills_v1
+from app.services.bill_core_service import BillCoreService
+from app.services.bill_item_service import BillItemService
+from app.services.bill_participant_service import BillParticipantService
+from app.services.bill_split_service import BillSplitService
+from app.services.bill_mapper import minor_units_mapper
+from app.utils.etag import bill_etag, etag_matches
+from app.utils.responses import ModelResponse
+
+router = APIRouter(
+    prefix="/bills", tags=["bills v2"], route_class=IdempotentRoute,
+    dependencies=[Depends(get_current_user_id), Depends(ensure_bill_member), Depends(enforce_rate_limit)]
+)
+
+def get_bill_core_service(session: Session = Depends(get_session)) -> BillCoreService:
+    return BillCoreService(BillRepository(session), UserRepository(session), mapper=minor_units_mapper)
+
+def get_bill_item_service(session: Session = Depends(get_session)) -> BillItemService:
+    return BillItemService(BillRepository(session), UserRepository(session), mapper=minor_units_mapper)
+
+def get_bill_participant_service(session: Session = Depends(get_session)) -> BillParticipantService:
+    repo = BillRepository(session)
+    user_repo = UserRepository(session)
+    split_service = BillSplitService(repo, user_repo, mapper=minor_units_mapper)
+    return BillParticipantService(repo, user_repo, split_service, mapper=minor_units_mapper)
+
+def get_bill_split_service(session: Session = Depends(get_session)) -> BillSplitService:
+    return BillSplitService(BillRepository(session), UserRepository(session), mapper=minor_units_mapper)
+
+
+@router.post("/", response_model=BillResponseV2)
+def create_bill(
+    bill_data: BillCreateV2,
+    service: BillCoreService = Depends(get_bill_core_service),
+    current_user_id: int | None = Depends(get_current_user_id)
+):
+    """Create a new bill"""
+    ensure_acting_user(current_user_id, bill_data.owner_id)
+    return ModelResponse(service.create_bill(bill_data))
+
+@router.get("/{bill_id}", response_model=BillDetailResponseV2)
+def get_bill(
+    bill_id: int,
+    if_none_match: str | None = Header(default=None),
+    service: BillCoreService = Depends(get_bill_core_service)
+):
+    """Get bill details with items and participants"""
+    version = service.get_bill_version(bill_id)
+    etag = bill_etag(bill_id, version, minor_units_mapper.name)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    version, payload = service.get_bill_details_json(bill_id, version)
+    return Response(
+        content=payload,
+        media_type="application/json",
+        headers={"ETag": bill_etag(bill_id, version, minor_units_mapper.name), "Cache-Control": "private, no-cache"}
+    )
+
+@router.post("/{bill_id}/items", response_model=BillItemResponseV2)
+def add_bill_item(
+    bill_id: int,
+    item_data: BillItemCreateV2,
+    service: BillItemService = Depends(get_bill_item_service)
+):
+    """Add an item to a bill"""
+    return ModelResponse(service.add_bill_item(bill_id, item_data))
+
+@router.put("/{bill_id}/items/{item_id}/shares", response_model=BillItemResponseV2)
+def set_bill_item_shares(
+    bill_id: int,
+    item_id: int,
+    shares_data: BillItemSharesUpdate,
+    service: BillItemService = Depends(get_bill_item_service)
+):
+    """Share an item among several participants by weight"""
+    return ModelResponse(service.set_item_shares(bill_id, item_id, shares_data.shares))
+
+@router.post("/{bill_id}/participants", response_model=list[BillParticipantResponseV2])
+def add_bill_participant(
+    bill_id: int,
+    participant_data: BillParticipantCreate,
+    service: BillParticipantService = Depends(get_bill_participant_service)
+):
+    """Add a participant to a bill"""
+    return ModelResponse(service.add_bill_participant(bill_id, participant_data))
+
+@router.post("/{bill_id}/split-equally", response_model=list[BillParticipantResponseV2])
+def split_bill_equally(
+    bill_id: int,
+    service: BillSplitService = Depends(get_bill_split_service)
+):
+    """Distribute bill total sum equally among participants"""
+    return ModelResponse(service.split_bill_equally(bill_id))
+
+@router.post("/{bill_id}/split-remainder", response_model=list[BillParticipantResponseV2])
+def split_bill_remainder(
+    bill_id: int,
+    split_data: BillSplitRemainder,
+    service: BillSplitService = Depends(get_bill_split_service)
+):
+    """Distribute remaining unallocated sum equally among selected participants"""
+    return ModelResponse(service.split_bill_remainder(bill_id, split_data.participant_ids))
+
+@router.post("/{bill_id}/assign-amount", response_model=BillParticipantResponseV2)
+def assign_participant_amount(
+    bill_id: int,
+    assign_data: BillParticipantAssignV2,
+    service: BillSplitService = Depends(get_bill_split_service)
+):
+    """Manually assign amount to a participant"""
+    return ModelResponse(service.assign_amount(bill_id, assign_data))
+
+@router.post("/{bill_id}/participants/{participant_id}/payment", response_model=BillParticipantResponseV2)
+def update_payment_status(
+    bill_id: int,
+    participant_id: int,
+    payment_data: BillParticipantPaymentUpdate,
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
+):
+    """Update participant's payment status"""
+    ensure_acting_user(current_user_id, payment_data.user_id)
+    return ModelResponse(service.update_payment_status(bill_id, participant_id, payment_data))
+
+@router.delete("/{bill_id}/participants/{participant_id}", response_model=BillDetailResponseV2)
+def remove_bill_participant(
+    bill_id: int,
+    participant_id: int,
+    remove_data: BillParticipantRemove,
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
+):
+    """Remove a participant from the bill"""
+    ensure_acting_user(current_user_id, remove_data.user_id)
+    return ModelResponse(service.delete_bill_participant(bill_id, participant_id, remove_data.user_id))
+
+@router.post("/{bill_id}/join", response_model=BillParticipantResponseV2)
+def join_bill(
+    bill_id: int,
+    join_data: BillParticipantRemove,
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
+):
+    """Join a bill as current user"""
+    ensure_acting_user(current_user_id, join_data.user_id)
+    return ModelResponse(service.join_bill(bill_id, join_data.user_id))
+
+@router.post("/{bill_id}/close", response_model=BillDetailResponseV2)
+def confirm_and_close_bill(
+    bill_id: int,
+    close_data: BillParticipantRemove,
+    service: BillParticipantService = Depends(get_bill_participant_service),
+    current_user_id: int | None = Depends(get_current_user_id)
+):
+    """Finalize payments and close the bill (Owner only)"""
+    ensure_acting_user(current_user_id, close_data.user_id)
+    return ModelResponse(service.confirm_and_close_bill(bill_id, close_data.user_id))
+
+# Routes without amounts behave exactly as in v1
+router.add_api_route("/{bill_id}/items/{item_id}", bills_v1.delete_bill_item, methods=["DELETE"], status_code=204)
+router.add_api_route("/{bill_id}/events", bills_v1.bill_events, methods=["GET"])
+router.add_api_route("/{bill_id}/presence", bills_v1.get_bill_presence, methods=["GET"], response_model=BillPresenceResponse)
+router.add_api_route("/{bill_id}/reactions", bills_v1.send_reaction, methods=["POST"])
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Header, Response
+from sqlmodel import Session
+from app.database import get_session
+from app.dependencies import get_current_user_id, ensure_acting_user
+from app.schemas.bill_v2_schemas import BillResponseV2
+from app.repositories.user_repo import UserRepository
+from app.repositories.bill_repo import BillRepository
+from app.services.bill_core_service import BillCoreService
+from app.services.bill_mapper import minor_units_mapper
+from app.utils.etag import etag_matches
+from app.utils.responses import ModelResponse
+
+router = APIRouter(prefix="/users", tags=["users v2"])
+
+def get_bill_core_service(session: Session = Depends(get_session)) -> BillCoreService:
+    return BillCoreService(BillRepository(session), UserRepository(session), mapper=minor_units_mapper)
+
+@router.get("/{user_id}/bills", response_model=list[BillResponseV2])
+def get_user_bills(
+    user_id: int,
+    page: int = 1,
+    limit: int = 10,
+    if_none_match: str | None = Header(default=None),
+    service: BillCoreService = Depends(get_bill_core_service),
+    current_user_id: int | None = Depends(get_current_user_id)
+):
+    """Get all bills for a specific user (as owner or participant)"""
+    ensure_acting_user(current_user_id, user_id)
+    offset = (page - 1) * limit
+    etag = service.get_user_bills_etag(user_id, offset=offset, limit=limit)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    return ModelResponse(
+        service.get_user_bills(user_id, offset=offset, limit=limit),
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
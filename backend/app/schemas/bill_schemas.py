@@ -1,10 +1,12 @@
 from pydantic import BaseModel
 from datetime import datetime
+from app.utils.currency import DEFAULT_CURRENCY
 
 class BillCreate(BaseModel):
     """Schema for creating a bill"""
     owner_id: int
     total_sum: float
+    currency: str = DEFAULT_CURRENCY
     title: str | None = None
     payment_details: str | None = None
     include_owner: bool = False
@@ -14,6 +16,7 @@ class BillResponse(BaseModel):
     id: int
     owner_id: int
     total_sum: float
+    currency: str
     title: str | None
     payment_details: str | None
     split_type: str
@@ -22,12 +25,28 @@ class BillResponse(BaseModel):
     created_at: datetime
     participants_count: int
 
+class BillItemShareCreate(BaseModel):
+    """Schema for a participant's weighted share of an item"""
+    participant_id: int
+    weight: int = 1
+
+class BillItemSharesUpdate(BaseModel):
+    """Schema for replacing the shares of an item"""
+    shares: list[BillItemShareCreate]
+
+class BillItemShareResponse(BaseModel):
+    """Schema for item share response with the allocated part of item_sum"""
+    participant_id: int
+    weight: int
+    amount: float
+
 class BillItemCreate(BaseModel):
     """Schema for creating a bill item"""
     name: str
     price: float
     count: int = 1
     assigned_to_user_id: int | None = None
+    shares: list[BillItemShareCreate] | None = None
 
 class BillItemResponse(BaseModel):
     """Schema for bill item response"""
@@ -38,6 +57,7 @@ class BillItemResponse(BaseModel):
     count: int
     item_sum: float
     assigned_to_user_id: int | None
+    shares: list[BillItemShareResponse] = []
 
 class BillParticipantCreate(BaseModel):
     """Schema for adding a participant to a bill"""
@@ -80,12 +100,14 @@ class BillDetailResponse(BaseModel):
     id: int
     owner_id: int
     total_sum: float
+    currency: str
     title: str | None
     payment_details: str | None
     split_type: str
     status: str
     unallocated_sum: float
     created_at: datetime
+    version: int
     items: list[BillItemResponse]
     participants: list[BillParticipantResponse]
 
@@ -93,3 +115,9 @@ class ReactionCreate(BaseModel):
     """Schema for creating a reaction"""
     user_id: int
     emoji: str
+
+class BillPresenceResponse(BaseModel):
+    """Who has the bill open right now (live update streams of this server)"""
+    bill_id: int
+    user_ids: list[int]
+    anonymous: int
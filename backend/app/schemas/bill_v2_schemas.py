@@ -0,0 +1,93 @@
+from pydantic import BaseModel
+from datetime import datetime
+from app.utils.currency import DEFAULT_CURRENCY
+
+# API v2 schemas: every amount is an integer in the smallest unit of the bill currency.
+# Schemas without amounts are shared with v1 and live in bill_schemas.
+
+class BillCreateV2(BaseModel):
+    """Schema for creating a bill"""
+    owner_id: int
+    total_sum: int
+    currency: str = DEFAULT_CURRENCY
+    title: str | None = None
+    payment_details: str | None = None
+    include_owner: bool = False
+
+class BillResponseV2(BaseModel):
+    """Schema for bill response"""
+    id: int
+    owner_id: int
+    total_sum: int
+    currency: str
+    title: str | None
+    payment_details: str | None
+    split_type: str
+    status: str
+    unallocated_sum: int
+    created_at: datetime
+    participants_count: int
+
+class BillItemShareCreateV2(BaseModel):
+    """Schema for a participant's weighted share of an item"""
+    participant_id: int
+    weight: int = 1
+
+class BillItemCreateV2(BaseModel):
+    """Schema for creating a bill item"""
+    name: str
+    price: int
+    count: int = 1
+    assigned_to_user_id: int | None = None
+    shares: list[BillItemShareCreateV2] | None = None
+
+class BillItemShareResponseV2(BaseModel):
+    """Schema for item share response with the allocated part of item_sum"""
+    participant_id: int
+    weight: int
+    amount: int
+
+class BillItemResponseV2(BaseModel):
+    """Schema for bill item response"""
+    id: int
+    bill_id: int
+    name: str
+    price: int
+    count: int
+    item_sum: int
+    assigned_to_user_id: int | None
+    shares: list[BillItemShareResponseV2] = []
+
+class BillParticipantResponseV2(BaseModel):
+    """Schema for bill participant response"""
+    id: int
+    bill_id: int
+    user_id: int | None
+    guest_name: str | None
+    username: str | None = None
+    name: str | None = None
+    surname: str | None = None
+    avatar_url: str | None = None
+    allocated_amount: int
+    is_paid: bool
+
+class BillParticipantAssignV2(BaseModel):
+    """Schema for manual amount assignment to a participant"""
+    participant_id: int
+    allocated_amount: int
+
+class BillDetailResponseV2(BaseModel):
+    """Detailed bill response with items and participants"""
+    id: int
+    owner_id: int
+    total_sum: int
+    currency: str
+    title: str | None
+    payment_details: str | None
+    split_type: str
+    status: str
+    unallocated_sum: int
+    created_at: datetime
+    version: int
+    items: list[BillItemResponseV2]
+    participants: list[BillParticipantResponseV2]
@@ -18,3 +18,8 @@ class UserResponse(BaseModel):
     name: str | None
     surname: str | None
     avatar_url: str | None
+
+class UserSessionResponse(UserResponse):
+    """User response on login, with the session token for subsequent requests"""
+    session_token: str
+    expires_at: int  # unix timestamp
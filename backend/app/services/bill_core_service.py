@@ -2,26 +2,41 @@ from fastapi import HTTPException
 from app.repositories.bill_repo import BillRepository
 from app.repositories.user_repo import UserRepository
 from app.models import Bill, BillUser, BillStatus
-from app.utils.currency import to_tiins, from_tiins
-from app.schemas.bill_schemas import BillCreate, BillResponse, BillDetailResponse, BillItemResponse, BillParticipantResponse
+from app.utils.etag import make_etag
+from app.cache import bill_detail_cache
+from app.utils.singleflight import SingleFlight, WaitTimeout
+from app.schemas.bill_schemas import BillCreate, BillResponse, BillDetailResponse
 from app.services.validator import BillValidator
-from app.services.bill_participant_service import BillParticipantService
+from app.services.bill_item_service import BillItemService
+from app.services.bill_mapper import BillMapper, major_units_mapper
+from app.utils.currency import is_supported_currency
+from app.tracing import traced
+from app.deadlines import DeadlineExceeded, remaining
 
+# Shared by all requests of the process; loads of the same bill version run once at a time
+bill_detail_flight = SingleFlight()
+
+@traced("service")
 class BillCoreService:
-    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository):
+    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository, mapper: BillMapper = major_units_mapper):
         self.bill_repo = bill_repo
         self.user_repo = user_repo
         self.validator = BillValidator(bill_repo)
+        self.mapper = mapper
 
     def create_bill(self, bill_data: BillCreate) -> BillResponse:
-        owner = self.user_repo.get_by_id(bill_data.owner_id)
-        if not owner:
+        if not self.user_repo.exists(bill_data.owner_id):
             raise HTTPException(status_code=404, detail="Owner user not found")
+
+        if not is_supported_currency(bill_data.currency):
+            raise HTTPException(status_code=400, detail=f"Unsupported currency: {bill_data.currency}")
         
+        total_sum = self.mapper.to_minor(bill_data.total_sum, bill_data.currency)
         bill = Bill(
             owner_id=bill_data.owner_id,
-            total_sum=to_tiins(bill_data.total_sum),
-            unallocated_sum=to_tiins(bill_data.total_sum),
+            total_sum=total_sum,
+            unallocated_sum=total_sum,
+            currency=bill_data.currency,
             title=bill_data.title,
             payment_details=bill_data.payment_details
         )
@@ -37,66 +52,60 @@ class BillCoreService:
             self.bill_repo.add_participant(owner_participant)
             participants_count = 1
 
-        return BillResponse(
-            id=created_bill.id,
-            owner_id=created_bill.owner_id,
-            total_sum=from_tiins(created_bill.total_sum),
-            title=created_bill.title,
-            payment_details=created_bill.payment_details,
-            split_type=created_bill.split_type,
-            status=created_bill.status,
-            unallocated_sum=from_tiins(created_bill.unallocated_sum),
-            created_at=created_bill.created_at,
-            participants_count=participants_count
-        )
+        return self.mapper.bill(created_bill, participants_count)
+
+    def get_bill_version(self, bill_id: int) -> int:
+        version = self.bill_repo.get_version(bill_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Bill not found")
+        return version
 
     def get_bill_details(self, bill_id: int) -> BillDetailResponse:
         bill = self.validator.get_bill_or_404(bill_id)
         
         items = self.bill_repo.get_items_by_bill_id(bill_id)
         participants = self.bill_repo.get_participants_by_bill_id(bill_id)
+        shares = self.bill_repo.get_item_shares_by_bill_id(bill_id)
+        profiles = self.user_repo.get_profiles(p.user_id for p in participants if p.user_id)
         
-        return BillDetailResponse(
-            id=bill.id,
-            owner_id=bill.owner_id,
-            total_sum=from_tiins(bill.total_sum),
-            title=bill.title,
-            payment_details=bill.payment_details,
-            split_type=bill.split_type,
-            status=bill.status,
-            unallocated_sum=from_tiins(bill.unallocated_sum),
-            created_at=bill.created_at,
-            items=[BillItemResponse(
-                id=item.id,
-                bill_id=item.bill_id,
-                name=item.name,
-                price=from_tiins(item.price),
-                count=item.count,
-                item_sum=from_tiins(item.item_sum),
-                assigned_to_user_id=item.assigned_to_user_id
-            ) for item in items],
-            participants=[BillParticipantService.map_to_response(p) for p in participants]
-        )
+        return self.mapper.detail(bill, items, participants, BillItemService.allocate_shares(items, shares), profiles)
+
+    def get_bill_details_json(self, bill_id: int, version: int) -> tuple[int, bytes]:
+        """
+        Encoded bill details for the given version, rendered once and then served
+        from the cache until the bill changes. Concurrent misses for the same
+        version share a single load. Returns the version actually encoded,
+        which is newer than the requested one if the bill changed in between.
+        Waiting for a load in flight is bounded by the request deadline.
+        """
+        payload = bill_detail_cache.get(bill_id, version, self.mapper.name)
+        if payload is not None:
+            return version, payload
+
+        try:
+            return bill_detail_flight.do(
+                (bill_id, version, self.mapper.name), lambda: self._render_bill_details(bill_id), timeout=remaining()
+            )
+        except WaitTimeout:
+            raise DeadlineExceeded()
+
+    def _render_bill_details(self, bill_id: int) -> tuple[int, bytes]:
+        details = self.get_bill_details(bill_id)
+        payload = details.__pydantic_serializer__.to_json(details)
+        bill_detail_cache.set(bill_id, details.version, payload, self.mapper.name)
+        return details.version, payload
+
+    def get_user_bills_etag(self, user_id: int, offset: int = 0, limit: int = 10) -> str:
+        if not self.user_repo.exists(user_id):
+            raise HTTPException(status_code=404, detail="User not found")
+
+        versions = self.bill_repo.get_user_bills_versions(user_id, offset=offset, limit=limit)
+        return make_etag(self.mapper.name, "bills", user_id, offset, limit, *(f"{bill_id}.{version}" for bill_id, version in versions))
 
     def get_user_bills(self, user_id: int, offset: int = 0, limit: int = 10) -> list[BillResponse]:
-        user = self.user_repo.get_by_id(user_id)
-        if not user:
+        if not self.user_repo.exists(user_id):
             raise HTTPException(status_code=404, detail="User not found")
         
         results = self.bill_repo.get_user_bills(user_id, offset=offset, limit=limit)
         
-        return [
-            BillResponse(
-                id=bill.id,
-                owner_id=bill.owner_id,
-                total_sum=from_tiins(bill.total_sum),
-                title=bill.title,
-                payment_details=bill.payment_details,
-                split_type=bill.split_type,
-                status=bill.status,
-                unallocated_sum=from_tiins(bill.unallocated_sum),
-                created_at=bill.created_at,
-                participants_count=participants_count
-            )
-            for bill, participants_count in results
-        ]
+        return [self.mapper.bill(bill, participants_count) for bill, participants_count in results]
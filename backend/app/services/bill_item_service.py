@@ -1,28 +1,35 @@
 from fastapi import HTTPException
 from app.repositories.bill_repo import BillRepository
 from app.repositories.user_repo import UserRepository
-from app.models import BillItem
-from app.utils.currency import to_tiins, from_tiins
-from app.schemas.bill_schemas import BillItemCreate, BillItemResponse
+from app.models import BillItem, BillItemShare
+from app.schemas.bill_schemas import BillItemCreate, BillItemResponse, BillItemShareCreate
 from app.services.validator import BillValidator
+from app.services.bill_mapper import BillMapper, ShareAllocation, major_units_mapper
 from app.notifier import notifier
+from app.tracing import traced
 
+@traced("service")
 class BillItemService:
-    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository):
+    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository, mapper: BillMapper = major_units_mapper):
         self.bill_repo = bill_repo
         self.user_repo = user_repo
         self.validator = BillValidator(bill_repo)
+        self.mapper = mapper
 
     def add_bill_item(self, bill_id: int, item_data: BillItemCreate) -> BillItemResponse:
         bill = self.validator.get_bill_or_404(bill_id)
         self.validator.ensure_bill_open(bill)
-        
+
         if item_data.assigned_to_user_id:
-            user = self.user_repo.get_by_id(item_data.assigned_to_user_id)
-            if not user:
+            if not self.user_repo.exists(item_data.assigned_to_user_id):
                 raise HTTPException(status_code=404, detail="Assigned user not found")
-        
-        price_tiins = to_tiins(item_data.price)
+
+        if item_data.shares:
+            self._validate_shares(bill_id, item_data.shares)
+
+        # Read before the commit below expires the bill
+        currency = bill.currency
+        price_tiins = self.mapper.to_minor(item_data.price, currency)
         item_sum_tiins = price_tiins * item_data.count
 
         item = BillItem(
@@ -33,27 +40,88 @@ class BillItemService:
             item_sum=item_sum_tiins,
             assigned_to_user_id=item_data.assigned_to_user_id
         )
-        created_item = self.bill_repo.add_item(item)
-        
+        self.bill_repo.bump_version(bill)
+        # Shares are inserted with the item, so a failure leaves neither behind
+        created_item, shares = self.bill_repo.add_item(item, self._build_shares(None, item_data.shares or []))
+
         notifier.broadcast(bill_id, "REFRESH")
-        
-        return BillItemResponse(
-            id=created_item.id,
-            bill_id=created_item.bill_id,
-            name=created_item.name,
-            price=from_tiins(created_item.price),
-            count=created_item.count,
-            item_sum=from_tiins(created_item.item_sum),
-            assigned_to_user_id=created_item.assigned_to_user_id
-        )
+
+        return self.mapper.item(created_item, currency, self.allocate_shares([created_item], shares))
+
+    def set_item_shares(self, bill_id: int, item_id: int, shares_data: list[BillItemShareCreate]) -> BillItemResponse:
+        bill = self.validator.get_bill_or_404(bill_id)
+        self.validator.ensure_bill_open(bill)
+
+        item = self.validator.get_item_or_404(item_id, bill_id)
+        self._validate_shares(bill_id, shares_data)
+
+        currency = bill.currency
+        self.bill_repo.bump_version(bill)
+        shares = self.bill_repo.replace_item_shares(item.id, self._build_shares(item.id, shares_data))
+        self.bill_repo.session.refresh(item)
+
+        notifier.broadcast(bill_id, "REFRESH")
+
+        return self.mapper.item(item, currency, self.allocate_shares([item], shares))
 
     def delete_bill_item(self, bill_id: int, item_id: int):
         bill = self.validator.get_bill_or_404(bill_id)
         self.validator.ensure_bill_open(bill)
 
-        item = self.bill_repo.get_item_by_id(item_id)
-        if not item or item.bill_id != bill_id:
-            raise HTTPException(status_code=404, detail="Item not found for this bill")
+        item = self.validator.get_item_or_404(item_id, bill_id)
 
+        self.bill_repo.bump_version(bill)
         self.bill_repo.delete_item(item)
         notifier.broadcast(bill_id, "REFRESH")
+
+    def _validate_shares(self, bill_id: int, shares_data: list[BillItemShareCreate]):
+        participant_ids = [s.participant_id for s in shares_data]
+        if len(set(participant_ids)) != len(participant_ids):
+            raise HTTPException(status_code=400, detail="Each participant can hold only one share of an item")
+
+        if any(s.weight <= 0 for s in shares_data):
+            raise HTTPException(status_code=400, detail="Share weight must be positive")
+
+        bill_participant_ids = {p.id for p in self.bill_repo.get_participants_by_bill_id(bill_id)}
+        if not set(participant_ids) <= bill_participant_ids:
+            raise HTTPException(status_code=404, detail="Participant not found for this bill")
+
+    @staticmethod
+    def _build_shares(item_id: int | None, shares_data: list[BillItemShareCreate]) -> list[BillItemShare]:
+        return [
+            BillItemShare(item_id=item_id, participant_id=s.participant_id, weight=s.weight)
+            for s in shares_data
+        ]
+
+    @staticmethod
+    def allocate_shares(items: list[BillItem], shares: list[BillItemShare]) -> ShareAllocation:
+        """
+        Distribute item_sum of every shared item across its sharers in one pass.
+        Each sharer gets floor(item_sum * weight / total_weight) tiins, and the
+        tiins left over are handed out one by one to the largest remainders
+        (ties go to the earliest share), so the amounts always add up to item_sum.
+        """
+        item_sums = {item.id: item.item_sum for item in items}
+        shares_by_item: dict[int, list[BillItemShare]] = {}
+        for share in shares:
+            if share.item_id in item_sums:
+                shares_by_item.setdefault(share.item_id, []).append(share)
+
+        allocation = {}
+        for item_id, item_shares in shares_by_item.items():
+            item_sum = item_sums[item_id]
+            total_weight = sum(s.weight for s in item_shares)
+
+            amounts = []
+            remainders = []
+            for i, share in enumerate(item_shares):
+                amount, remainder = divmod(item_sum * share.weight, total_weight)
+                amounts.append(amount)
+                remainders.append((-remainder, i))
+
+            leftover = item_sum - sum(amounts)
+            for _, i in sorted(remainders)[:leftover]:
+                amounts[i] += 1
+
+            allocation[item_id] = list(zip(item_shares, amounts))
+        return allocation
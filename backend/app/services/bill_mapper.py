@@ -0,0 +1,146 @@
+from app.models import Bill, BillItem, BillItemShare, BillUser
+from app.utils.currency import to_minor_units, from_minor_units
+from app.schemas.bill_schemas import (
+    BillResponse, BillItemResponse, BillItemShareResponse,
+    BillParticipantResponse, BillDetailResponse
+)
+from app.schemas.user_schemas import UserResponse
+from app.schemas.bill_v2_schemas import (
+    BillResponseV2, BillItemResponseV2, BillItemShareResponseV2,
+    BillParticipantResponseV2, BillDetailResponseV2
+)
+
+# item_id -> [(share, allocated tiins)], as computed by BillItemService.allocate_shares
+ShareAllocation = dict[int, list[tuple[BillItemShare, int]]]
+
+
+class BillMapper:
+    """
+    Converts amounts between the API and the database and builds response models
+    from ORM objects. The models are built with model_construct: every value
+    comes from the database or from the conversions below, so validating it
+    again would only cost time.
+
+    This mapper serves API v1, where amounts are floats in major units of the
+    bill's currency.
+    """
+    name = "v1"
+
+    bill_response = BillResponse
+    item_response = BillItemResponse
+    share_response = BillItemShareResponse
+    participant_response = BillParticipantResponse
+    detail_response = BillDetailResponse
+
+    def to_minor(self, amount: float, currency: str) -> int:
+        return to_minor_units(amount, currency)
+
+    def from_minor(self, amount: int, currency: str) -> float:
+        return from_minor_units(amount, currency)
+
+    def bill(self, bill: Bill, participants_count: int):
+        currency = bill.currency
+        return self.bill_response.model_construct(
+            id=bill.id,
+            owner_id=bill.owner_id,
+            total_sum=self.from_minor(bill.total_sum, currency),
+            currency=currency,
+            title=bill.title,
+            payment_details=bill.payment_details,
+            split_type=bill.split_type,
+            status=bill.status,
+            unallocated_sum=self.from_minor(bill.unallocated_sum, currency),
+            created_at=bill.created_at,
+            participants_count=participants_count
+        )
+
+    def item(self, item: BillItem, currency: str, allocation: ShareAllocation | None = None):
+        shares = (allocation or {}).get(item.id, [])
+        return self.item_response.model_construct(
+            id=item.id,
+            bill_id=item.bill_id,
+            name=item.name,
+            price=self.from_minor(item.price, currency),
+            count=item.count,
+            item_sum=self.from_minor(item.item_sum, currency),
+            assigned_to_user_id=item.assigned_to_user_id,
+            shares=[
+                self.share_response.model_construct(
+                    participant_id=share.participant_id,
+                    weight=share.weight,
+                    amount=self.from_minor(amount, currency)
+                )
+                for share, amount in shares
+            ]
+        )
+
+    def participant(self, p: BillUser, currency: str, profile: UserResponse | None = None):
+        username = p.guest_name
+        name = None
+        surname = None
+        avatar_url = None
+
+        if profile:
+            username = profile.username
+            name = profile.name
+            surname = profile.surname
+            avatar_url = profile.avatar_url
+
+        return self.participant_response.model_construct(
+            id=p.id,
+            bill_id=p.bill_id,
+            user_id=p.user_id,
+            guest_name=p.guest_name,
+            username=username,
+            name=name,
+            surname=surname,
+            avatar_url=avatar_url,
+            allocated_amount=self.from_minor(p.allocated_amount, currency),
+            is_paid=p.is_paid
+        )
+
+    def participants(self, participants: list[BillUser], currency: str, profiles: dict[int, UserResponse]):
+        """Map participants with user profiles fetched in one batch (UserRepository.get_profiles)"""
+        return [self.participant(p, currency, profiles.get(p.user_id)) for p in participants]
+
+    def detail(
+        self, bill: Bill, items: list[BillItem], participants: list[BillUser],
+        allocation: ShareAllocation, profiles: dict[int, UserResponse]
+    ):
+        currency = bill.currency
+        return self.detail_response.model_construct(
+            id=bill.id,
+            owner_id=bill.owner_id,
+            total_sum=self.from_minor(bill.total_sum, currency),
+            currency=currency,
+            title=bill.title,
+            payment_details=bill.payment_details,
+            split_type=bill.split_type,
+            status=bill.status,
+            unallocated_sum=self.from_minor(bill.unallocated_sum, currency),
+            created_at=bill.created_at,
+            version=bill.version,
+            items=[self.item(item, currency, allocation) for item in items],
+            participants=self.participants(participants, currency, profiles)
+        )
+
+
+class MinorUnitsBillMapper(BillMapper):
+    """Mapper for API v2: amounts are integers in minor units and pass through untouched"""
+    name = "v2"
+
+    bill_response = BillResponseV2
+    item_response = BillItemResponseV2
+    share_response = BillItemShareResponseV2
+    participant_response = BillParticipantResponseV2
+    detail_response = BillDetailResponseV2
+
+    def to_minor(self, amount: int, currency: str) -> int:
+        return amount
+
+    def from_minor(self, amount: int, currency: str) -> int:
+        return amount
+
+
+major_units_mapper = BillMapper()
+minor_units_mapper = MinorUnitsBillMapper()
@@ -3,31 +3,36 @@ from fastapi import HTTPException
 from app.repositories.bill_repo import BillRepository
 from app.repositories.user_repo import UserRepository
 from app.models import BillUser, SplitType, BillStatus
-from app.utils.currency import to_tiins, from_tiins
-from app.schemas.bill_schemas import BillParticipantCreate, BillParticipantResponse, BillParticipantPaymentUpdate, BillDetailResponse, BillItemResponse
+from app.schemas.bill_schemas import BillParticipantCreate, BillParticipantResponse, BillParticipantPaymentUpdate, BillDetailResponse
 from app.services.validator import BillValidator
+from app.services.bill_item_service import BillItemService
+from app.services.bill_mapper import BillMapper, major_units_mapper
 from app.notifier import notifier
+from app.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+@traced("service")
 class BillParticipantService:
-    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository, split_service=None):
+    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository, split_service=None, mapper: BillMapper = major_units_mapper):
         self.bill_repo = bill_repo
         self.user_repo = user_repo
         self.validator = BillValidator(bill_repo)
         self.split_service = split_service
+        self.mapper = mapper
 
     def add_bill_participant(self, bill_id: int, participant_data: BillParticipantCreate) -> list[BillParticipantResponse]:
         bill = self.validator.get_bill_or_404(bill_id)
         self.validator.ensure_bill_open(bill)
         
         if participant_data.user_id:
-            user = self.user_repo.get_by_id(participant_data.user_id)
-            if not user:
+            if not self.user_repo.exists(participant_data.user_id):
                 raise HTTPException(status_code=404, detail="User not found")
         
         if not participant_data.user_id and not participant_data.guest_name:
             raise HTTPException(status_code=400, detail="Must provide either user_id or guest_name")
+
+        currency = bill.currency
         
         participant = BillUser(
             bill_id=bill_id,
@@ -36,6 +41,7 @@ class BillParticipantService:
             allocated_amount=0
         )
         
+        self.bill_repo.bump_version(bill)
         created_participant = self.bill_repo.add_participant(participant)
         
         if bill.split_type == SplitType.EQUALLY:
@@ -51,14 +57,15 @@ class BillParticipantService:
         notifier.broadcast(bill_id, "REFRESH")
         
         all_participants = self.bill_repo.get_participants_by_bill_id(bill_id)
-        return [self.map_to_response(p) for p in all_participants]
+        return self.mapper.participants(all_participants, currency, self._profiles(all_participants))
 
     def update_payment_status(self, bill_id: int, participant_id: int, payment_data: BillParticipantPaymentUpdate) -> BillParticipantResponse:
         bill = self.validator.get_bill_or_404(bill_id)
         participant = self.validator.get_participant_or_404(participant_id, bill_id)
+        currency = bill.currency
 
         if participant.is_paid == payment_data.is_paid:
-            return self.map_to_response(participant)
+            return self._map_participant(participant, currency)
 
         is_owner = (bill.owner_id == payment_data.user_id)
         is_self = (participant.user_id == payment_data.user_id)
@@ -87,12 +94,13 @@ class BillParticipantService:
                     bill.status = BillStatus.CLOSED
                     self.bill_repo.session.add(bill)
 
+        self.bill_repo.bump_version(bill)
         self.bill_repo.session.commit()
         self.bill_repo.session.refresh(participant)
 
         notifier.broadcast(bill_id, "REFRESH")
 
-        return self.map_to_response(participant)
+        return self._map_participant(participant, currency)
 
     def delete_bill_participant(self, bill_id: int, participant_id: int, requester_id: int) -> BillDetailResponse:
         bill = self.validator.get_bill_or_404(bill_id)
@@ -116,6 +124,7 @@ class BillParticipantService:
             bill.unallocated_sum += participant.allocated_amount
             self.bill_repo.session.add(bill)
         
+        self.bill_repo.bump_version(bill)
         self.bill_repo.delete_participant(participant)
         
         if bill.split_type == SplitType.EQUALLY:
@@ -132,13 +141,13 @@ class BillParticipantService:
         bill = self.validator.get_bill_or_404(bill_id)
         self.validator.ensure_bill_open(bill)
         
-        user = self.user_repo.get_by_id(user_id)
-        if not user:
+        if not self.user_repo.exists(user_id):
             raise HTTPException(status_code=404, detail="User not found")
             
+        currency = bill.currency
         existing_participant = self.bill_repo.get_participant_by_bill_and_user(bill_id, user_id)
         if existing_participant:
-            return self.map_to_response(existing_participant)
+            return self._map_participant(existing_participant, currency)
             
         participant = BillUser(
             bill_id=bill_id,
@@ -146,6 +155,7 @@ class BillParticipantService:
             allocated_amount=0
         )
         
+        self.bill_repo.bump_version(bill)
         created_participant = self.bill_repo.add_participant(participant)
         
         if bill.split_type == SplitType.EQUALLY:
@@ -160,10 +170,7 @@ class BillParticipantService:
         
         notifier.broadcast(bill_id, "REFRESH")
         
-        if created_participant.user_id and not created_participant.user:
-            created_participant.user = self.user_repo.get_by_id(created_participant.user_id)
-            
-        return self.map_to_response(created_participant)
+        return self._map_participant(created_participant, currency)
 
     def confirm_and_close_bill(self, bill_id: int, user_id: int) -> BillDetailResponse:
         bill = self.validator.get_bill_or_404(bill_id)
@@ -178,7 +185,7 @@ class BillParticipantService:
         bill.status = BillStatus.CLOSED
         
         self.bill_repo.session.add(participant)
-        self.bill_repo.session.add(bill)
+        self.bill_repo.bump_version(bill)
         self.bill_repo.session.commit()
         
         notifier.broadcast(bill_id, "REFRESH")
@@ -189,51 +196,13 @@ class BillParticipantService:
         bill = self.validator.get_bill_or_404(bill_id)
         items = self.bill_repo.get_items_by_bill_id(bill_id)
         participants = self.bill_repo.get_participants_by_bill_id(bill_id)
+        shares = self.bill_repo.get_item_shares_by_bill_id(bill_id)
         
-        return BillDetailResponse(
-            id=bill.id,
-            owner_id=bill.owner_id,
-            total_sum=from_tiins(bill.total_sum),
-            title=bill.title,
-            payment_details=bill.payment_details,
-            split_type=bill.split_type,
-            status=bill.status,
-            unallocated_sum=from_tiins(bill.unallocated_sum),
-            created_at=bill.created_at,
-            items=[BillItemResponse(
-                id=item.id,
-                bill_id=item.bill_id,
-                name=item.name,
-                price=from_tiins(item.price),
-                count=item.count,
-                item_sum=from_tiins(item.item_sum),
-                assigned_to_user_id=item.assigned_to_user_id
-            ) for item in items],
-            participants=[self.map_to_response(p) for p in participants]
-        )
+        return self.mapper.detail(bill, items, participants, BillItemService.allocate_shares(items, shares), self._profiles(participants))
 
-    @staticmethod
-    def map_to_response(p: BillUser) -> BillParticipantResponse:
-        username = p.guest_name
-        name = None
-        surname = None
-        avatar_url = None
-        
-        if hasattr(p, "user") and p.user:
-            username = p.user.username
-            name = p.user.name
-            surname = p.user.surname
-            avatar_url = p.user.avatar_url
-            
-        return BillParticipantResponse(
-            id=p.id,
-            bill_id=p.bill_id,
-            user_id=p.user_id,
-            guest_name=p.guest_name,
-            username=username,
-            name=name,
-            surname=surname,
-            avatar_url=avatar_url,
-            allocated_amount=from_tiins(p.allocated_amount),
-            is_paid=p.is_paid
-        )
+    def _profiles(self, participants: list[BillUser]) -> dict:
+        return self.user_repo.get_profiles(p.user_id for p in participants if p.user_id)
+
+    def _map_participant(self, participant: BillUser, currency: str) -> BillParticipantResponse:
+        profile = self.user_repo.get_profile(participant.user_id) if participant.user_id else None
+        return self.mapper.participant(participant, currency, profile)
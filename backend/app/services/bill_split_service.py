@@ -1,18 +1,20 @@
 from fastapi import HTTPException
 from app.repositories.bill_repo import BillRepository
 from app.repositories.user_repo import UserRepository
-from app.models import SplitType
-from app.utils.currency import to_tiins, from_tiins
+from app.models import BillUser, SplitType
 from app.schemas.bill_schemas import BillParticipantResponse, BillParticipantAssign
 from app.services.validator import BillValidator
-from app.services.bill_participant_service import BillParticipantService
+from app.services.bill_mapper import BillMapper, major_units_mapper
 from app.notifier import notifier
+from app.tracing import traced
 
+@traced("service")
 class BillSplitService:
-    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository):
+    def __init__(self, bill_repo: BillRepository, user_repo: UserRepository, mapper: BillMapper = major_units_mapper):
         self.bill_repo = bill_repo
         self.user_repo = user_repo
         self.validator = BillValidator(bill_repo)
+        self.mapper = mapper
 
     def split_bill_equally(self, bill_id: int) -> list[BillParticipantResponse]:
         bill = self.validator.get_bill_or_404(bill_id)
@@ -51,12 +53,15 @@ class BillSplitService:
             
         bill.split_type = SplitType.EQUALLY
         bill.unallocated_sum = 0
-        self.bill_repo.session.add(bill)
+        currency = bill.currency
+        self.bill_repo.bump_version(bill)
         self.bill_repo.session.commit()
         
         notifier.broadcast(bill_id, "REFRESH")
-            
-        return [BillParticipantService.map_to_response(p) for p in all_participants]
+
+        # One query reloads every participant expired by the commit
+        all_participants = self.bill_repo.get_participants_by_bill_id(bill_id)
+        return self.mapper.participants(all_participants, currency, self._profiles(all_participants))
 
     def split_bill_remainder(self, bill_id: int, p_ids: list[int]) -> list[BillParticipantResponse]:
         bill = self.validator.get_bill_or_404(bill_id)
@@ -100,12 +105,14 @@ class BillSplitService:
 
         bill.unallocated_sum = 0
         bill.split_type = SplitType.MANUAL # Becomes manual as it's a specific allocation
-        self.bill_repo.session.add(bill)
+        currency = bill.currency
+        self.bill_repo.bump_version(bill)
         self.bill_repo.session.commit()
         
         notifier.broadcast(bill_id, "REFRESH")
 
-        return [BillParticipantService.map_to_response(p) for p in all_participants]
+        all_participants = self.bill_repo.get_participants_by_bill_id(bill_id)
+        return self.mapper.participants(all_participants, currency, self._profiles(all_participants))
 
     def assign_amount(self, bill_id: int, assign_data: BillParticipantAssign) -> BillParticipantResponse:
         bill = self.validator.get_bill_or_404(bill_id)
@@ -113,24 +120,29 @@ class BillSplitService:
             
         participant = self.validator.get_participant_or_404(assign_data.participant_id, bill_id)
             
-        allocated_amount_tiins = to_tiins(assign_data.allocated_amount)
+        currency = bill.currency
+        allocated_amount_tiins = self.mapper.to_minor(assign_data.allocated_amount, currency)
         diff = allocated_amount_tiins - participant.allocated_amount
         
         if diff > bill.unallocated_sum:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Amount exceeds unallocated sum. Max available: {from_tiins(bill.unallocated_sum + participant.allocated_amount)}"
+                detail=f"Amount exceeds unallocated sum. Max available: {self.mapper.from_minor(bill.unallocated_sum + participant.allocated_amount, currency)}"
             )
             
         participant.allocated_amount = allocated_amount_tiins
         bill.unallocated_sum -= diff
         bill.split_type = SplitType.MANUAL
         
-        self.bill_repo.session.add(bill)
+        self.bill_repo.bump_version(bill)
         self.bill_repo.session.commit()
         self.bill_repo.session.refresh(participant)
         
         notifier.broadcast(bill_id, "REFRESH")
         
-        return BillParticipantService.map_to_response(participant)
+        profile = self.user_repo.get_profile(participant.user_id) if participant.user_id else None
+        return self.mapper.participant(participant, currency, profile)
+
 
+    def _profiles(self, participants: list[BillUser]) -> dict:
+        return self.user_repo.get_profiles(p.user_id for p in participants if p.user_id)
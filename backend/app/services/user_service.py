@@ -1,24 +1,37 @@
+import json
 import os
 from fastapi import HTTPException
 from app.repositories.user_repo import UserRepository
-from app.models import User
-from app.schemas.user_schemas import UserCreate
-from app.utils.auth import verify_telegram_webapp_data, verify_telegram_widget_data
+from app.repositories.bill_repo import BillRepository
+from app.schemas.user_schemas import UserCreate, UserResponse, UserSessionResponse
+from app.utils.auth import (
+    parse_telegram_webapp_data, verify_telegram_webapp_params, verify_telegram_widget_data, create_session_token
+)
+from app.tracing import traced
 
+@traced("service")
 class UserService:
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: UserRepository, bill_repo: BillRepository | None = None):
         self.user_repo = user_repo
+        self.bill_repo = bill_repo
         self.bot_token = os.getenv("TG_TOKEN")
 
-    def get_user_by_id(self, user_id: int) -> User | None:
-        return self.user_repo.get_by_id(user_id)
+    def get_user_by_id(self, user_id: int) -> UserResponse | None:
+        return self.user_repo.get_profile(user_id)
 
-    def create_or_update_user(self, user_data: UserCreate) -> User:
+    def get_users_by_ids(self, user_ids: list[int]) -> list[UserResponse]:
+        """Existing users among user_ids, in the requested order"""
+        profiles = self.user_repo.get_profiles(user_ids)
+        return [profiles[user_id] for user_id in dict.fromkeys(user_ids) if user_id in profiles]
+
+    def create_or_update_user(self, user_data: UserCreate) -> UserResponse:
         # Validate Telegram authentication
         is_valid = False
+        init_params = None
         if user_data.init_data:
-            # Validate WebApp data
-            is_valid = verify_telegram_webapp_data(user_data.init_data, self.bot_token)
+            # Validate WebApp data, parsed once for the check and the profile below
+            init_params = parse_telegram_webapp_data(user_data.init_data)
+            is_valid = verify_telegram_webapp_params(init_params, self.bot_token)
         elif user_data.widget_data:
             # Validate Login Widget data
             is_valid = verify_telegram_widget_data(user_data.widget_data, self.bot_token)
@@ -34,13 +47,10 @@ class UserService:
         surname = user_data.surname
 
         if is_valid:
-            import json
-            if user_data.init_data:
+            if init_params is not None:
                 # Extract from init_data
-                from urllib.parse import parse_qs
-                params = parse_qs(user_data.init_data)
-                if 'user' in params:
-                    tg_user = json.loads(params['user'][0])
+                if 'user' in init_params:
+                    tg_user = json.loads(init_params['user'])
                     name = tg_user.get('first_name')
                     surname = tg_user.get('last_name')
             elif user_data.widget_data:
@@ -51,20 +61,29 @@ class UserService:
         if not is_valid:
             raise HTTPException(status_code=401, detail="Invalid Telegram authentication")
 
-        existing_user = self.user_repo.get_by_telegram_id(user_data.telegram_id)
-        
-        if existing_user:
-            existing_user.username = user_data.username
-            existing_user.name = name
-            existing_user.surname = surname
-            existing_user.avatar_url = user_data.avatar_url
-            return self.user_repo.update(existing_user)
-        
-        new_user = User(
-            telegram_id=user_data.telegram_id,
-            username=user_data.username,
-            name=name,
-            surname=surname,
-            avatar_url=user_data.avatar_url
+        profile = {
+            "username": user_data.username,
+            "name": name,
+            "surname": surname,
+            "avatar_url": user_data.avatar_url,
+        }
+        # Always upserted, never skipped on a cache hit: the profile cache is per process and
+        # may predate a login through another worker. An unchanged profile writes nothing.
+        user, changed = self.user_repo.upsert_profile(user_data.telegram_id, profile)
+        if changed:
+            if self.bill_repo:
+                # Participant names and avatars are part of the bill details, so their ETags must change
+                self.bill_repo.bump_versions_for_user(user.id)
+            # The row is complete as returned by the upsert; detach it so the commit does not expire and reload it
+            self.user_repo.session.expunge(user)
+            self.user_repo.session.commit()
+        return self.user_repo.remember(user)
+
+    @staticmethod
+    def map_to_session_response(profile: UserResponse) -> UserSessionResponse:
+        session_token, expires_at = create_session_token(profile.id)
+        return UserSessionResponse.model_construct(
+            **profile.__dict__,
+            session_token=session_token,
+            expires_at=expires_at
         )
-        return self.user_repo.create(new_user)
@@ -1,6 +1,6 @@
 from fastapi import HTTPException
 from app.repositories.bill_repo import BillRepository
-from app.models import Bill, BillUser
+from app.models import Bill, BillItem, BillUser
 
 class BillValidator:
     def __init__(self, bill_repo: BillRepository):
@@ -26,3 +26,9 @@ class BillValidator:
         if not participant or participant.bill_id != bill_id:
             raise HTTPException(status_code=404, detail="Participant not found for this bill")
         return participant
+
+    def get_item_or_404(self, item_id: int, bill_id: int) -> BillItem:
+        item = self.bill_repo.get_item_by_id(item_id)
+        if not item or item.bill_id != bill_id:
+            raise HTTPException(status_code=404, detail="Item not found for this bill")
+        return item
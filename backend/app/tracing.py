@@ -0,0 +1,342 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import IO, Protocol
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.metrics import route_label
+
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Correlation id of the request being handled; always set by TracingMiddleware
+current_request_id: ContextVar[str | None] = ContextVar("current_request_id", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "layer", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, layer: str, attributes: dict | None = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.layer = layer
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        """The span in OTLP/JSON shape"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 2 if self.layer == "http" else 3 if self.layer == "db" else 1,  # server, client, internal
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in {"layer": self.layer, **self.attributes}.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """Spans of one request; threadpool workers append to it through the copied context"""
+    __slots__ = ("trace_id", "request_id", "spans")
+
+    def __init__(self, request_id: str):
+        self.trace_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.spans: list[Span] = []
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+
+class InMemoryExporter:
+    """Keeps finished spans, for tests"""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+    def clear(self):
+        self.spans.clear()
+
+
+class JsonLinesExporter:
+    """
+    One OTLP/JSON span per line, to a stream or to the file at path (opened
+    by the writer thread on first use). export() only queues the spans of a
+    request; a background thread encodes and writes them, so the event loop
+    never waits on output. Spans that find the queue full are dropped and
+    counted, as log records are.
+    """
+
+    def __init__(self, stream: IO[str] | None = None, path: str | None = None, max_queue: int = 10000):
+        self.stream = stream
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def close(self):
+        """Write out the queued spans and stop the writer thread; a file it opened is closed"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _write(self):
+        stream = self.stream or open(self.path, "a", encoding="utf-8")
+        try:
+            while (spans := self.queue.get()) is not None:
+                stream.write("".join(json.dumps(span.to_otlp(), separators=(",", ":")) + "\n" for span in spans))
+                # One flush for a burst of requests
+                if self.queue.empty():
+                    stream.flush()
+        finally:
+            if self.stream is None:
+                stream.close()
+            else:
+                stream.flush()
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter | None = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+
+def create_tracer() -> Tracer:
+    exporter = os.getenv("TRACING_EXPORTER", "none").lower()
+    if exporter == "stdout":
+        return Tracer(JsonLinesExporter(sys.stdout))
+    if exporter == "file":
+        return Tracer(JsonLinesExporter(path=os.getenv("TRACING_FILE", "traces.jsonl")))
+    if exporter == "memory":
+        return Tracer(InMemoryExporter())
+    return Tracer()
+
+
+# Singleton instance
+tracer = create_tracer()
+
+
+def start_span(name: str, layer: str, attributes: dict | None = None) -> Span | None:
+    """New child of the current span; None outside a traced request"""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    parent = _current_span.get()
+    return Span(trace.trace_id, parent.span_id if parent else None, name, layer, attributes)
+
+
+def end_span(span: Span, error: BaseException | None = None):
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    _current_trace.get().spans.append(span)
+
+
+@contextmanager
+def span(name: str, layer: str = "app", **attributes):
+    """Trace the block as a child of the current span (no-op outside a traced request)"""
+    current = start_span(name, layer, attributes)
+    if current is None:
+        yield None
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        end_span(current, e)
+        raise
+    else:
+        end_span(current)
+    finally:
+        _current_span.reset(token)
+
+
+def traced(layer: str):
+    """
+    Class decorator giving every public method of the class (not static or
+    inherited ones) a span named Class.method, e.g. @traced("service")
+    """
+    def decorate(cls):
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_") or not callable(attr) or isinstance(attr, (staticmethod, classmethod, type)):
+                continue
+            setattr(cls, name, _traced_method(attr, f"{cls.__name__}.{name}", layer))
+        return cls
+    return decorate
+
+
+def _traced_method(fn, name: str, layer: str):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current_trace.get() is None:
+            return fn(*args, **kwargs)
+        with span(name, layer):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+_traced_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def trace_engine(engine: Engine):
+    """A db span for every statement of engine executed inside a traced request"""
+    if engine in _traced_engines:
+        return
+    _traced_engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        current = start_span(statement.split(None, 1)[0].upper(), "db", {
+            "db.system": engine.dialect.name,
+            "db.statement": statement[:1000],
+        })
+        conn.info.setdefault("trace_spans", []).append(current)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        current = conn.info["trace_spans"].pop()
+        if current is not None:
+            end_span(current)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("trace_spans"):
+            current = conn.info["trace_spans"].pop()
+            if current is not None:
+                end_span(current, exception_context.original_exception)
+
+
+class TracingMiddleware:
+    """
+    Gives every HTTP request a correlation id (X-Request-ID from the client
+    when valid, else generated), echoed in the response and put on log
+    records and SSE events. With an exporter configured the request also
+    gets a root span, exported with all its children when it finishes.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request_token = current_request_id.set(request_id)
+
+        status = 500
+
+        async def send_with_request_id(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        if not self.tracer.enabled:
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                current_request_id.reset(request_token)
+            return
+
+        trace = Trace(request_id)
+        trace_token = _current_trace.set(trace)
+        root = Span(trace.trace_id, None, scope["method"], "http", {"http.method": scope["method"], "request.id": request_id})
+        span_token = _current_span.set(root)
+        error = None
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            route = route_label(scope)
+            root.name = f"{scope['method']} {route}"
+            root.attributes["http.route"] = route
+            root.attributes["http.status_code"] = status
+            end_span(root, error)
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            current_request_id.reset(request_token)
+            self.tracer.exporter.export(trace.spans)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds request_id (the correlation id, or "-" outside requests) to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id.get() or "-"
+        return True
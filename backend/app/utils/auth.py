@@ -1,24 +1,73 @@
 import hashlib
 import hmac
 import json
+import os
+import secrets
 import time
+from functools import lru_cache
 from urllib.parse import parse_qsl
 
-def verify_telegram_webapp_data(init_data: str, bot_token: str) -> bool:
+SESSION_TOKEN_TTL = int(os.getenv("SESSION_TOKEN_TTL", str(12 * 3600)))
+
+@lru_cache(maxsize=8)
+def webapp_secret_key(bot_token: str) -> bytes:
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
+@lru_cache(maxsize=8)
+def widget_secret_key(bot_token: str) -> bytes:
+    return hashlib.sha256(bot_token.encode()).digest()
+
+@lru_cache(maxsize=1)
+def session_signing_key() -> bytes:
+    """
+    Key for session tokens: SESSION_SECRET, else derived from the bot token.
+    Without either (local development) a random key is used, so tokens only
+    live as long as the process.
+    """
+    secret = os.getenv("SESSION_SECRET") or os.getenv("TG_TOKEN")
+    if not secret:
+        return secrets.token_bytes(32)
+    return hmac.new(b"SessionToken", secret.encode(), hashlib.sha256).digest()
+
+def _sign(payload: str) -> str:
+    return hmac.new(session_signing_key(), payload.encode(), hashlib.sha256).hexdigest()
+
+def create_session_token(user_id: int, ttl: int = SESSION_TOKEN_TTL) -> tuple[str, int]:
+    """Issue a token for user_id; returns the token and its expiry as a unix timestamp"""
+    expires_at = int(time.time()) + ttl
+    payload = f"{user_id}.{expires_at}"
+    return f"{payload}.{_sign(payload)}", expires_at
+
+def verify_session_token(token: str) -> int | None:
+    """Return the user id of a valid, unexpired token, None otherwise"""
+    try:
+        user_id, expires_at, signature = token.split(".")
+        if not hmac.compare_digest(_sign(f"{user_id}.{expires_at}").encode(), signature.encode()):
+            return None
+        if int(expires_at) < time.time():
+            return None
+        return int(user_id)
+    except ValueError:
+        return None
+
+def parse_telegram_webapp_data(init_data: str) -> dict[str, str]:
+    """Parse the init_data query string once; the result serves both verification and profile fields"""
+    return dict(parse_qsl(init_data))
+
+def verify_telegram_webapp_params(vals: dict[str, str], bot_token: str) -> bool:
     """
     Verify the validity of data received from the Telegram WebApp.
-    init_data: The full query string from window.Telegram.WebApp.initData
+    vals: window.Telegram.WebApp.initData parsed with parse_telegram_webapp_data
     bot_token: Your bot's token
     """
     try:
-        vals = dict(parse_qsl(init_data))
         if 'hash' not in vals:
             return False
             
-        data_hash = vals.pop('hash')
-        data_check_string = "\n".join([f"{k}={v}" for k, v in sorted(vals.items())])
+        data_hash = vals['hash']
+        data_check_string = "\n".join([f"{k}={v}" for k, v in sorted(vals.items()) if k != 'hash'])
         
-        secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+        secret_key = webapp_secret_key(bot_token)
         check_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
         
         # Check if hash matches
@@ -55,7 +104,7 @@ def verify_telegram_widget_data(data: dict, bot_token: str) -> bool:
         data_check_string = "\n".join(check_list)
         
         # Secret key for widget is just SHA256 of bot token
-        secret_key = hashlib.sha256(bot_token.encode()).digest()
+        secret_key = widget_secret_key(bot_token)
         check_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
         
         # Restore hash to data for potential further use
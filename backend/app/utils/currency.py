@@ -1,12 +1,68 @@
 from decimal import Decimal, ROUND_HALF_UP
 
-def to_tiins(amount: float) -> int:
-    """Convert human-readable currency units to tiins (integer) safely using Decimal"""
+# Number of minor units digits per ISO 4217 currency (UZS tiins, RUB kopeks, US cents, JPY has none)
+CURRENCY_EXPONENTS = {
+    "UZS": 2,
+    "RUB": 2,
+    "USD": 2,
+    "JPY": 0,
+}
+DEFAULT_CURRENCY = "UZS"
+
+# Scale tables computed once per currency instead of per conversion
+_SCALES = {code: 10 ** exp for code, exp in CURRENCY_EXPONENTS.items()}
+_DECIMAL_SCALES = {code: Decimal(scale) for code, scale in _SCALES.items()}
+# Below this many major units every value with `exp` decimals has at most 15
+# significant digits, so the float closest to it round-trips exactly and float
+# math gives the same result as Decimal
+_FAST_PATH_LIMITS = {code: 10 ** (15 - exp) for code, exp in CURRENCY_EXPONENTS.items()}
+# Integers up to 2**53 are exact floats, so minor / scale is correctly rounded
+_FAST_MINOR_LIMIT = 2**53
+
+
+def is_supported_currency(currency: str) -> bool:
+    return currency in CURRENCY_EXPONENTS
+
+def to_minor_units_exact(amount: float, currency: str = DEFAULT_CURRENCY) -> int:
+    """Convert major units to minor units (integer) safely using Decimal"""
     # Convert to string first to avoid float precision artifacts
     d = Decimal(str(amount))
-    return int((d * Decimal('100')).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    return int((d * _DECIMAL_SCALES[currency]).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_minor_units_exact(minor: int, currency: str = DEFAULT_CURRENCY) -> float:
+    """Convert minor units (integer) to major units (float) via Decimal"""
+    return float(Decimal(minor) / _DECIMAL_SCALES[currency])
+
+def to_minor_units(amount: float, currency: str = DEFAULT_CURRENCY) -> int:
+    """Convert major units to minor units (integer), same result as to_minor_units_exact"""
+    scale = _SCALES[currency]
+    limit = _FAST_PATH_LIMITS[currency]
+    if -limit < amount < limit:
+        minor = round(amount * scale)
+        # The amount has no more decimals than the currency exactly when this
+        # round-trips; anything else (half units, extra decimals) takes the Decimal path
+        if minor / scale == amount:
+            return minor
+    return to_minor_units_exact(amount, currency)
+
+def from_minor_units(minor: int, currency: str = DEFAULT_CURRENCY) -> float:
+    """Convert minor units (integer) to major units (float)"""
+    if -_FAST_MINOR_LIMIT < minor < _FAST_MINOR_LIMIT:
+        return minor / _SCALES[currency]
+    return from_minor_units_exact(minor, currency)
+
+def to_tiins_exact(amount: float) -> int:
+    """Convert human-readable currency units to tiins (integer) safely using Decimal"""
+    return to_minor_units_exact(amount, "UZS")
+
+def from_tiins_exact(tiins: int) -> float:
+    """Convert tiins (integer) to human-readable currency units (float) via Decimal"""
+    return from_minor_units_exact(tiins, "UZS")
+
+def to_tiins(amount: float) -> int:
+    """Convert human-readable currency units to tiins (integer)"""
+    return to_minor_units(amount, "UZS")
 
 def from_tiins(tiins: int) -> float:
     """Convert tiins (integer) to human-readable currency units (float)"""
-    # We return float for the API, but do the division via Decimal for precision
-    return float(Decimal(tiins) / Decimal('100'))
+    return from_minor_units(tiins, "UZS")
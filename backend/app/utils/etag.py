@@ -0,0 +1,23 @@
+import hashlib
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that identify a representation"""
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def bill_etag(bill_id: int, version: int, variant: str = "v1") -> str:
+    """ETag of a bill detail representation; changes with every bill version"""
+    return f'"{variant}-bill-{bill_id}-{version}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check an If-None-Match header against the current ETag.
+    If-None-Match uses the weak comparison, so a W/ prefix added by a proxy
+    (e.g. nginx gzip) still matches.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
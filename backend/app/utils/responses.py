@@ -0,0 +1,31 @@
+import time
+from typing import Any
+from pydantic import BaseModel
+from starlette.responses import Response
+from app.profiling import current_profile
+
+class ModelResponse(Response):
+    """
+    JSON response for response models the services have already built.
+    Returning it from a route bypasses FastAPI's response_model validation, so
+    nested items and participants are encoded once by pydantic-core and never
+    re-validated. The route's response_model still documents the schema.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        profile = current_profile.get()
+        if profile is None:
+            return self._render(content)
+        start = time.perf_counter()
+        body = self._render(content)
+        profile.serialization_seconds += time.perf_counter() - start
+        return body
+
+    @staticmethod
+    def _render(content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        if isinstance(content, list):
+            return b"[" + b",".join(m.__pydantic_serializer__.to_json(m) for m in content) + b"]"
+        raise TypeError(f"ModelResponse cannot render {type(content).__name__}")
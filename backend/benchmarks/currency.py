@@ -0,0 +1,45 @@
+"""
+Cost of amount conversion, per value and per bill detail response.
+
+- exact: the Decimal-based conversions (to_tiins_exact / from_tiins_exact)
+- fast: to_tiins / from_tiins used by API v1, falling back to Decimal only when needed
+- v2: API v2 mapper, amounts pass through as integers
+"""
+import random
+from app.services.bill_item_service import BillItemService
+from app.services.bill_mapper import BillMapper, major_units_mapper, minor_units_mapper
+from app.utils.currency import to_tiins, from_tiins, to_minor_units_exact, from_minor_units_exact, to_tiins_exact, from_tiins_exact
+from benchmarks.fixtures import build_bill, build_profiles
+from benchmarks.harness import measure, print_report
+
+class ExactBillMapper(BillMapper):
+    """v1 mapper as it was before the fast path"""
+
+    def to_minor(self, amount: float, currency: str) -> int:
+        return to_minor_units_exact(amount, currency)
+
+    def from_minor(self, amount: int, currency: str) -> float:
+        return from_minor_units_exact(amount, currency)
+
+def run(values_count: int = 10_000) -> dict[str, dict]:
+    rnd = random.Random(42)
+    amounts = [rnd.randint(0, 10**9) / 100 for _ in range(values_count)]
+    tiins = [rnd.randint(0, 10**11) for _ in range(values_count)]
+
+    bill, items, participants, shares = build_bill()
+    profiles = build_profiles(participants)
+    allocation = BillItemService.allocate_shares(items, shares)
+    exact_mapper = ExactBillMapper()
+
+    return {
+        f"to_tiins_exact x{values_count}": measure(lambda: [to_tiins_exact(a) for a in amounts]),
+        f"to_tiins x{values_count}": measure(lambda: [to_tiins(a) for a in amounts]),
+        f"from_tiins_exact x{values_count}": measure(lambda: [from_tiins_exact(t) for t in tiins]),
+        f"from_tiins x{values_count}": measure(lambda: [from_tiins(t) for t in tiins]),
+        "detail response, exact": measure(lambda: exact_mapper.detail(bill, items, participants, allocation, profiles)),
+        "detail response, fast v1": measure(lambda: major_units_mapper.detail(bill, items, participants, allocation, profiles)),
+        "detail response, v2": measure(lambda: minor_units_mapper.detail(bill, items, participants, allocation, profiles)),
+    }
+
+if __name__ == "__main__":
+    print_report("Amount conversion (ms per batch / per response, 500 items / 50 participants)", run())
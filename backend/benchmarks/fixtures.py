@@ -0,0 +1,37 @@
+import random
+from datetime import datetime
+from app.models import Bill, BillItem, BillItemShare, BillUser, User
+from app.repositories.user_repo import to_profile
+
+def build_bill(items_count: int = 500, participants_count: int = 50, seed: int = 42):
+    """Detached ORM objects of one large bill, the same shape the repositories return"""
+    rnd = random.Random(seed)
+    now = datetime(2026, 1, 1, 12, 0)
+    bill = Bill(
+        id=1, owner_id=1, total_sum=0, unallocated_sum=0, currency="UZS", title="Banquet",
+        payment_details="Card 1234", split_type="manual", status="open",
+        version=1, created_at=now, updated_at=now
+    )
+
+    participants = []
+    for i in range(1, participants_count + 1):
+        participant = BillUser(id=i, bill_id=1, user_id=i, guest_name=None, allocated_amount=rnd.randint(0, 10**7), is_paid=i % 3 == 0)
+        participant.user = User(id=i, telegram_id=10**6 + i, username=f"user{i}", name=f"Name{i}", surname=f"Surname{i}", avatar_url=f"https://t.me/i/userpic/{i}.jpg")
+        participants.append(participant)
+
+    items = []
+    shares = []
+    for i in range(1, items_count + 1):
+        price = rnd.randint(100, 500_000)
+        count = rnd.randint(1, 4)
+        items.append(BillItem(id=i, bill_id=1, name=f"Dish {i}", price=price, count=count, item_sum=price * count, assigned_to_user_id=rnd.randint(1, participants_count)))
+        if i % 5 == 0:
+            for p_id in rnd.sample(range(1, participants_count + 1), 3):
+                shares.append(BillItemShare(id=len(shares) + 1, item_id=i, participant_id=p_id, weight=rnd.randint(1, 3)))
+
+    bill.total_sum = sum(item.item_sum for item in items)
+    return bill, items, participants, shares
+
+def build_profiles(participants: list[BillUser]) -> dict:
+    """User profiles of the participants, as UserRepository.get_profiles returns them"""
+    return {p.user_id: to_profile(p.user) for p in participants if p.user_id}
@@ -0,0 +1,16 @@
+import statistics
+import timeit
+from typing import Callable
+
+def measure(fn: Callable[[], object], number: int = 20, repeat: int = 5) -> dict:
+    """Time fn and return the best and median milliseconds per call"""
+    fn()  # warm up lazily built schemas and caches
+    timings = [t / number * 1000 for t in timeit.repeat(fn, number=number, repeat=repeat)]
+    return {"best_ms": min(timings), "median_ms": statistics.median(timings)}
+
+def print_report(title: str, results: dict[str, dict]):
+    print(title)
+    width = max(len(name) for name in results)
+    print(f"  {'case'.ljust(width)}  {'best ms':>10}  {'median ms':>10}")
+    for name, result in results.items():
+        print(f"  {name.ljust(width)}  {result['best_ms']:>10.3f}  {result['median_ms']:>10.3f}")
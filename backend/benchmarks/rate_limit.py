@@ -0,0 +1,42 @@
+"""
+Overhead of the rate limiter on the request path, in microseconds per request.
+
+- acquire: one token bucket update in the in-memory backend
+- check: RateLimiter.check, as called for each policy
+- dependency: enforce_rate_limit for a bill mutation (user and bill buckets)
+"""
+from starlette.requests import Request
+from app import rate_limit
+from app.rate_limit import MemoryRateLimitBackend, Policy, RateLimiter, enforce_rate_limit
+from benchmarks.harness import measure
+
+def run(calls: int = 10_000, users: int = 1_000) -> dict[str, dict]:
+    # Buckets never run dry, so every call takes the allowed path
+    policy = Policy(rate=1e9, burst=10**9)
+    backend = MemoryRateLimitBackend()
+    limiter = RateLimiter(MemoryRateLimitBackend(), {"user": policy, "bill": policy})
+    keys = [f"u{i % users}" for i in range(calls)]
+    requests = [
+        Request({
+            "type": "http", "method": "POST", "path": f"/api/bills/{i % 100}/items",
+            "path_params": {"bill_id": i % 100}, "headers": [], "client": ("10.0.0.1", 1234),
+        })
+        for i in range(calls)
+    ]
+    # The dependency goes through the module singleton
+    singleton, rate_limit.rate_limiter = rate_limit.rate_limiter, limiter
+    try:
+        return {
+            "acquire": measure(lambda: [backend.acquire(k, policy) for k in keys], number=5),
+            "check": measure(lambda: [limiter.check("user", k) for k in keys], number=5),
+            "dependency": measure(lambda: [enforce_rate_limit(r, i % users) for i, r in enumerate(requests)], number=5),
+        }
+    finally:
+        rate_limit.rate_limiter = singleton
+
+if __name__ == "__main__":
+    calls = 10_000
+    results = run(calls)
+    print(f"Rate limiter overhead (us per request, {calls} requests per batch)")
+    for name, result in results.items():
+        print(f"  {name.ljust(10)}  best {result['best_ms'] * 1000 / calls:6.2f} us  median {result['median_ms'] * 1000 / calls:6.2f} us")
@@ -0,0 +1,44 @@
+"""
+Serialization cost of a bill with 500 items and 50 participants.
+
+- validated: models built with validation, then the work FastAPI does for a
+  route with response_model (dump, re-validate, dump to JSON-able python,
+  json.dumps in JSONResponse)
+- model_response: models built with model_construct and encoded once by
+  pydantic-core through ModelResponse
+"""
+import json
+from pydantic import TypeAdapter
+from app.schemas.bill_schemas import BillDetailResponse
+from app.services.bill_item_service import BillItemService
+from app.services.bill_mapper import major_units_mapper
+from app.utils.responses import ModelResponse
+from benchmarks.fixtures import build_bill, build_profiles
+from benchmarks.harness import measure, print_report
+
+def validated_path(bill, items, participants, shares, profiles, adapter: TypeAdapter) -> bytes:
+    details = major_units_mapper.detail(bill, items, participants, BillItemService.allocate_shares(items, shares), profiles)
+    # Building the models with validation, as the services did before
+    details = BillDetailResponse.model_validate(details.model_dump())
+    # FastAPI: _prepare_response_content, validate against response_model, serialize, JSONResponse.render
+    content = details.model_dump()
+    value = adapter.validate_python(content)
+    jsonable = adapter.dump_python(value, mode="json")
+    return json.dumps(jsonable, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def model_response_path(bill, items, participants, shares, profiles) -> bytes:
+    details = major_units_mapper.detail(bill, items, participants, BillItemService.allocate_shares(items, shares), profiles)
+    return ModelResponse(details).body
+
+def run(items_count: int = 500, participants_count: int = 50) -> dict[str, dict]:
+    bill, items, participants, shares = build_bill(items_count, participants_count)
+    profiles = build_profiles(participants)
+    adapter = TypeAdapter(BillDetailResponse)
+    assert json.loads(validated_path(bill, items, participants, shares, profiles, adapter)) == json.loads(model_response_path(bill, items, participants, shares, profiles))
+    return {
+        "validated": measure(lambda: validated_path(bill, items, participants, shares, profiles, adapter)),
+        "model_response": measure(lambda: model_response_path(bill, items, participants, shares, profiles)),
+    }
+
+if __name__ == "__main__":
+    print_report("BillDetailResponse, 500 items / 50 participants", run())
@@ -0,0 +1,68 @@
+"""
+BillSplitService at growing participant counts, against in-memory SQLite.
+
+- equal / remainder: split_bill_equally and split_bill_remainder as the
+  routes call them (validation, allocation, flush, commit, reload, mapping).
+  Each call first flips the bill total with one UPDATE so that every
+  participant row is actually rewritten.
+- map participants: BillMapper.participants alone, as every split and
+  participant route returns it
+"""
+from sqlalchemy import update
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+from app.models import Bill, BillUser, User
+from app.repositories.bill_repo import BillRepository
+from app.repositories.user_repo import UserRepository
+from app.services.bill_mapper import major_units_mapper
+from app.services.bill_split_service import BillSplitService
+from benchmarks.fixtures import build_bill, build_profiles
+from benchmarks.harness import measure, print_report
+
+PARTICIPANT_COUNTS = (10, 100, 1000)
+
+def _seed(session: Session, bill_id: int, participants_count: int):
+    session.add(Bill(id=bill_id, owner_id=bill_id * 10_000, total_sum=0, unallocated_sum=0, title="Banquet"))
+    for i in range(participants_count):
+        user_id = bill_id * 10_000 + i
+        session.add(User(id=user_id, telegram_id=user_id, username=f"user{user_id}"))
+        session.add(BillUser(bill_id=bill_id, user_id=user_id, allocated_amount=0))
+    session.commit()
+
+def _flip_total(session: Session, bill_id: int, state: list[int]):
+    state[0] ^= 1
+    total = 10**9 + state[0] * 7
+    session.execute(update(Bill).where(Bill.id == bill_id).values(total_sum=total, unallocated_sum=total))
+
+def run(participant_counts: tuple[int, ...] = PARTICIPANT_COUNTS) -> dict[str, dict]:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    results = {}
+    with Session(engine) as session:
+        service = BillSplitService(BillRepository(session), UserRepository(session))
+        for bill_id, count in enumerate(participant_counts, start=1):
+            _seed(session, bill_id, count)
+            participant_ids = [p.id for p in service.bill_repo.get_participants_by_bill_id(bill_id)]
+            state = [0]
+            # Few participants are cheap enough to time more often
+            number = max(1, 2000 // count)
+
+            def equal(bill_id=bill_id, state=state):
+                _flip_total(session, bill_id, state)
+                return service.split_bill_equally(bill_id)
+
+            def remainder(bill_id=bill_id, state=state, participant_ids=participant_ids):
+                _flip_total(session, bill_id, state)
+                return service.split_bill_remainder(bill_id, participant_ids)
+
+            results[f"equal x{count}"] = measure(equal, number=number)
+            results[f"remainder x{count}"] = measure(remainder, number=number)
+
+    for count in (50, 500):
+        bill, _, participants, _ = build_bill(items_count=1, participants_count=count)
+        profiles = build_profiles(participants)
+        results[f"map participants x{count}"] = measure(lambda: major_units_mapper.participants(participants, bill.currency, profiles), number=50)
+    return results
+
+if __name__ == "__main__":
+    print_report("Bill splitting (ms per call)", run())
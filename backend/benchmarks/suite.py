@@ -0,0 +1,83 @@
+"""
+All micro-benchmarks in one run, compared against a stored baseline.
+
+    python -m benchmarks.suite                  # run and compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save           # run and store the results as the new baseline
+    python -m benchmarks.suite --only split     # one group
+    python -m benchmarks.suite --fail-on-regression
+
+Comparisons use the best time of each case, the least noisy figure. The
+baseline is only meaningful on the machine that recorded it: record one on
+main before measuring a branch on the same machine.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from benchmarks import currency, rate_limit, serialization, split
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+GROUPS = {
+    "split": split.run,
+    "currency": currency.run,
+    "serialization": serialization.run,
+    "rate_limit": rate_limit.run,
+}
+
+def run(groups: list[str] | None = None) -> dict[str, dict]:
+    results = {}
+    for group in groups or GROUPS:
+        for case, result in GROUPS[group]().items():
+            results[f"{group}: {case}"] = result
+    return results
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict[str, float]:
+    return json.loads(path.read_text()) if path.exists() else {}
+
+def save_baseline(results: dict[str, dict], path: Path = BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline.update({case: round(result["best_ms"], 6) for case, result in results.items()})
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+def compare(results: dict[str, dict], baseline: dict[str, float], threshold: float) -> list[dict]:
+    """One row per case; verdict is slower/faster beyond threshold (a fraction), else ok or new"""
+    rows = []
+    for case, result in results.items():
+        best = result["best_ms"]
+        before = baseline.get(case)
+        if before is None:
+            rows.append({"case": case, "best_ms": best, "baseline_ms": None, "change": None, "verdict": "new"})
+            continue
+        change = best / before - 1 if before else 0.0
+        verdict = "slower" if change > threshold else "faster" if change < -threshold else "ok"
+        rows.append({"case": case, "best_ms": best, "baseline_ms": before, "change": change, "verdict": verdict})
+    return rows
+
+def print_comparison(rows: list[dict], threshold: float):
+    print(f"Benchmarks vs baseline (best ms, threshold {threshold:.0%})")
+    width = max(len(row["case"]) for row in rows)
+    print(f"  {'case'.ljust(width)}  {'baseline':>10}  {'current':>10}  {'change':>8}")
+    for row in rows:
+        baseline = f"{row['baseline_ms']:>10.3f}" if row["baseline_ms"] is not None else f"{'-':>10}"
+        change = f"{row['change']:>+8.1%}" if row["change"] is not None else f"{'':>8}"
+        flag = "" if row["verdict"] == "ok" else f"  {row['verdict'].upper()}"
+        print(f"  {row['case'].ljust(width)}  {baseline}  {row['best_ms']:>10.3f}  {change}{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks and compare with the stored baseline")
+    parser.add_argument("--only", action="append", choices=list(GROUPS), help="run only this group (repeatable)")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if any case got slower")
+    args = parser.parse_args()
+
+    results = run(args.only)
+    rows = compare(results, load_baseline(args.baseline), args.threshold)
+    print_comparison(rows, args.threshold)
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    if args.fail_on_regression and any(row["verdict"] == "slower" for row in rows):
+        sys.exit(1)
@@ -0,0 +1,45 @@
+"""add_bill_item_shares
+
+Revision ID: 3b9c2f7d1a05
+Revises: 664900246755
+Create Date: 2026-10-19 10:12:31.418265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9c2f7d1a05'
+down_revision: Union[str, Sequence[str], None] = '664900246755'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'bill_item_shares',
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('participant_id', sa.Integer(), nullable=False),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['bill_items.id'], ),
+        sa.ForeignKeyConstraint(['participant_id'], ['bills_users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bill_item_shares_item_id'), 'bill_item_shares', ['item_id'], unique=False)
+    op.create_index(op.f('ix_bill_item_shares_participant_id'), 'bill_item_shares', ['participant_id'], unique=False)
+    op.create_index('ix_bill_item_share_unique', 'bill_item_shares', ['item_id', 'participant_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bill_item_share_unique', table_name='bill_item_shares')
+    op.drop_index(op.f('ix_bill_item_shares_participant_id'), table_name='bill_item_shares')
+    op.drop_index(op.f('ix_bill_item_shares_item_id'), table_name='bill_item_shares')
+    op.drop_table('bill_item_shares')
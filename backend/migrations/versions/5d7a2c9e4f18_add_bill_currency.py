@@ -0,0 +1,28 @@
+"""add_bill_currency
+
+Revision ID: 5d7a2c9e4f18
+Revises: 8e41d0c6b2f3
+Create Date: 2026-10-19 14:26:10.418275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7a2c9e4f18'
+down_revision: Union[str, Sequence[str], None] = '8e41d0c6b2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('bills', sa.Column('currency', sa.String(length=3), server_default='UZS', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('bills', 'currency')
@@ -0,0 +1,28 @@
+"""add_bill_version
+
+Revision ID: 8e41d0c6b2f3
+Revises: 3b9c2f7d1a05
+Create Date: 2026-10-19 11:02:47.903512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41d0c6b2f3'
+down_revision: Union[str, Sequence[str], None] = '3b9c2f7d1a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('bills', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('bills', 'version')
@@ -1,9 +1,16 @@
 import pytest
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import get_session
+from app.database import get_engine, get_session
+from app.cache import bill_detail_cache, user_profile_cache
+from app.idempotency import idempotency_store
+from app.rate_limit import rate_limiter
+from app.metrics import instrument_engine, metrics
+from app.tracing import trace_engine
+from app.deadlines import enforce_deadlines
 
 # Use an in-memory SQLite database for tests
 DATABASE_URL = "sqlite://"
@@ -15,17 +22,55 @@ def session_fixture():
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+    enforce_deadlines(engine)
     SQLModel.metadata.create_all(engine)
+    instrument_engine(engine)
+    trace_engine(engine)
     with Session(engine) as session:
         yield session
     SQLModel.metadata.drop_all(engine)
 
+class QueryCounter:
+    """
+    Records the SQL statements issued on an engine inside `with counter:`
+    blocks; each block starts from zero.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: list[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+@pytest.fixture(name="queries")
+def queries_fixture(session: Session) -> QueryCounter:
+    return QueryCounter(session.get_bind())
+
 @pytest.fixture(name="client")
 def client_fixture(session: Session):
     def get_session_override():
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_engine] = lambda: session.get_bind()
+    bill_detail_cache.clear()
+    user_profile_cache.clear()
+    idempotency_store.clear()
+    rate_limiter.reset()
+    metrics.clear()
     client = TestClient(app, base_url="http://testserver/api")
     yield client
     app.dependency_overrides.clear()
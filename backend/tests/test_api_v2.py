@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+def test_v2_amounts_are_integer_tiins(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    client.post("/users/", json={"telegram_id": 2, "username": "p1"})
+
+    resp_bill = client.post("/v2/bills/", json={"owner_id": 1, "total_sum": 10001, "include_owner": True})
+    assert resp_bill.status_code == 200
+    bill = resp_bill.json()
+    assert bill["total_sum"] == 10001
+    assert bill["unallocated_sum"] == 10001
+    bill_id = bill["id"]
+
+    resp_item = client.post(f"/v2/bills/{bill_id}/items", json={"name": "Pizza", "price": 4550, "count": 2})
+    assert resp_item.json()["price"] == 4550
+    assert resp_item.json()["item_sum"] == 9100
+
+    client.post(f"/v2/bills/{bill_id}/participants", json={"user_id": 2})
+    response = client.post(f"/v2/bills/{bill_id}/split-equally")
+    amounts = sorted(p["allocated_amount"] for p in response.json())
+    assert amounts == [5000, 5001]
+
+    details = client.get(f"/v2/bills/{bill_id}")
+    assert details.json()["total_sum"] == 10001
+    assert b'"total_sum":10001,' in details.content
+
+    # v1 sees the same bill in major units
+    assert client.get(f"/bills/{bill_id}").json()["total_sum"] == 100.01
+
+def test_v2_assign_amount_and_user_bills(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/v2/bills/", json={"owner_id": 1, "total_sum": 5000, "include_owner": True}).json()["id"]
+    part_id = client.get(f"/v2/bills/{bill_id}").json()["participants"][0]["id"]
+
+    response = client.post(f"/v2/bills/{bill_id}/assign-amount", json={"participant_id": part_id, "allocated_amount": 6000})
+    assert response.status_code == 400
+    assert "Max available: 5000" in response.json()["detail"]
+
+    response = client.post(f"/v2/bills/{bill_id}/assign-amount", json={"participant_id": part_id, "allocated_amount": 1234})
+    assert response.json()["allocated_amount"] == 1234
+
+    bills = client.get("/v2/users/1/bills").json()
+    assert bills[0]["unallocated_sum"] == 3766
+
+def test_v2_rejects_fractional_amounts(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    response = client.post("/v2/bills/", json={"owner_id": 1, "total_sum": 100.5})
+    assert response.status_code == 422
+
+def test_v1_and_v2_details_cached_separately(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 12.5}).json()["id"]
+
+    v1 = client.get(f"/bills/{bill_id}")
+    v2 = client.get(f"/v2/bills/{bill_id}")
+    assert v1.json()["total_sum"] == 12.5
+    assert v2.json()["total_sum"] == 1250
+    assert v1.headers["ETag"] != v2.headers["ETag"]
+    assert client.get(f"/v2/bills/{bill_id}", headers={"If-None-Match": v1.headers["ETag"]}).status_code == 200
+
+def test_bill_currency_sets_minor_unit(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+
+    resp_bill = client.post("/bills/", json={"owner_id": 1, "total_sum": 1500, "currency": "JPY", "include_owner": True})
+    assert resp_bill.status_code == 200
+    assert resp_bill.json()["currency"] == "JPY"
+    bill_id = resp_bill.json()["id"]
+
+    client.post(f"/bills/{bill_id}/items", json={"name": "Ramen", "price": 750, "count": 2})
+
+    # Yen have no minor unit, so v2 amounts equal v1 amounts
+    v1 = client.get(f"/bills/{bill_id}").json()
+    v2 = client.get(f"/v2/bills/{bill_id}").json()
+    assert v1["total_sum"] == 1500
+    assert v2["total_sum"] == 1500
+    assert v2["items"][0]["item_sum"] == 1500
+    assert v2["currency"] == "JPY"
+
+def test_unsupported_currency(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    response = client.post("/bills/", json={"owner_id": 1, "total_sum": 10, "currency": "XYZ"})
+    assert response.status_code == 400
@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.cache import BillDetailCache, MemoryCacheBackend, bill_detail_cache
+
+def test_memory_backend_lru_eviction():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", b"1")
+    backend.set("b", b"2")
+    assert backend.get("a") == b"1"  # "a" is now most recently used
+
+    backend.set("c", b"3")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+    assert backend.get("c") == b"3"
+    assert backend.evictions == 1
+
+def test_memory_backend_size_and_ttl_bounds():
+    backend = MemoryCacheBackend(max_bytes=10)
+    backend.set("a", b"12345")
+    backend.set("b", b"123456")
+    assert backend.get("a") is None
+    assert backend.size_bytes == 6
+
+    # Payloads larger than the whole cache are not stored at all
+    backend.set("huge", b"x" * 11)
+    assert backend.get("huge") is None
+
+    expired = MemoryCacheBackend(ttl=0)
+    expired.set("a", b"1")
+    assert expired.get("a") is None
+    assert expired.evictions == 1
+
+def test_bill_detail_cache_is_version_aware():
+    cache = BillDetailCache(MemoryCacheBackend())
+    cache.set(1, 3, b"{}")
+    assert cache.get(1, 3) == b"{}"
+    assert cache.get(1, 4) is None
+
+    cache.invalidate(1)
+    assert cache.get(1, 3) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0}
+
+def test_bill_details_served_from_cache(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+
+    first = client.get(f"/bills/{bill_id}")
+    second = client.get(f"/bills/{bill_id}")
+    assert first.content == second.content
+    assert bill_detail_cache.stats()["hits"] == 1
+    assert bill_detail_cache.stats()["misses"] == 1
+
+    # A mutation broadcasts REFRESH, which drops the cached payload
+    client.post(f"/bills/{bill_id}/items", json={"name": "Tea", "price": 5})
+    assert bill_detail_cache.get(bill_id, 1) is None
+
+    third = client.get(f"/bills/{bill_id}")
+    assert len(third.json()["items"]) == 1
+    assert third.json()["version"] == 2
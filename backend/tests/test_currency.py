@@ -0,0 +1,50 @@
+import random
+import pytest
+from app.utils.currency import (
+    to_tiins, from_tiins, to_tiins_exact, from_tiins_exact,
+    to_minor_units, from_minor_units, to_minor_units_exact, from_minor_units_exact
+)
+
+@pytest.mark.parametrize("amount, tiins", [
+    (0, 0),
+    (150.5, 15050),
+    (0.1, 10),
+    (1.005, 101),      # half a tiin rounds up, as with Decimal
+    (-2.675, -268),
+    (33.333, 3333),
+    (1e15, 10**17),    # beyond the fast path
+])
+def test_to_tiins(amount, tiins):
+    assert to_tiins(amount) == tiins
+
+def test_fast_conversions_match_decimal():
+    rnd = random.Random(7)
+    for _ in range(20000):
+        amount = rnd.choice([
+            rnd.randint(-10**12, 10**12) / 100,
+            round(rnd.uniform(-10**6, 10**6), 3),
+            rnd.uniform(-10**12, 10**12),
+        ])
+        assert to_tiins(amount) == to_tiins_exact(amount)
+
+        tiins = rnd.randint(-2**60, 2**60)
+        assert from_tiins(tiins) == from_tiins_exact(tiins)
+
+@pytest.mark.parametrize("amount, currency, minor", [
+    (150.5, "USD", 15050),
+    (99.99, "RUB", 9999),
+    (1500, "JPY", 1500),
+    (1500.5, "JPY", 1501),   # no minor units: rounds to whole yen
+])
+def test_to_minor_units_per_currency(amount, currency, minor):
+    assert to_minor_units(amount, currency) == minor
+    assert to_minor_units(amount, currency) == to_minor_units_exact(amount, currency)
+
+def test_jpy_conversions_match_decimal():
+    rnd = random.Random(11)
+    for _ in range(5000):
+        amount = rnd.choice([float(rnd.randint(-10**14, 10**14)), round(rnd.uniform(-10**6, 10**6), 1)])
+        assert to_minor_units(amount, "JPY") == to_minor_units_exact(amount, "JPY")
+
+        minor = rnd.randint(-2**60, 2**60)
+        assert from_minor_units(minor, "JPY") == from_minor_units_exact(minor, "JPY")
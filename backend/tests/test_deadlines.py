@@ -0,0 +1,41 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app import deadlines
+from app.deadlines import DeadlinePolicy, _parse_routes, current_deadline, enforce_deadlines, is_timeout_error
+
+def test_route_overrides_default():
+    policy = DeadlinePolicy(default=10, routes=_parse_routes("GET /api/bills/{bill_id}/events=0, POST /api/bills/=2500"))
+    assert policy.timeout("POST", "/api/bills/") == 2.5
+    assert policy.timeout("GET", "/api/bills/{bill_id}/events") == 0
+    assert policy.timeout("GET", "/api/bills/{bill_id}") == 10
+
+def test_expired_deadline_returns_503_before_querying(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    monkeypatch.setattr(deadlines, "deadline_policy", DeadlinePolicy(default=1e-9))
+
+    response = client.get("/users/1/bills")
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert response.headers["Retry-After"] == "1"
+
+def test_disabled_deadline(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(deadlines, "deadline_policy", DeadlinePolicy(default=1e-9, routes={"GET /api/users/{user_id}": 0}))
+    assert client.get("/users/1").status_code == 404
+
+def test_sqlite_statement_interrupted_at_deadline():
+    engine = create_engine("sqlite://")
+    enforce_deadlines(engine)
+    slow = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n")
+
+    token = current_deadline.set(time.monotonic() + 0.05)
+    try:
+        start = time.perf_counter()
+        with engine.connect() as conn, pytest.raises(OperationalError) as error:
+            conn.execute(slow)
+    finally:
+        current_deadline.reset(token)
+    assert time.perf_counter() - start < 1
+    assert is_timeout_error(error.value)
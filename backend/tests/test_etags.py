@@ -0,0 +1,67 @@
+import pytest
+from fastapi.testclient import TestClient
+
+def test_bill_etag_not_modified(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+
+    response = client.get(f"/bills/{bill_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.json()["version"] == 1
+
+    response = client.get(f"/bills/{bill_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    # Weak validators added by proxies still match
+    response = client.get(f"/bills/{bill_id}", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+
+def test_bill_etag_changes_on_mutation(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    etag = client.get(f"/bills/{bill_id}").headers["ETag"]
+
+    client.post(f"/bills/{bill_id}/items", json={"name": "Tea", "price": 5})
+
+    response = client.get(f"/bills/{bill_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["version"] == 2
+    assert len(response.json()["items"]) == 1
+
+def test_bill_etag_changes_on_participant_profile_update(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    etag = client.get(f"/bills/{bill_id}").headers["ETag"]
+
+    # Same profile again is not a change
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    assert client.get(f"/bills/{bill_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/users/", json={"telegram_id": 1, "username": "renamed"})
+    response = client.get(f"/bills/{bill_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["participants"][0]["username"] == "renamed"
+
+def test_user_bills_etag(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100}).json()["id"]
+
+    response = client.get("/users/1/bills")
+    etag = response.headers["ETag"]
+    assert client.get("/users/1/bills", headers={"If-None-Match": etag}).status_code == 304
+
+    # Another page is another representation
+    assert client.get("/users/1/bills?page=2", headers={"If-None-Match": etag}).status_code == 200
+
+    client.post(f"/bills/{bill_id}/participants", json={"guest_name": "Guest"})
+    response = client.get("/users/1/bills", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["participants_count"] == 1
+
+def test_etag_for_missing_bill(client: TestClient):
+    response = client.get("/bills/999", headers={"If-None-Match": '"bill-999-v1"'})
+    assert response.status_code == 404
@@ -0,0 +1,44 @@
+import asyncio
+import time
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from app import health
+from app.health import ReadinessThresholds, check_readiness, pool_check
+
+THRESHOLDS = ReadinessThresholds(db_timeout=0.5, max_pool_usage=0.9, max_threadpool_waiting=20, max_sse_subscribers=10)
+
+def test_liveness(client: TestClient):
+    assert client.get("/health/live").json() == {"status": "healthy"}
+    assert client.get("/health").status_code == 200
+
+def test_ready_reports_checks(client: TestClient):
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert set(body["checks"]) == {"pool", "threadpool", "sse", "database"}
+    assert body["checks"]["database"]["ok"]
+
+def test_not_ready_with_too_many_sse_subscribers(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(health, "readiness_thresholds", lambda: THRESHOLDS._replace(max_sse_subscribers=0))
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["sse"] == {"ok": False, "subscribers": 0, "draining": False}
+
+def test_slow_database_fails_the_ping():
+    engine = create_engine("sqlite://")
+    event.listen(engine, "before_cursor_execute", lambda *args: time.sleep(0.3))
+    ready, checks = asyncio.run(check_readiness(engine, THRESHOLDS._replace(db_timeout=0.05)))
+    assert not ready
+    assert not checks["database"]["ok"] and "no answer" in checks["database"]["error"]
+
+def test_saturated_pool_skips_the_ping(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=1, max_overflow=1)
+    with engine.connect(), engine.connect():
+        assert pool_check(engine, THRESHOLDS) == {"ok": False, "checked_out": 2, "capacity": 2, "usage": 1.0}
+        ready, checks = asyncio.run(check_readiness(engine, THRESHOLDS))
+    assert not ready
+    assert "not pinged" in checks["database"]["error"]
@@ -0,0 +1,83 @@
+from fastapi.testclient import TestClient
+from app.cache import MemoryCacheBackend
+from app.idempotency import IdempotencyStore, idempotency_key, idempotency_store
+from app.utils.auth import create_session_token
+
+def create_bill(client: TestClient) -> int:
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    return client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+
+def test_retry_with_same_key_is_replayed(client: TestClient):
+    bill_id = create_bill(client)
+    headers = {"Idempotency-Key": "add-pizza-1"}
+
+    first = client.post(f"/bills/{bill_id}/items", json={"name": "Pizza", "price": 50}, headers=headers)
+    retry = client.post(f"/bills/{bill_id}/items", json={"name": "Pizza", "price": 50}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert len(client.get(f"/bills/{bill_id}").json()["items"]) == 1
+
+    # Without a key every request runs
+    client.post(f"/bills/{bill_id}/items", json={"name": "Pizza", "price": 50})
+    assert len(client.get(f"/bills/{bill_id}").json()["items"]) == 2
+
+def test_key_reused_with_other_body(client: TestClient):
+    bill_id = create_bill(client)
+    headers = {"Idempotency-Key": "k"}
+    client.post(f"/bills/{bill_id}/items", json={"name": "Pizza", "price": 50}, headers=headers)
+
+    response = client.post(f"/bills/{bill_id}/items", json={"name": "Soup", "price": 20}, headers=headers)
+    assert response.status_code == 422
+
+def test_failed_request_is_not_stored(client: TestClient):
+    bill_id = create_bill(client)
+    headers = {"Idempotency-Key": "join-2"}
+
+    response = client.post(f"/bills/{bill_id}/join", json={"user_id": 2}, headers=headers)
+    assert response.status_code == 404
+
+    client.post("/users/", json={"telegram_id": 2, "username": "late"})
+    response = client.post(f"/bills/{bill_id}/join", json={"user_id": 2}, headers=headers)
+    assert response.status_code == 200
+
+def test_key_in_progress_is_rejected(client: TestClient):
+    bill_id = create_bill(client)
+    assert idempotency_store.begin(idempotency_key("POST", f"/api/bills/{bill_id}/split-equally", None, "busy"))
+
+    response = client.post(f"/bills/{bill_id}/split-equally", headers={"Idempotency-Key": "busy"})
+    assert response.status_code == 409
+
+def test_claim_is_shared_through_the_backend():
+    # Two workers on one backend (Redis in production) cannot both run a key
+    backend = MemoryCacheBackend()
+    first, second = IdempotencyStore(backend), IdempotencyStore(backend)
+    assert first.begin("k")
+    assert not second.begin("k")
+    first.finish("k", None)
+    assert second.begin("k")
+
+def test_keys_are_scoped_by_token_user(client: TestClient):
+    tokens = [
+        client.post("/users/", json={"telegram_id": telegram_id, "username": f"u{telegram_id}"}).json()["session_token"]
+        for telegram_id in (1, 2)
+    ]
+    bill_ids = [
+        client.post(
+            f"/bills/?access_token={token}", json={"owner_id": user_id, "total_sum": 100}, headers={"Idempotency-Key": "new-bill"}
+        ).json()["id"]
+        for user_id, token in zip((1, 2), tokens)
+    ]
+    assert bill_ids[0] != bill_ids[1]
+
+def test_replay_requires_a_valid_token(client: TestClient):
+    token = client.post("/users/", json={"telegram_id": 1, "username": "owner"}).json()["session_token"]
+    headers = {"Idempotency-Key": "new-bill", "Authorization": f"Bearer {token}"}
+    assert client.post("/bills/", json={"owner_id": 1, "total_sum": 100}, headers=headers).status_code == 200
+
+    expired, _ = create_session_token(1, ttl=-1)
+    response = client.post("/bills/", json={"owner_id": 1, "total_sum": 100}, headers={**headers, "Authorization": f"Bearer {expired}"})
+    assert response.status_code == 401
+    assert "Idempotent-Replayed" not in response.headers
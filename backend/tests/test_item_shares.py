@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+
+def _setup_bill_with_participants(client: TestClient, count: int):
+    for i in range(1, count + 1):
+        client.post("/users/", json={"telegram_id": i, "username": f"user{i}"})
+    resp_bill = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "title": "Shares Test", "include_owner": True})
+    bill_id = resp_bill.json()["id"]
+    for i in range(2, count + 1):
+        client.post(f"/bills/{bill_id}/participants", json={"user_id": i})
+    participants = client.get(f"/bills/{bill_id}").json()["participants"]
+    return bill_id, [p["id"] for p in participants]
+
+def test_shared_item_split_without_drift(client: TestClient):
+    bill_id, p_ids = _setup_bill_with_participants(client, 3)
+
+    # 100.00 shared by three people: 3334 + 3333 + 3333 tiins
+    response = client.post(f"/bills/{bill_id}/items", json={
+        "name": "Pizza",
+        "price": 100,
+        "count": 1,
+        "shares": [{"participant_id": p_id} for p_id in p_ids]
+    })
+    assert response.status_code == 200
+    shares = response.json()["shares"]
+    assert [s["participant_id"] for s in shares] == p_ids
+    assert [s["amount"] for s in shares] == [33.34, 33.33, 33.33]
+
+def test_weighted_shares_in_bill_details(client: TestClient):
+    bill_id, p_ids = _setup_bill_with_participants(client, 3)
+
+    resp_item = client.post(f"/bills/{bill_id}/items", json={"name": "Wine", "price": 10, "count": 1})
+    item_id = resp_item.json()["id"]
+    assert resp_item.json()["shares"] == []
+
+    response = client.put(f"/bills/{bill_id}/items/{item_id}/shares", json={"shares": [
+        {"participant_id": p_ids[0], "weight": 1},
+        {"participant_id": p_ids[1], "weight": 1},
+        {"participant_id": p_ids[2], "weight": 1},
+    ]})
+    assert response.status_code == 200
+
+    # Re-sharing replaces the previous shares: 2/3 and 1/3 of 10.00
+    response = client.put(f"/bills/{bill_id}/items/{item_id}/shares", json={"shares": [
+        {"participant_id": p_ids[0], "weight": 2},
+        {"participant_id": p_ids[1], "weight": 1},
+    ]})
+    assert response.status_code == 200
+
+    details = client.get(f"/bills/{bill_id}").json()
+    shares = details["items"][0]["shares"]
+    assert len(shares) == 2
+    assert shares[0] == {"participant_id": p_ids[0], "weight": 2, "amount": 6.67}
+    assert shares[1] == {"participant_id": p_ids[1], "weight": 1, "amount": 3.33}
+
+def test_shares_removed_with_participant(client: TestClient):
+    bill_id, p_ids = _setup_bill_with_participants(client, 2)
+
+    resp_item = client.post(f"/bills/{bill_id}/items", json={
+        "name": "Tea",
+        "price": 5,
+        "shares": [{"participant_id": p_id} for p_id in p_ids]
+    })
+    assert len(resp_item.json()["shares"]) == 2
+
+    client.request("DELETE", f"/bills/{bill_id}/participants/{p_ids[1]}", json={"user_id": 1})
+
+    shares = client.get(f"/bills/{bill_id}").json()["items"][0]["shares"]
+    assert shares == [{"participant_id": p_ids[0], "weight": 1, "amount": 5.0}]
+
+@pytest.mark.parametrize("shares, status", [
+    ([{"participant_id": 999}], 404),
+    ([{"participant_id": 1, "weight": 0}], 400),
+    ([{"participant_id": 1}, {"participant_id": 1}], 400),
+])
+def test_invalid_shares(client: TestClient, shares, status):
+    bill_id, p_ids = _setup_bill_with_participants(client, 1)
+    resp_item = client.post(f"/bills/{bill_id}/items", json={"name": "Water", "price": 1})
+    item_id = resp_item.json()["id"]
+
+    response = client.put(f"/bills/{bill_id}/items/{item_id}/shares", json={"shares": shares})
+    assert response.status_code == status
+
+def test_item_not_added_when_shares_fail(client: TestClient, session, monkeypatch: pytest.MonkeyPatch):
+    from app.repositories.bill_repo import BillRepository
+    bill_id, p_ids = _setup_bill_with_participants(client, 2)
+    version = client.get(f"/bills/{bill_id}").json()["version"]
+
+    def fail(self, shares):
+        raise RuntimeError("insert failed")
+    monkeypatch.setattr(BillRepository, "_insert_shares", fail)
+    with pytest.raises(RuntimeError):
+        client.post(f"/bills/{bill_id}/items", json={"name": "Pizza", "price": 100, "shares": [{"participant_id": p_ids[0]}]})
+    session.rollback()
+
+    bill = client.get(f"/bills/{bill_id}").json()
+    assert bill["items"] == []
+    assert bill["version"] == version
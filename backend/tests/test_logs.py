@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+import queue
+import sys
+from app import logs
+from app.logs import DroppingQueueHandler, JsonFormatter, LogSampler, _parse_rules, configure_logging
+from app.tracing import RequestIdFilter, current_request_id
+
+def _record(name: str, level: int = logging.INFO, msg: str = "message", args=None) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_json_formatter_includes_request_id_and_exception():
+    record = _record("app.notifier", msg="Broadcasted '%s'", args=("UPDATE",))
+    token = current_request_id.set("abc")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        current_request_id.reset(token)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record.exc_info = sys.exc_info()
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Broadcasted 'UPDATE'"
+    assert entry["logger"] == "app.notifier" and entry["level"] == "INFO"
+    assert entry["request_id"] == "abc"
+    assert "ValueError: boom" in entry["exception"]
+
+def test_rate_limit_applies_to_logger_and_children_below_warning():
+    sampler = LogSampler(rate_limits={"app.notifier": 3})
+    kept = [sampler.filter(_record("app.notifier.sse")) for _ in range(10)]
+    assert kept.count(True) == 3
+    assert sampler.dropped == 7
+    assert sampler.filter(_record("app.notifier", logging.WARNING))
+    assert all(sampler.filter(_record("app.cache")) for _ in range(10))
+
+def test_sample_rate_keeps_a_fraction():
+    assert not any(LogSampler(sample_rates={"sqlalchemy": 0.0}).filter(_record("sqlalchemy.engine.Engine")) for _ in range(20))
+    assert all(LogSampler(sample_rates={"sqlalchemy": 1.0}).filter(_record("sqlalchemy.engine.Engine")) for _ in range(20))
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(_record("app"))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+def test_rules_parsed_from_environment_format():
+    assert _parse_rules("app.notifier=20, sqlalchemy.engine=0.5,,bad") == {"app.notifier": 20.0, "sqlalchemy.engine": 0.5}
+
+def test_json_pipeline_keeps_exception_apart(monkeypatch):
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setattr(logs, "pipeline", None)
+    stream = io.StringIO()
+    pipeline = configure_logging(stream)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.test").exception("Failed for bill %s", 7)
+    finally:
+        pipeline.stop()
+
+    entry = json.loads(stream.getvalue().splitlines()[-1])
+    assert entry["message"] == "Failed for bill 7"
+    assert "ValueError: boom" in entry["exception"]
@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+from app.metrics import Histogram, _render_histogram
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found")
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram((1, 5))
+    for value in (0, 1, 3, 7):
+        histogram.observe(value)
+
+    lines = []
+    _render_histogram(lines, "h", 'route="/x"', histogram)
+    assert lines[:3] == ['h_bucket{route="/x",le="1"} 2', 'h_bucket{route="/x",le="5"} 3', 'h_bucket{route="/x",le="+Inf"} 4']
+    assert lines[-1] == 'h_count{route="/x"} 4'
+
+def test_requests_recorded_by_route_template(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    client.get(f"/bills/{bill_id}")
+    client.get(f"/v2/bills/{bill_id}")
+    client.get("/bills/999")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    assert _sample(text, 'http_requests_total{method="GET",route="/api/bills/{bill_id}",status="200"}') == 1
+    assert _sample(text, 'http_requests_total{method="GET",route="/api/bills/{bill_id}",status="404"}') == 1
+    assert _sample(text, 'http_requests_total{method="GET",route="/api/v2/bills/{bill_id}",status="200"}') == 1
+    assert f"/bills/{bill_id}" not in text
+
+def test_db_queries_counted_per_request(client: TestClient):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True})
+
+    text = client.get("/metrics").text
+    labels = 'method="POST",route="/api/bills/"'
+    assert _sample(text, f"http_request_db_queries_count{{{labels}}}") == 1
+    assert _sample(text, f"http_request_db_queries_sum{{{labels}}}") > 0
+    assert _sample(text, "db_queries_total ") >= _sample(text, f"http_request_db_queries_sum{{{labels}}}")
+
+def test_app_gauges_exported(client: TestClient):
+    text = client.get("/metrics").text
+    assert _sample(text, "sse_subscribers ") == 0
+    assert "bill_cache_hits_total" in text
+    assert "rate_limit_rejections_total 0" in text
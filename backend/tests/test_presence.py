@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.notifier import Notifier, notifier
+
+def test_presence_events_are_debounced():
+    tracked = Notifier(presence_debounce=0.05)
+    messages = []
+    tracked.add_listener(lambda bill_id, message: messages.append((bill_id, message)))
+
+    async def run():
+        first = tracked.open(1, user_id=10)
+        tracked.open(1, user_id=20)
+        tracked.open(1, user_id=20)
+        tracked.open(1)
+        await asyncio.sleep(0.1)
+        assert messages == [(1, "PRESENCE:10,20")]
+        assert tracked.viewers(1) == {"user_ids": [10, 20], "anonymous": 1}
+
+        # Leaving and coming back within the debounce window changes nothing
+        tracked.close(first)
+        tracked.open(1, user_id=10)
+        await asyncio.sleep(0.1)
+        assert len(messages) == 1
+
+        # A second stream of the same user closing is not a change either
+        tracked.close(next(s for s in tracked.connections[1] if s.user_id == 20))
+        await asyncio.sleep(0.1)
+        assert len(messages) == 1
+
+        for subscription in list(tracked.connections[1]):
+            tracked.close(subscription)
+        await asyncio.sleep(0.1)
+        assert messages[-1] == (1, "PRESENCE:")
+        assert tracked.viewers(1) == {"user_ids": [], "anonymous": 0}
+        assert 1 not in tracked.presence
+
+    asyncio.run(run())
+
+def test_presence_endpoint(client: TestClient, monkeypatch):
+    monkeypatch.setattr(notifier, "presence_debounce", 0)
+
+    async def run():
+        subscriptions = [notifier.open(5, user_id=2), notifier.open(5, user_id=1), notifier.open(5)]
+        try:
+            assert client.get("/bills/5/presence").json() == {"bill_id": 5, "user_ids": [1, 2], "anonymous": 1}
+            assert client.get("/v2/bills/5/presence").json()["user_ids"] == [1, 2]
+        finally:
+            for subscription in subscriptions:
+                notifier.close(subscription)
+            # Let the presence broadcasts run before the loop goes away
+            await asyncio.sleep(0.01)
+        assert client.get("/bills/5/presence").json() == {"bill_id": 5, "user_ids": [], "anonymous": 0}
+
+    asyncio.run(run())
+
+def test_presence_is_tracked_on_the_event_loop_only():
+    with pytest.raises(RuntimeError):
+        Notifier().open(1, user_id=10)
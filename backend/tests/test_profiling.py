@@ -0,0 +1,30 @@
+import pytest
+from pathlib import Path
+from fastapi.testclient import TestClient
+from app.main import app
+from app.profiling import ProfilingMiddleware
+
+@pytest.fixture(name="profiled")
+def profiled_fixture(client: TestClient, tmp_path: Path) -> TestClient:
+    """Client for the app wrapped in the profiler, sharing the test database of `client`"""
+    return TestClient(ProfilingMiddleware(app, directory=str(tmp_path), token="secret"), base_url="http://testserver/api")
+
+def test_profiled_request_reports_timings(profiled: TestClient, tmp_path: Path):
+    profiled.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = profiled.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+
+    response = profiled.post(f"/bills/{bill_id}/split-equally", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("total;dur=")
+    assert 'queries"' in timing and 'desc="0 queries"' not in timing
+    assert "serialize;dur=" in timing
+    assert (tmp_path / response.headers["X-Profile-File"]).exists()
+
+def test_requests_without_matching_header_are_not_profiled(profiled: TestClient, tmp_path: Path):
+    assert "Server-Timing" not in profiled.get("/users/1").headers
+    assert "Server-Timing" not in profiled.get("/users/1", headers={"X-Profile": "guess"}).headers
+    assert list(tmp_path.iterdir()) == []
+
+def test_profiler_is_not_installed_by_default():
+    assert not any(m.cls is ProfilingMiddleware for m in app.user_middleware)
@@ -0,0 +1,131 @@
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from app.cache import bill_detail_cache, user_profile_cache
+from app.rate_limit import rate_limiter
+from app.routers import bills, users
+
+# Maximum statements a request may issue with cold caches. Every route must
+# also issue the same number for a small and a large bill, so a query per
+# item or participant fails here even while it fits the budget.
+BUDGETS = {
+    "create_user": 2,
+    "update_user": 2,
+    "get_users": 1,
+    "get_user": 1,
+    "get_user_bills": 3,
+    "create_bill": 6,
+    "get_bill": 6,
+    "add_item": 4,
+    "set_item_shares": 8,
+    "delete_item": 5,
+    "add_participant": 7,
+    "split_equally": 6,
+    "split_remainder": 6,
+    "assign_amount": 6,
+    "update_payment": 7,
+    "remove_participant": 13,
+    "join_bill": 8,
+    "close_bill": 9,
+}
+
+# API v1 routes without a budget. The v2 routers call the same
+# services as v1 and have no budgets of their own yet.
+UNBUDGETED = {
+    "bill_events",        # stream: open until the client leaves
+    "get_bill_presence",  # answered from the notifier
+    "send_reaction",      # broadcast only
+}
+
+SMALL, LARGE = 2, 12
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch: pytest.MonkeyPatch):
+    # Seeding issues more mutations per second than a client may
+    monkeypatch.setattr(rate_limiter, "enabled", False)
+
+def _seed(client: TestClient, size: int) -> dict:
+    """Bill with `size` user participants besides the owner and `size` assigned items"""
+    base = size * 1000
+    user = lambda telegram_id: client.post("/users/", json={"telegram_id": telegram_id, "username": f"u{telegram_id}"}).json()["id"]
+    owner_id = user(base)
+    user_ids = [user(base + i + 1) for i in range(size)]
+    outsider_id = user(base + 999)
+    bill_id = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 1000 * size, "include_owner": True}).json()["id"]
+
+    for user_id in user_ids:
+        participants = client.post(f"/bills/{bill_id}/participants", json={"user_id": user_id}).json()
+    item_ids = [
+        client.post(f"/bills/{bill_id}/items", json={"name": f"Dish {i}", "price": 100, "assigned_to_user_id": user_id}).json()["id"]
+        for i, user_id in enumerate(user_ids)
+    ]
+    return {
+        "size": size,
+        "owner_id": owner_id,
+        "bill_id": bill_id,
+        "user_ids": user_ids,
+        "outsider_id": outsider_id,
+        "participant_ids": [p["id"] for p in participants],
+        "item_ids": item_ids,
+    }
+
+def _split_equally(c: TestClient, ids: dict):
+    return c.post(f"/bills/{ids['bill_id']}/split-equally")
+
+# name -> (endpoint of the route, setup or None, measured request)
+CASES = {
+    "create_user": ("create_or_update_user", None, lambda c, ids: c.post("/users/", json={"telegram_id": ids["size"] * 1000 + 500, "username": "new"})),
+    "update_user": ("create_or_update_user", None, lambda c, ids: c.post("/users/", json={"telegram_id": ids["size"] * 1000, "username": "renamed"})),
+    "get_users": ("get_users", None, lambda c, ids: c.get("/users", params={"ids": ",".join(map(str, ids["user_ids"]))})),
+    "get_user": ("get_user", None, lambda c, ids: c.get(f"/users/{ids['owner_id']}")),
+    "get_user_bills": ("get_user_bills", None, lambda c, ids: c.get(f"/users/{ids['owner_id']}/bills")),
+    "create_bill": ("create_bill", None, lambda c, ids: c.post("/bills/", json={"owner_id": ids["owner_id"], "total_sum": 100, "include_owner": True})),
+    "get_bill": ("get_bill", None, lambda c, ids: c.get(f"/bills/{ids['bill_id']}")),
+    "add_item": ("add_bill_item", None, lambda c, ids: c.post(f"/bills/{ids['bill_id']}/items", json={"name": "Tea", "price": 10})),
+    "set_item_shares": ("set_bill_item_shares", None, lambda c, ids: c.put(
+        f"/bills/{ids['bill_id']}/items/{ids['item_ids'][0]}/shares",
+        json={"shares": [{"participant_id": p_id} for p_id in ids["participant_ids"]]}
+    )),
+    "delete_item": ("delete_bill_item", None, lambda c, ids: c.delete(f"/bills/{ids['bill_id']}/items/{ids['item_ids'][0]}")),
+    "add_participant": ("add_bill_participant", None, lambda c, ids: c.post(f"/bills/{ids['bill_id']}/participants", json={"guest_name": "Guest"})),
+    "split_equally": ("split_bill_equally", None, _split_equally),
+    "split_remainder": ("split_bill_remainder", None, lambda c, ids: c.post(f"/bills/{ids['bill_id']}/split-remainder", json={"participant_ids": ids["participant_ids"]})),
+    "assign_amount": ("assign_participant_amount", None, lambda c, ids: c.post(
+        f"/bills/{ids['bill_id']}/assign-amount", json={"participant_id": ids["participant_ids"][0], "allocated_amount": 10}
+    )),
+    "update_payment": ("update_payment_status", _split_equally, lambda c, ids: c.post(
+        f"/bills/{ids['bill_id']}/participants/{ids['participant_ids'][-1]}/payment",
+        json={"is_paid": True, "user_id": ids["owner_id"]}
+    )),
+    "remove_participant": ("remove_bill_participant", None, lambda c, ids: c.request(
+        "DELETE", f"/bills/{ids['bill_id']}/participants/{ids['participant_ids'][-1]}", json={"user_id": ids["owner_id"]}
+    )),
+    "join_bill": ("join_bill", None, lambda c, ids: c.post(f"/bills/{ids['bill_id']}/join", json={"user_id": ids["outsider_id"]})),
+    "close_bill": ("confirm_and_close_bill", _split_equally, lambda c, ids: c.post(f"/bills/{ids['bill_id']}/close", json={"user_id": ids["owner_id"]})),
+}
+
+def _count_queries(client: TestClient, queries, name: str, size: int) -> int:
+    _, setup, request = CASES[name]
+    ids = _seed(client, size)
+    if setup is not None:
+        setup(client, ids)
+    bill_detail_cache.clear()
+    user_profile_cache.clear()
+
+    with queries:
+        response = request(client, ids)
+    assert response.status_code < 400, response.text
+    return queries.count
+
+def test_every_route_has_a_budget():
+    routes = {route.name for route in users.router.routes + bills.router.routes if isinstance(route, APIRoute)}
+    assert set(CASES) == set(BUDGETS)
+    assert {endpoint for endpoint, _, _ in CASES.values()} == routes - UNBUDGETED
+
+@pytest.mark.parametrize("name", list(BUDGETS))
+def test_query_budget(client: TestClient, queries, name: str):
+    small = _count_queries(client, queries, name, SMALL)
+    large = _count_queries(client, queries, name, LARGE)
+
+    assert large == small, f"{name}: {small} statements for {SMALL} participants, {large} for {LARGE}:\n" + "\n".join(queries.statements)
+    assert large <= BUDGETS[name], f"{name}: {large} statements, budget {BUDGETS[name]}:\n" + "\n".join(queries.statements)
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.rate_limit import MemoryRateLimitBackend, Policy, rate_limiter
+
+def test_token_bucket_refills(monkeypatch: pytest.MonkeyPatch):
+    now = [100.0]
+    monkeypatch.setattr("app.rate_limit.time.monotonic", lambda: now[0])
+    backend = MemoryRateLimitBackend()
+    policy = Policy(rate=2, burst=3)
+
+    assert [backend.acquire("k", policy) for _ in range(3)] == [0, 0, 0]
+    assert backend.acquire("k", policy) == pytest.approx(0.5)
+    assert backend.acquire("other", policy) == 0
+
+    now[0] += 0.5
+    assert backend.acquire("k", policy) == 0
+    assert backend.acquire("k", policy) > 0
+
+def test_rejected_buckets_are_not_spent(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("app.rate_limit.time.monotonic", lambda: 100.0)
+    backend = MemoryRateLimitBackend()
+    user, bill = Policy(rate=1, burst=2), Policy(rate=1, burst=1)
+
+    assert backend.acquire_all([("user", user), ("bill", bill)]) == 0
+    assert backend.acquire_all([("user", user), ("bill", bill)]) > 0
+    # The user's token survived the rejection by the bill bucket
+    assert backend.acquire("user", user) == 0
+    assert backend.acquire("user", user) > 0
+
+def test_mutations_limited_per_bill(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(rate_limiter.policies, "bill", Policy(rate=0.01, burst=2))
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+
+    assert client.post(f"/bills/{bill_id}/split-equally").status_code == 200
+    assert client.post(f"/bills/{bill_id}/split-equally").status_code == 200
+    response = client.post(f"/bills/{bill_id}/split-equally")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Reads and other bills are not affected
+    assert client.get(f"/bills/{bill_id}").status_code == 200
+    other_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    assert client.post(f"/bills/{other_id}/split-equally").status_code == 200
+
+def test_non_member_does_not_spend_bill_bucket(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(rate_limiter.policies, "bill", Policy(rate=0.01, burst=2))
+    owner = client.post("/users/", json={"telegram_id": 1, "username": "owner"}).json()
+    outsider = client.post("/users/", json={"telegram_id": 2, "username": "outsider"}).json()
+    as_owner = {"Authorization": f"Bearer {owner['session_token']}"}
+    bill_id = client.post("/bills/", json={"owner_id": owner["id"], "total_sum": 100, "include_owner": True}, headers=as_owner).json()["id"]
+
+    for _ in range(3):
+        response = client.post(f"/bills/{bill_id}/split-equally", headers={"Authorization": f"Bearer {outsider['session_token']}"})
+        assert response.status_code == 403
+    assert client.post(f"/bills/{bill_id}/split-equally", headers=as_owner).status_code == 200
+    assert client.post(f"/bills/{bill_id}/split-equally", headers=as_owner).status_code == 200
+
+def test_reactions_limited_per_user(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(rate_limiter.policies, "reaction", Policy(rate=0.01, burst=1))
+    assert client.post("/bills/1/reactions", json={"user_id": 1, "emoji": "🔥"}).status_code == 200
+    assert client.post("/bills/1/reactions", json={"user_id": 1, "emoji": "🔥"}).status_code == 429
@@ -0,0 +1,80 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.utils.auth import create_session_token, verify_session_token
+
+def login(client: TestClient, telegram_id: int) -> tuple[int, dict]:
+    data = client.post("/users/", json={"telegram_id": telegram_id, "username": f"user{telegram_id}"}).json()
+    return data["id"], {"Authorization": f"Bearer {data['session_token']}"}
+
+def test_token_round_trip():
+    token, expires_at = create_session_token(7)
+    assert expires_at > time.time()
+    assert verify_session_token(token) == 7
+
+    user_id, expires, signature = token.split(".")
+    assert verify_session_token(f"8.{expires}.{signature}") is None
+    assert verify_session_token("garbage") is None
+
+    expired, _ = create_session_token(7, ttl=-1)
+    assert verify_session_token(expired) is None
+
+def test_login_issues_token_used_by_bill_routes(client: TestClient):
+    owner_id, owner_auth = login(client, 1)
+    other_id, other_auth = login(client, 2)
+
+    response = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 100, "include_owner": True}, headers=owner_auth)
+    assert response.status_code == 200
+    bill_id = response.json()["id"]
+
+    # Acting as somebody else than the token holder
+    response = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 100}, headers=other_auth)
+    assert response.status_code == 403
+    response = client.post(f"/bills/{bill_id}/close", json={"user_id": owner_id}, headers=other_auth)
+    assert response.status_code == 403
+    assert client.get(f"/users/{owner_id}/bills", headers=other_auth).status_code == 403
+
+    assert client.post(f"/bills/{bill_id}/join", json={"user_id": other_id}, headers=other_auth).status_code == 200
+    assert client.post(f"/bills/{bill_id}/close", json={"user_id": owner_id}, headers=owner_auth).status_code == 200
+
+def test_invalid_token_rejected(client: TestClient):
+    owner_id, _ = login(client, 1)
+    response = client.get(f"/users/{owner_id}/bills", headers={"Authorization": "Bearer 1.1.bad"})
+    assert response.status_code == 401
+    response = client.get("/bills/1", params={"access_token": "1.1.bad"})
+    assert response.status_code == 401
+
+def test_token_required_in_production(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    owner_id, owner_auth = login(client, 1)
+    monkeypatch.setenv("ENV", "production")
+
+    response = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 100})
+    assert response.status_code == 401
+
+    response = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 100}, headers=owner_auth)
+    assert response.status_code == 200
+    bill_id = response.json()["id"]
+
+    response = client.get(f"/v2/bills/{bill_id}", params={"access_token": owner_auth["Authorization"][7:]})
+    assert response.status_code == 200
+
+def test_malformed_token_rejected(client: TestClient):
+    assert verify_session_token("1.9999999999.é") is None
+    response = client.get("/bills/1/presence", params={"access_token": "1.9999999999.é"})
+    assert response.status_code == 401
+
+def test_bill_routes_require_membership(client: TestClient):
+    owner_id, owner_auth = login(client, 1)
+    other_id, other_auth = login(client, 2)
+    bill_id = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 100, "include_owner": True}, headers=owner_auth).json()["id"]
+
+    assert client.get(f"/bills/{bill_id}", headers=other_auth).status_code == 403
+    assert client.get(f"/v2/bills/{bill_id}/presence", headers=other_auth).status_code == 403
+    response = client.post(f"/bills/{bill_id}/items", json={"name": "Tea", "price": 10, "count": 1}, headers=other_auth)
+    assert response.status_code == 403
+    assert client.post(f"/bills/{bill_id}/split-equally", headers=other_auth).status_code == 403
+
+    # Joining is open to anyone with the link, and makes the bill readable
+    assert client.post(f"/bills/{bill_id}/join", json={"user_id": other_id}, headers=other_auth).status_code == 200
+    assert client.get(f"/bills/{bill_id}", headers=other_auth).status_code == 200
+    assert client.get("/bills/999", headers=other_auth).status_code == 404
@@ -0,0 +1,129 @@
+import threading
+import time
+import pytest
+from sqlmodel import Session
+from fastapi.testclient import TestClient
+from app import deadlines
+from app.cache import bill_detail_cache
+from app.repositories.bill_repo import BillRepository
+from app.repositories.user_repo import UserRepository
+from app.services.bill_core_service import BillCoreService, bill_detail_flight
+from app.utils.singleflight import SingleFlight, WaitTimeout
+
+def test_single_flight_shares_result_and_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "payload"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow_load)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow_load))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in [leader, *followers]:
+        t.join()
+
+    assert calls == [1]
+    assert results == ["payload"] * 5
+    assert flight.in_flight() == 0
+
+    def failing_load():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", failing_load)
+    assert flight.in_flight() == 0
+
+def test_follower_wait_is_bounded():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        started.set()
+        release.wait()
+        return "payload"
+
+    leader = threading.Thread(target=flight.do, args=("k", slow_load))
+    leader.start()
+    started.wait()
+    try:
+        with pytest.raises(WaitTimeout):
+            flight.do("k", slow_load, timeout=0.05)
+    finally:
+        release.set()
+        leader.join()
+    assert flight.in_flight() == 0
+
+def test_bill_read_waiting_past_deadline_fails(client: TestClient, session: Session):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    service = BillCoreService(BillRepository(session), UserRepository(session))
+    version = service.get_bill_version(bill_id)
+    bill_detail_cache.clear()
+
+    # A load of the same version stuck in another request
+    started = threading.Event()
+    release = threading.Event()
+    leader = threading.Thread(target=bill_detail_flight.do, args=((bill_id, version, "v1"), lambda: started.set() or release.wait()))
+    leader.start()
+    started.wait()
+    token = deadlines.current_deadline.set(time.monotonic() + 0.05)
+    try:
+        with pytest.raises(deadlines.DeadlineExceeded):
+            service.get_bill_details_json(bill_id, version)
+    finally:
+        deadlines.current_deadline.reset(token)
+        release.set()
+        leader.join()
+
+def test_concurrent_bill_reads_share_one_query_set(client: TestClient, session: Session, queries, monkeypatch):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    client.post(f"/bills/{bill_id}/items", json={"name": "Tea", "price": 5})
+
+    service = BillCoreService(BillRepository(session), UserRepository(session))
+    version = service.get_bill_version(bill_id)
+
+    # A single uncached load sets the baseline
+    bill_detail_cache.clear()
+    with queries:
+        expected = service.get_bill_details_json(bill_id, version)
+    baseline = queries.count
+    assert baseline > 0
+
+    # Slow the load down so every reader arrives while it is in flight
+    original_get_items = service.bill_repo.get_items_by_bill_id
+    def slow_get_items(bill_id):
+        time.sleep(0.2)
+        return original_get_items(bill_id)
+    monkeypatch.setattr(service.bill_repo, "get_items_by_bill_id", slow_get_items)
+
+    bill_detail_cache.clear()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append(service.get_bill_details_json(bill_id, version))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    with queries:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert results == [expected] * 8
+    assert queries.count == baseline
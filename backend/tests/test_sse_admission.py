@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.notifier import RECONNECT, Notifier, notifier
+
+def test_admission_limits():
+    limited = Notifier(max_connections=3, max_per_bill=2, max_per_user=1)
+
+    async def run():
+        first = limited.open(1, user_id=10)
+        assert limited.admission_error(1, 10) == "user"
+        assert limited.admission_error(1, 11) is None
+        limited.open(1, user_id=11)
+        assert limited.admission_error(1, None) == "bill"
+        limited.open(2)
+        assert limited.admission_error(3, None) == "capacity"
+        assert limited.rejections == 3
+
+        limited.close(first)
+        limited.close(first)
+        assert limited.total == 2 and 10 not in limited.user_connections
+        assert limited.admission_error(1, 10) is None
+
+    asyncio.run(run())
+
+def test_rejected_stream_gets_retry_after(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(notifier, "max_per_bill", 0)
+    response = client.get("/bills/1/events")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+
+    monkeypatch.setattr(notifier, "draining", True)
+    assert client.get("/bills/1/events").status_code == 503
+
+def test_drain_ends_streams_with_jittered_retry():
+    draining = Notifier()
+
+    async def run():
+        async def consume(bill_id: int):
+            subscription = draining.open(bill_id)
+            try:
+                return [event async for event in draining.listen(subscription)], subscription.retry_ms
+            finally:
+                draining.close(subscription)
+
+        consumers = [asyncio.ensure_future(consume(bill_id)) for bill_id in (1, 1, 2)]
+        await asyncio.sleep(0)
+        await draining.drain(duration=0.2, retry_ms=100, jitter_ms=50)
+        assert draining.admission_error(1, None) == "draining"
+        return await asyncio.gather(*consumers)
+
+    results = asyncio.run(run())
+    for events, retry_ms in results:
+        assert events == [(RECONNECT, None)]
+        assert 100 <= retry_ms <= 150
+    assert draining.total == 0
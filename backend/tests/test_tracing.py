@@ -0,0 +1,88 @@
+import asyncio
+import json
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from app.notifier import Notifier
+from app.tracing import InMemoryExporter, JsonLinesExporter, RequestIdFilter, Span, current_request_id, tracer
+
+@pytest.fixture(name="exporter")
+def exporter_fixture(monkeypatch: pytest.MonkeyPatch) -> InMemoryExporter:
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    return exporter
+
+def test_request_spans_cover_every_layer(client: TestClient, exporter: InMemoryExporter):
+    client.post("/users/", json={"telegram_id": 1, "username": "owner"})
+    bill_id = client.post("/bills/", json={"owner_id": 1, "total_sum": 100, "include_owner": True}).json()["id"]
+    exporter.clear()
+
+    response = client.post(f"/bills/{bill_id}/split-equally", headers={"X-Request-ID": "split-1"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "split-1"
+
+    spans = {span.span_id: span for span in exporter.spans}
+    root = next(span for span in exporter.spans if span.parent_id is None)
+    assert root.name == "POST /api/bills/{bill_id}/split-equally"
+    assert root.attributes["http.status_code"] == 200
+    assert root.attributes["request.id"] == "split-1"
+    assert {span.trace_id for span in exporter.spans} == {root.trace_id}
+
+    service = next(span for span in exporter.spans if span.name == "BillSplitService.split_bill_equally")
+    assert service.layer == "service" and service.parent_id == root.span_id
+    repository = [span for span in exporter.spans if span.layer == "repository" and span.parent_id == service.span_id]
+    assert repository
+    db = [span for span in exporter.spans if span.layer == "db"]
+    assert db and all(spans[span.parent_id].layer in ("service", "repository", "http") for span in db)
+    assert any(span.name == "UPDATE" for span in db)
+    assert all(span.end_ns >= span.start_ns for span in exporter.spans)
+
+def test_request_id_generated_without_tracing(client: TestClient):
+    generated = client.get("/users/1").headers["X-Request-ID"]
+    assert len(generated) == 32
+    # Unsafe ids are replaced rather than echoed
+    assert client.get("/users/1", headers={"X-Request-ID": "bad id\r"}).headers["X-Request-ID"] != "bad id\r"
+
+def test_log_records_carry_request_id():
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "message", None, None)
+    RequestIdFilter().filter(record)
+    assert record.request_id == "-"
+
+    token = current_request_id.set("abc")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        current_request_id.reset(token)
+    assert record.request_id == "abc"
+
+def test_broadcast_carries_request_id_of_the_change():
+    notifier = Notifier()
+
+    async def receive_one():
+        events = notifier.subscribe(1)
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        token = current_request_id.set("change-1")
+        try:
+            notifier.broadcast(1, "UPDATE")
+        finally:
+            current_request_id.reset(token)
+        event = await pending
+        await events.aclose()
+        return event
+
+    assert asyncio.run(receive_one()) == ("UPDATE", "change-1")
+
+def test_json_lines_exporter_writes_in_background(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(path=str(path))
+    assert not path.exists()
+
+    spans = [Span("t" * 32, None, "GET /api/bills/{bill_id}", "http") for _ in range(3)]
+    for span in spans:
+        span.end_ns = span.start_ns
+    exporter.export(spans)
+    exporter.close()
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["spanId"] for line in lines] == [span.span_id for span in spans]
@@ -0,0 +1,53 @@
+import time
+from fastapi.testclient import TestClient
+from app.cache import UserProfileCache, user_profile_cache
+from app.schemas.user_schemas import UserResponse
+
+def profile(user_id: int, username: str = "u") -> UserResponse:
+    return UserResponse(id=user_id, telegram_id=1000 + user_id, username=username, name=None, surname=None, avatar_url=None)
+
+def test_profile_cache_bounds_and_ttl():
+    cache = UserProfileCache(max_entries=2, ttl=60)
+    cache.set(profile(1))
+    cache.set(profile(2))
+    cache.get(1)
+    cache.set(profile(3))  # evicts 2, the least recently used
+    assert cache.get(2) is None
+    assert cache.get(1).id == 1
+    assert cache.get(3).id == 3
+
+    expiring = UserProfileCache(ttl=0.01)
+    expiring.set(profile(1))
+    time.sleep(0.02)
+    assert expiring.get(1) is None
+
+def test_bill_details_do_not_query_users_when_cached(client: TestClient, queries):
+    owner_id = client.post("/users/", json={"telegram_id": 1, "username": "owner"}).json()["id"]
+    guest_id = client.post("/users/", json={"telegram_id": 2, "username": "guest"}).json()["id"]
+    bill_id = client.post("/bills/", json={"owner_id": owner_id, "total_sum": 100, "include_owner": True}).json()["id"]
+    client.post(f"/bills/{bill_id}/participants", json={"user_id": guest_id})
+
+    with queries:
+        participants = client.get(f"/bills/{bill_id}").json()["participants"]
+
+    assert sorted(p["username"] for p in participants) == ["guest", "owner"]
+    assert not any("FROM users" in s for s in queries.statements)
+
+def test_profile_update_refreshes_cache(client: TestClient):
+    user_id = client.post("/users/", json={"telegram_id": 1, "username": "before"}).json()["id"]
+    assert client.get(f"/users/{user_id}").json()["username"] == "before"
+
+    client.post("/users/", json={"telegram_id": 1, "username": "after"})
+    assert user_profile_cache.get(user_id).username == "after"
+    assert client.get(f"/users/{user_id}").json()["username"] == "after"
+
+def test_missing_profiles_loaded_in_one_query(client: TestClient, session, queries):
+    from app.repositories.user_repo import UserRepository
+    ids = [client.post("/users/", json={"telegram_id": i, "username": f"u{i}"}).json()["id"] for i in range(1, 6)]
+    user_profile_cache.clear()
+
+    with queries:
+        profiles = UserRepository(session).get_profiles(ids + [999])
+
+    assert sorted(profiles) == ids
+    assert queries.count == 1
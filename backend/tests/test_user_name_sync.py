@@ -75,3 +75,47 @@ def test_bill_participant_response_has_names(client: TestClient):
     owner_part = next(p for p in participants if p["user_id"] == owner_id)
     assert owner_part["name"] == "Owner"
     assert owner_part["surname"] == "User"
+
+def test_unchanged_profile_is_not_written(client: TestClient, queries):
+    user = {"telegram_id": 555, "username": "same", "name": "Sam", "avatar_url": "http://example.com/a.jpg"}
+    user_id = client.post("/users/", json=user).json()["id"]
+    bill_id = client.post("/bills/", json={"owner_id": user_id, "total_sum": 10, "include_owner": True}).json()["id"]
+    version = client.get(f"/bills/{bill_id}").json()["version"]
+
+    with queries:
+        response = client.post("/users/", json=user)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == user_id
+    assert not any(s.lstrip().upper().startswith("UPDATE") for s in queries.statements)
+    assert client.get(f"/bills/{bill_id}").json()["version"] == version
+
+    response = client.post("/users/", json={**user, "username": "renamed"})
+    assert response.json()["username"] == "renamed"
+    assert client.get(f"/users/{user_id}").json()["username"] == "renamed"
+    assert client.get(f"/bills/{bill_id}").json()["version"] == version + 1
+
+def test_batch_user_lookup(client: TestClient):
+    ids = [client.post("/users/", json={"telegram_id": i, "username": f"u{i}"}).json()["id"] for i in range(1, 4)]
+
+    response = client.get("/users", params={"ids": f"{ids[2]},{ids[0]},999,{ids[0]}"})
+    assert response.status_code == 200
+    assert [u["username"] for u in response.json()] == ["u3", "u1"]
+
+    assert client.get("/users", params={"ids": "1,abc"}).status_code == 400
+    assert client.get("/users", params={"ids": ""}).status_code == 400
+    assert client.get("/users", params={"ids": ",".join(str(i) for i in range(101))}).status_code == 400
+
+def test_login_writes_profile_despite_stale_cache(client: TestClient, session):
+    from sqlmodel import update
+    from app.models import User
+
+    user = {"telegram_id": 556, "username": "x"}
+    user_id = client.post("/users/", json=user).json()["id"]
+    # Another worker saved a different profile; this process still caches "x"
+    session.exec(update(User).where(User.id == user_id).values(username="y"))
+    session.commit()
+
+    client.post("/users/", json=user)
+    session.expire_all()
+    assert session.get(User, user_id).username == "x"
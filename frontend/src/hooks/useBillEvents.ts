@@ -1,43 +1,82 @@
 import { useEffect } from 'react';
+import { getSessionToken } from '@/lib/api/client';
+
+// Backoff after the server refused the stream (429/503), which EventSource does not retry by itself
+const RETRY_BASE_MS = 2000;
+const RETRY_MAX_MS = 60000;
 
 export function useBillEvents(
-  billId: number | undefined, 
+  billId: number | undefined,
   onRefresh: () => void,
-  onReaction?: (userId: number, emoji: string) => void
+  onReaction?: (userId: number, emoji: string) => void,
+  onPresence?: (userIds: number[]) => void
 ) {
   useEffect(() => {
     if (!billId) return;
 
     const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api';
     const sseUrl = `${apiUrl}/bills/${billId}/events`;
-    
-    console.log(`Subscribing to SSE: ${sseUrl}`);
-    const eventSource = new EventSource(sseUrl);
-
-    eventSource.onmessage = (event) => {
-      console.log('SSE message received:', event.data);
-      const data = event.data as string;
-      
-      if (data === 'REFRESH') {
-        onRefresh();
-      } else if (data.startsWith('REACTION:')) {
-        const parts = data.split(':');
-        if (parts.length === 3 && onReaction) {
-          const userId = parseInt(parts[1]);
-          const emoji = parts[2];
-          onReaction(userId, emoji);
+    let eventSource: EventSource | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    let attempts = 0;
+    let opened = false;
+    let closed = false;
+
+    const connect = () => {
+      // EventSource cannot send headers, so the session token goes in the query
+      const token = getSessionToken();
+      console.log(`Subscribing to SSE: ${sseUrl}`);
+      eventSource = new EventSource(token ? `${sseUrl}?access_token=${encodeURIComponent(token)}` : sseUrl);
+
+      eventSource.onopen = () => {
+        // Catch up on changes broadcast while reconnecting
+        if (opened) onRefresh();
+        opened = true;
+        attempts = 0;
+      };
+
+      eventSource.onmessage = (event) => {
+        console.log('SSE message received:', event.data);
+        const data = event.data as string;
+
+        if (data === 'REFRESH') {
+          onRefresh();
+        } else if (data === 'RECONNECT') {
+          // Server is restarting: the stream ends and EventSource comes back after the
+          // retry delay it sent, jittered per client
+          return;
+        } else if (data.startsWith('PRESENCE:')) {
+          // Users viewing the bill, sent when the set changes
+          const ids = data.slice('PRESENCE:'.length);
+          onPresence?.(ids ? ids.split(',').map((id) => parseInt(id)) : []);
+        } else if (data.startsWith('REACTION:')) {
+          const parts = data.split(':');
+          if (parts.length === 3 && onReaction) {
+            const userId = parseInt(parts[1]);
+            const emoji = parts[2];
+            onReaction(userId, emoji);
+          }
         }
-      }
-    };
+      };
 
-    eventSource.onerror = (error) => {
-      console.error('SSE connection error:', error);
-      // EventSource automatically retries by default
+      eventSource.onerror = (error) => {
+        console.error('SSE connection error:', error);
+        // EventSource retries dropped streams by itself, but gives up on a refused one
+        if (closed || eventSource?.readyState !== EventSource.CLOSED) return;
+        eventSource.close();
+        const delay = Math.min(RETRY_MAX_MS, RETRY_BASE_MS * 2 ** attempts);
+        attempts += 1;
+        retryTimer = setTimeout(connect, delay / 2 + Math.random() * delay / 2);
+      };
     };
 
+    connect();
+
     return () => {
       console.log(`Closing SSE: ${sseUrl}`);
-      eventSource.close();
+      closed = true;
+      clearTimeout(retryTimer);
+      eventSource?.close();
     };
-  }, [billId, onRefresh, onReaction]);
+  }, [billId, onRefresh, onReaction, onPresence]);
 }
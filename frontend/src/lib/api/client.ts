@@ -10,6 +10,17 @@ const apiClient = axios.create({
   timeout: 10000,
 });
 
+// Session token issued by POST /users/, sent with every request
+let sessionToken: string | null = null;
+
+export function setSessionToken(token: string | null) {
+  sessionToken = token;
+}
+
+export function getSessionToken(): string | null {
+  return sessionToken;
+}
+
 // Request interceptor to add Telegram auth data
 apiClient.interceptors.request.use(
   (config) => {
@@ -19,6 +30,17 @@ apiClient.interceptors.request.use(
       // Add Telegram initData to headers for backend validation
       config.headers['X-Telegram-Init-Data'] = webApp.initData;
     }
+
+    if (sessionToken) {
+      config.headers['Authorization'] = `Bearer ${sessionToken}`;
+    }
+
+    // One key per logical request: a retry of the same config reuses it,
+    // so the backend replays the first result instead of running it again
+    const method = (config.method || 'get').toLowerCase();
+    if (method !== 'get' && !config.headers['Idempotency-Key'] && typeof crypto !== 'undefined' && crypto.randomUUID) {
+      config.headers['Idempotency-Key'] = crypto.randomUUID();
+    }
     
     return config;
   },
@@ -1,11 +1,12 @@
-import apiClient from './client';
-import type { User, UserCreate } from '@/types/api';
+import apiClient, { setSessionToken } from './client';
+import type { User, UserCreate, UserSession } from '@/types/api';
 
 /**
  * Create or update user based on telegram_id
  */
 export async function createOrUpdateUser(userData: UserCreate): Promise<User> {
-  const response = await apiClient.post<User>('/users/', userData);
+  const response = await apiClient.post<UserSession>('/users/', userData);
+  setSessionToken(response.data.session_token);
   return response.data;
 }
 
@@ -17,6 +18,17 @@ export async function getUser(userId: number): Promise<User> {
   return response.data;
 }
 
+/**
+ * Get many users by ID in one request (at most 100 IDs)
+ */
+export async function getUsers(userIds: number[]): Promise<User[]> {
+  if (userIds.length === 0) return [];
+  const response = await apiClient.get<User[]>('/users', {
+    params: { ids: userIds.join(',') },
+  });
+  return response.data;
+}
+
 export interface TelegramWidgetUser {
   id: number;
   first_name: string;
@@ -38,13 +50,14 @@ export async function getUserByTelegramId(
   widgetData?: TelegramWidgetUser
 ): Promise<User | null> {
   try {
-    const response = await apiClient.post<User>('/users/', {
+    const response = await apiClient.post<UserSession>('/users/', {
       telegram_id: telegramId,
       username: username,
       avatar_url: avatarUrl,
       init_data: initData,
       widget_data: widgetData,
     });
+    setSessionToken(response.data.session_token);
     return response.data;
   } catch (error) {
     console.error('Error fetching/syncing user by Telegram ID:', error);
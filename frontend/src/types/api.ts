@@ -9,6 +9,11 @@ export interface User {
   avatar_url: string | null;
 }
 
+export interface UserSession extends User {
+  session_token: string;
+  expires_at: number;
+}
+
 export interface UserCreate {
   telegram_id: number;
   username?: string | null;
@@ -32,6 +37,7 @@ export interface Bill {
   id: number;
   owner_id: number;
   total_sum: number;
+  currency: string;
   title: string | null;
   payment_details: string | null;
   participants_count: number;
@@ -44,6 +50,7 @@ export interface Bill {
 export interface BillCreate {
   owner_id: number;
   total_sum: number;
+  currency?: string;
   title?: string | null;
   payment_details?: string | null;
   include_owner?: boolean;
@@ -57,6 +64,13 @@ export interface BillItem {
   count: number;
   item_sum: number;
   assigned_to_user_id: number | null;
+  shares: BillItemShare[];
+}
+
+export interface BillItemShare {
+  participant_id: number;
+  weight: number;
+  amount: number;
 }
 
 export interface BillItemCreate {
@@ -86,6 +100,7 @@ export interface BillParticipantCreate {
 }
 
 export interface BillDetail extends Bill {
+  version: number;
   items: BillItem[];
   participants: BillParticipant[];
 }